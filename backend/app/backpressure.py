@@ -0,0 +1,153 @@
+"""
+Queue-depth backpressure for enrichment jobs.
+
+QueueMonitor reads message and consumer counts with passive queue declares
+on one long-lived connection, cached for QUEUE_DEPTH_CACHE_S, so checking a
+queue on every request costs at most one broker round trip per interval.
+admit(job) refuses new jobs while their queue is over its limit (429) or,
+with QUEUE_REQUIRE_CONSUMERS=1, has no consumers (503), with a Retry-After
+hint, instead of letting the backlog and everyone's PENDING time grow
+without bound.
+
+Limits (0 = never shed):
+    QUEUE_MAX_DEPTH_DESCRIBE   default 200
+    QUEUE_MAX_DEPTH_SENTIMENT  default 2000
+    QUEUE_MAX_DEPTH_RESIZE     default 0 (uploads are never refused)
+    QUEUE_REQUIRE_CONSUMERS    default 0; 1 = refuse when a queue has no consumer
+                               (off by default: workers briefly have none while
+                               restarting, and the queue holds the jobs meanwhile)
+    QUEUE_RETRY_AFTER_S        default 30
+"""
+import math
+import os
+import threading
+import time
+from typing import NamedTuple, Optional
+
+import pika
+from pika.exceptions import AMQPError, ChannelClosedByBroker
+
+from app import metrics
+from app.queue import QUEUES, _amqp_params, queue_name
+
+DEFAULT_LIMITS = {"describe": 200, "sentiment": 2000, "resize": 0}
+
+
+class QueueState(NamedTuple):
+    messages: int
+    consumers: int
+    checked_at: float
+
+
+class Backpressure(Exception):
+    """The job's queue is full or unattended; carries the HTTP status to answer with."""
+
+    def __init__(self, job: str, status_code: int, retry_after_s: int, reason: str):
+        super().__init__(reason)
+        self.job = job
+        self.status_code = status_code
+        self.retry_after_s = retry_after_s
+
+
+def limit_for(job: str) -> int:
+    return int(os.getenv(f"QUEUE_MAX_DEPTH_{job.upper()}", str(DEFAULT_LIMITS[job])))
+
+
+class QueueMonitor:
+    def __init__(self, ttl_s: Optional[float] = None):
+        self.ttl_s = ttl_s if ttl_s is not None else float(os.getenv("QUEUE_DEPTH_CACHE_S", "2"))
+        self._lock = threading.Lock()
+        self._cache: dict[str, QueueState] = {}
+        self._connection: Optional[pika.BlockingConnection] = None
+        self._channel = None
+        self._failed_at = -math.inf
+
+    def _declare(self, name: str) -> QueueState:
+        if self._channel is None or self._channel.is_closed:
+            if self._connection is None or self._connection.is_closed:
+                self._connection = pika.BlockingConnection(_amqp_params())
+            self._channel = self._connection.channel()
+        try:
+            ok = self._channel.queue_declare(queue=name, passive=True)
+        except ChannelClosedByBroker:
+            # 404: nobody has declared the queue yet, so nobody consumes it either
+            self._channel = None
+            return QueueState(0, 0, time.monotonic())
+        return QueueState(ok.method.message_count, ok.method.consumer_count, time.monotonic())
+
+    def state(self, name: str) -> Optional[QueueState]:
+        """Cached state of queue `name`; the last known (or None) if the broker is unreachable."""
+        with self._lock:
+            cached = self._cache.get(name)
+            if cached is not None and time.monotonic() - cached.checked_at < self.ttl_s:
+                return cached
+            if time.monotonic() - self._failed_at < self.ttl_s:
+                # broker was just unreachable; don't stall every request on connect
+                return cached
+            for _ in range(2):
+                try:
+                    self._cache[name] = self._declare(name)
+                    return self._cache[name]
+                except (AMQPError, OSError):
+                    # stale connection (e.g. missed heartbeats): reconnect once
+                    self._connection = self._channel = None
+            self._failed_at = time.monotonic()
+            return cached
+
+    def snapshot(self) -> dict:
+        out = {}
+        for job in QUEUES:
+            name = queue_name(job)
+            state = self.state(name)
+            out[job] = {
+                "queue": name,
+                "messages": state.messages if state else None,
+                "consumers": state.consumers if state else None,
+                "limit": limit_for(job),
+            }
+        return out
+
+
+monitor = QueueMonitor()
+
+
+def admit(job: str) -> None:
+    """Raise Backpressure if a new `job` should not be enqueued right now."""
+    limit = limit_for(job)
+    if not limit:
+        return
+    state = monitor.state(queue_name(job))
+    if state is None:
+        # broker unreachable: let the publish itself fail loudly
+        return
+
+    retry_after = int(os.getenv("QUEUE_RETRY_AFTER_S", "30"))
+    if os.getenv("QUEUE_REQUIRE_CONSUMERS", "0") == "1" and state.consumers == 0:
+        metrics.BROKER_JOBS_SHED.inc(job, "no_consumers")
+        raise Backpressure(job, 503, retry_after, f"No {job} workers are running")
+    if state.messages >= limit:
+        metrics.BROKER_JOBS_SHED.inc(job, "queue_full")
+        # the further over the limit, the longer clients should wait
+        retry = min(600, math.ceil(retry_after * state.messages / limit))
+        raise Backpressure(job, 429, retry, f"The {job} queue is full ({state.messages} waiting)")
+
+
+def _queue_gauge(field: str):
+    def collect() -> dict:
+        return {
+            (job,): values[field]
+            for job, values in monitor.snapshot().items()
+            if values[field] is not None
+        }
+
+    return collect
+
+
+metrics.register_gauge(
+    "broker_queue_messages", "Ready messages per job queue (cached passive declare).",
+    _queue_gauge("messages"), ("job",),
+)
+metrics.register_gauge(
+    "broker_queue_consumers", "Consumers per job queue (cached passive declare).",
+    _queue_gauge("consumers"), ("job",),
+)
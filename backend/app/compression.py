@@ -0,0 +1,131 @@
+"""
+Response compression negotiated from Accept-Encoding: brotli when the client
+accepts it (and the brotli package is installed), else gzip.
+
+Only complete bodies of at least COMPRESS_MIN_BYTES (default 1024) with a
+text-like content type are compressed. Every such candidate gets
+Vary: Accept-Encoding, compressed or not (small body, client without
+Accept-Encoding), so a shared cache never serves one client's encoding to
+another. Streaming responses (SSE, files) and bodies that already carry a
+Content-Encoding pass through untouched. Bodies
+of COMPRESS_THREAD_BYTES (default 64 KiB) and more are compressed in a worker
+thread so a 1000-post feed does not stall the event loop.
+
+    COMPRESS_GZIP_LEVEL      default 4 (6+ costs ~20% more CPU for ~3% smaller feeds)
+    COMPRESS_BROTLI_QUALITY  default 4 (11 is far too slow for dynamic responses)
+"""
+import gzip
+import os
+from typing import Optional
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/javascript", "application/xml", "image/svg+xml")
+
+
+def supported_encodings() -> tuple[str, ...]:
+    """Server preference order, used to break ties between equal q-values."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """The encoding to use for an Accept-Encoding header, or None for identity."""
+    q: dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        q[name.strip()] = weight
+
+    best, best_q = None, 0.0
+    for encoding in supported_encodings():
+        weight = q.get(encoding, q.get("*", 0.0))
+        if weight > best_q:
+            best, best_q = encoding, weight
+    return best
+
+
+def is_compressible(content_type: str) -> bool:
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    if media_type == "text/event-stream":
+        return False
+    return media_type.startswith("text/") or media_type in COMPRESSIBLE_TYPES or media_type.endswith("+json")
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=int(os.getenv("COMPRESS_BROTLI_QUALITY", "4")))
+    # mtime=0: the same body always compresses to the same bytes
+    return gzip.compress(body, compresslevel=int(os.getenv("COMPRESS_GZIP_LEVEL", "4")), mtime=0)
+
+
+class CompressionMiddleware:
+    """Pure ASGI middleware; holds the response start until the first body chunk."""
+
+    def __init__(self, app, minimum_size: Optional[int] = None, thread_size: Optional[int] = None):
+        self.app = app
+        self.minimum_size = (
+            minimum_size if minimum_size is not None else int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+        )
+        self.thread_size = (
+            thread_size if thread_size is not None else int(os.getenv("COMPRESS_THREAD_BYTES", "65536"))
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        start_message = None
+
+        async def send_wrapper(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if start_message is None:
+                await send(message)
+                return
+
+            start, start_message = start_message, None
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            if (
+                message["type"] != "http.response.body"
+                or message.get("more_body", False)
+                or "content-encoding" in headers
+                or not is_compressible(headers.get("content-type", ""))
+            ):
+                await send(start)
+                await send(message)
+                return
+
+            headers.add_vary_header("Accept-Encoding")
+            if encoding is None or len(body) < self.minimum_size:
+                await send(start)
+                await send(message)
+                return
+
+            if len(body) >= self.thread_size:
+                body = await anyio.to_thread.run_sync(compress, body, encoding)
+            else:
+                body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,138 @@
+"""
+Conditional GET for posts and feed pages, derived from post.updated_at.
+
+    single post   ETag W/"p<id>-<updated_at µs>", Last-Modified updated_at
+    feed page     ETag W/"f<hash of the page's (id, updated_at) pairs>",
+                  Last-Modified the newest updated_at on the page
+
+A request whose If-None-Match matches gets an empty 304 before the body is
+serialized; GET /posts even answers it from get_posts_validators(), without
+loading the rows. The tags are weak because the same representation is also
+sent gzip/brotli encoded. If-Modified-Since is not evaluated: Last-Modified
+has one-second resolution and two writes can land in the same second, so
+ETags are the validator to rely on (clients sending both get the ETag check).
+
+GET /posts?since= polls for changes; its X-Next-Since (and, after a full
+page, X-Next-Since-Id) headers are the parameters to poll with next (see
+next_since()).
+"""
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from typing import Iterable, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.responses import FastJSONResponse
+
+# part of every feed tag: bump when the serialized post shape changes
+FEED_FORMAT = b"1"
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _utc(ts: datetime) -> datetime:
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts.astimezone(timezone.utc)
+
+
+def _micros(ts: datetime) -> int:
+    return (_utc(ts) - _EPOCH) // timedelta(microseconds=1)
+
+
+def post_etag(post_id: int, updated_at: datetime) -> str:
+    return f'W/"p{post_id}-{_micros(updated_at):x}"'
+
+
+def feed_etag(validators: Iterable[tuple[int, datetime]]) -> str:
+    """ETag of a page from its posts' (id, updated_at), in page order."""
+    h = hashlib.sha1(FEED_FORMAT)
+    for post_id, updated_at in validators:
+        h.update(b"%d:%d," % (post_id, _micros(updated_at)))
+    return f'W/"f{h.hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against `etag`."""
+    if not if_none_match:
+        return False
+    opaque = etag.removeprefix("W/")
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == opaque:
+            return True
+    return False
+
+
+def http_date(ts: datetime) -> str:
+    return format_datetime(_utc(ts), usegmt=True)
+
+
+def iso_utc(ts: datetime) -> str:
+    """ISO 8601 with a Z, which survives being pasted into a query string."""
+    return _utc(ts).isoformat().replace("+00:00", "Z")
+
+
+def validator_headers(etag: str, last_modified: Optional[datetime] = None) -> dict[str, str]:
+    # no-cache: caches may store the response but must revalidate every time
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def not_modified(etag: str, headers: Optional[dict[str, str]] = None) -> Response:
+    return Response(status_code=304, headers={**validator_headers(etag), **(headers or {})})
+
+
+def post_response(request: Request, post: dict) -> Response:
+    etag = post_etag(post["id"], post["updated_at"])
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    return FastJSONResponse(post, headers=validator_headers(etag, post["updated_at"]))
+
+
+def feed_response(request: Request, posts: list[dict], headers: Optional[dict[str, str]] = None) -> Response:
+    etag = feed_etag((p["id"], p["updated_at"]) for p in posts)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag, headers)
+    latest = max((p["updated_at"] for p in posts), default=None)
+    return FastJSONResponse(posts, headers={**validator_headers(etag, latest), **(headers or {})})
+
+
+def since_overlap() -> timedelta:
+    return timedelta(seconds=float(os.getenv("POST_SINCE_OVERLAP_S", "5")))
+
+
+def next_since(
+    since: datetime, validators: list[tuple[int, datetime]], limit: Optional[int]
+) -> tuple[datetime, Optional[int]]:
+    """
+    The (since, since_id) to poll with after a page ordered by updated_at, id
+    ascending, given the page's (id, updated_at).
+
+    updated_at is stamped before commit, so a slow transaction can make a
+    change visible after newer ones were already returned. A page that was
+    not full is therefore followed up from POST_SINCE_OVERLAP_S (default 5)
+    before its newest change: posts changed in that window come back once
+    more, but none is missed. A full page continues right after its last
+    post, with its id as the tie-breaker, so paging through a backlog of
+    posts sharing one updated_at (bulk writes, migrated rows) makes progress.
+    """
+    since = _utc(since)
+    if not validators:
+        return since, None
+    if limit is not None and len(validators) >= limit:
+        last_id, last_updated = validators[-1]
+        return _utc(last_updated), last_id
+    latest = max(_utc(updated_at) for _, updated_at in validators)
+    return max(since, latest - since_overlap()), None
+
+
+def next_since_headers(since: datetime, validators: list[tuple[int, datetime]], limit: Optional[int]) -> dict[str, str]:
+    next_at, next_id = next_since(since, validators, limit)
+    headers = {"X-Next-Since": iso_utc(next_at)}
+    if next_id is not None:
+        headers["X-Next-Since-Id"] = str(next_id)
+    return headers
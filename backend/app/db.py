@@ -1,6 +1,11 @@
 import os
+import time
+
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from sqlalchemy.pool import QueuePool
+
+from app import metrics, sqlstats
 
 
 def _db_url() -> str:
@@ -12,9 +17,36 @@ def _db_url() -> str:
     return f"postgresql+psycopg://{user}:{pw}@{host}:{port}/{name}"
 
 
-engine = create_engine(_db_url(), pool_pre_ping=True)
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.DB_POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - started)
+
+
+engine = create_engine(_db_url(), pool_pre_ping=True, poolclass=TimedQueuePool)
+sqlstats.install(engine)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
 
 class Base(DeclarativeBase):
     pass
+
+
+def _pool_stats() -> dict:
+    pool = engine.pool
+    return {
+        ("size",): pool.size(),
+        ("checked_out",): pool.checkedout(),
+        ("checked_in",): pool.checkedin(),
+        ("overflow",): pool.overflow(),
+    }
+
+
+metrics.register_gauge(
+    "db_pool_connections", "SQLAlchemy pool state of app.db.engine.", _pool_stats, ("state",)
+)
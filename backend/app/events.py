@@ -5,10 +5,29 @@ from typing import AsyncGenerator
 from fastapi import APIRouter
 from starlette.responses import StreamingResponse
 
+from app import metrics
+
 router = APIRouter()
 
 _subscribers: dict[int, list[asyncio.Queue[dict]]] = defaultdict(list)
 
+
+def subscriber_stats() -> dict:
+    # read at scrape time only; copies so the consumer thread can keep mutating
+    queues = [q for qs in list(_subscribers.values()) for q in list(qs)]
+    depths = [q.qsize() for q in queues]
+    return {
+        ("streams",): len(queues),
+        ("posts",): len(_subscribers),
+        ("queued_events",): sum(depths),
+        ("max_queue_depth",): max(depths, default=0),
+    }
+
+
+metrics.register_gauge(
+    "sse_subscribers", "Open SSE streams and their pending event queues.", subscriber_stats, ("kind",)
+)
+
 def publish_event(post_id: int, event: dict) -> None:
     # Called from backend result-consumer thread
     queues = list(_subscribers.get(post_id, []))
@@ -3,17 +3,23 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
-from starlette.staticfiles import StaticFiles
 
+from app.compression import CompressionMiddleware
 from app.events import router as events_router
+from app.metrics import MetricsMiddleware, router as metrics_router
 from app.routes import router as routes_router
+from app.sqlstats import router as sqlstats_router
 from app.describe_results_consumer import start_consumer_thread
+from app.partitions import start_maintenance_thread
+from app.static_files import ImageStaticFiles
+from app.tracing import TraceMiddleware
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     start_consumer_thread()
+    start_maintenance_thread()
     yield
     # Shutdown (optional): if you later implement stop/join, call it here.
 
@@ -28,18 +34,30 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Trace-Id", "ETag", "Last-Modified", "X-Next-Since", "X-Next-Since-Id"],
     )
 
+    # gzip / brotli for larger JSON bodies; inside MetricsMiddleware so its time is measured
+    app.add_middleware(CompressionMiddleware)
+
+    # Latency histograms per route/status (see /metrics)
+    app.add_middleware(MetricsMiddleware)
+
+    # X-Trace-Id per request, propagated into enqueued jobs
+    app.add_middleware(TraceMiddleware)
+
     # Static file hosting for uploads
     image_root = os.getenv("IMAGE_ROOT", "uploads")
     os.makedirs(os.path.join(image_root, "original"), exist_ok=True)
     os.makedirs(os.path.join(image_root, "reduced"), exist_ok=True)
 
-    app.mount("/static", StaticFiles(directory=image_root), name="static")
+    app.mount("/static", ImageStaticFiles(directory=image_root), name="static")
 
     # Routes
     app.include_router(routes_router)
     app.include_router(events_router)
+    app.include_router(metrics_router)
+    app.include_router(sqlstats_router)
 
     return app
 
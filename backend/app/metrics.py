@@ -0,0 +1,243 @@
+"""
+Minimal Prometheus text-format metrics for the backend.
+
+Counters and histograms are updated in-process (one lock and a bisect per
+observation); gauges are read from callbacks only when /metrics is scraped,
+so they cost nothing per request.
+"""
+import bisect
+import threading
+import time
+from typing import Callable, Iterable
+
+from fastapi import APIRouter
+from starlette.responses import Response
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = tuple[str, ...]
+
+
+def _fmt_labels(names: Labels, values: Labels, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Labels = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = list(self._values.items())
+        for values, total in items:
+            yield f"{self.name}{_fmt_labels(self.labels, values)} {_fmt_value(total)}"
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Labels = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum]
+        self._series: dict[Labels, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][idx] += 1
+            series[1] += value
+
+    def time(self, *label_values: str) -> "_Timer":
+        return _Timer(self, label_values)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = [(values, list(counts), total) for values, (counts, total) in self._series.items()]
+        for values, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_fmt_value(bound)}"'
+                yield f"{self.name}_bucket{_fmt_labels(self.labels, values, le)} {cumulative}"
+            yield f"{self.name}_sum{_fmt_labels(self.labels, values)} {_fmt_value(total)}"
+            yield f"{self.name}_count{_fmt_labels(self.labels, values)} {cumulative}"
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, label_values: Labels):
+        self.histogram = histogram
+        self.label_values = label_values
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, *self.label_values)
+        return False
+
+
+class Gauge:
+    """Value(s) computed at scrape time: `collect()` returns {label values: value}."""
+
+    def __init__(self, name: str, help: str, collect: Callable[[], dict[Labels, float]], labels: Labels = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.collect = collect
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        try:
+            values = self.collect()
+        except Exception:
+            return
+        for label_values, value in values.items():
+            yield f"{self.name}{_fmt_labels(self.labels, label_values)} {_fmt_value(value)}"
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: list = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Time from request start until the response headers are sent.",
+        ("method", "route", "status"),
+    )
+)
+DB_POOL_CHECKOUT_SECONDS = REGISTRY.register(
+    Histogram(
+        "db_pool_checkout_seconds",
+        "Time spent waiting for a pooled DB connection (includes opening a new one).",
+        buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+    )
+)
+BROKER_PUBLISH_SECONDS = REGISTRY.register(
+    Histogram(
+        "broker_publish_seconds",
+        "Time spent in queue.publish_* per job kind, including connect.",
+        ("job",),
+    )
+)
+BROKER_PUBLISH_ERRORS = REGISTRY.register(
+    Counter("broker_publish_errors_total", "Failed queue.publish_* calls per job kind.", ("job",))
+)
+
+BROKER_JOBS_SHED = REGISTRY.register(
+    Counter(
+        "broker_jobs_shed_total",
+        "Jobs refused by backpressure per job kind and reason.",
+        ("job", "reason"),
+    )
+)
+
+DB_SLOW_STATEMENTS = REGISTRY.register(
+    Counter("db_slow_statements_total", "Statements slower than SLOW_QUERY_MS (see /debug/sql).")
+)
+
+
+def register_gauge(name: str, help: str, collect: Callable[[], dict], labels: Labels = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, help, collect, labels))
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (no BaseHTTPMiddleware task overhead). Labels use the
+    matched route template, not the raw path, to keep cardinality bounded.
+    Measures until response start, so long-lived SSE streams count once.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        recorded = False
+
+        def record(status: int) -> None:
+            nonlocal recorded
+            if recorded:
+                return
+            recorded = True
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                scope["method"],
+                getattr(route, "path", "<unmatched>"),
+                str(status),
+            )
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                record(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            record(500)
+            raise
+
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics() -> Response:
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import String, Text, DateTime, Float, Column
+from sqlalchemy import String, Text, DateTime, Float, Integer, Column, FetchedValue, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 from .db import Base
@@ -8,6 +8,8 @@ from .db import Base
 class Post(Base):
     __tablename__ = "post"
 
+    # the table's key is (id, created_at), as partitioning requires; ids are
+    # still unique (one sequence), so the mapper identifies rows by id alone
     id: Mapped[int] = mapped_column(primary_key=True)
 
     # Image
@@ -16,6 +18,12 @@ class Post(Base):
         String, nullable=False, default="READY"
     )
 
+    # Reduced image metadata (filled by resize-worker)
+    image_width: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    image_height: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    image_placeholder: Mapped[str | None] = mapped_column(Text, nullable=True)
+    image_dominant_color: Mapped[str | None] = mapped_column(String, nullable=True)
+
     # Image description (AI)
     image_description: Mapped[str | None] = mapped_column(Text, nullable=True)
     description_status: Mapped[str] = mapped_column(
@@ -30,6 +38,14 @@ class Post(Base):
         nullable=False,
         default=datetime.utcnow,
     )
+    # set by the database on insert and by the post_touch_updated_at trigger
+    # on every update, whoever writes (backend or workers)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+        server_onupdate=FetchedValue(),
+    )
 
     # Sentiment analysis
     sentiment_status: Mapped[str] = mapped_column(
@@ -0,0 +1,229 @@
+"""
+Monthly partitions of the post table (see db/init.sql).
+
+ensure_partitions() keeps POST_PARTITIONS_AHEAD months (default 3) of
+empty partitions ahead of now; the backend runs it at startup and every
+POST_PARTITION_CHECK_S (default 6 h) so inserts never reach post_default.
+
+archive_partition() rewrites a cold month into a compact copy, optionally
+in another tablespace (e.g. one on a zstd/lz4-compressed volume), and
+swaps it in under the same name and bounds. The copy stays attached to
+post, so get_post_by_id, search and the workers' updates still see it.
+
+    1. a trigger makes the old partition read-only (writes raise)
+    2. copy it, sorted by id, into a fillfactor 100 table with the same
+       indexes and a CHECK on the bounds (so ATTACH needs no scan)
+    3. VACUUM (FREEZE, ANALYZE) the copy: no dead tuples, no later freezing
+    4. lock post briefly, detach and drop the old partition, attach the copy
+"""
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional
+
+from sqlalchemy import text
+
+from app.db import engine
+
+PARTITION_NAME = re.compile(r"^post_p(\d{4})_(\d{2})$")
+
+LIST_PARTITIONS_SQL = text(
+    """
+    SELECT
+      c.relname AS name,
+      pg_get_expr(c.relpartbound, c.oid) AS bound,
+      c.reltuples::bigint AS approx_rows,
+      pg_total_relation_size(c.oid) AS bytes,
+      COALESCE(ts.spcname, 'pg_default') AS tablespace,
+      a.archived_at
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    LEFT JOIN pg_tablespace ts ON ts.oid = c.reltablespace
+    LEFT JOIN post_partition_archive a ON a.partition = c.relname
+    WHERE i.inhparent = 'post'::regclass
+    ORDER BY c.relname
+    """
+)
+
+READONLY_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION post_archiving_readonly() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  RAISE EXCEPTION 'partition % is being archived', TG_TABLE_NAME
+    USING ERRCODE = 'read_only_sql_transaction';
+END
+$$
+"""
+
+RECORD_ARCHIVE_SQL = text(
+    """
+    INSERT INTO post_partition_archive
+      (partition, tablespace, row_count, bytes_before, bytes_after)
+    VALUES (:partition, :tablespace, :rows, :before, :after)
+    ON CONFLICT (partition) DO UPDATE SET
+      archived_at = NOW(),
+      tablespace = EXCLUDED.tablespace,
+      row_count = EXCLUDED.row_count,
+      bytes_before = EXCLUDED.bytes_before,
+      bytes_after = EXCLUDED.bytes_after
+    """
+)
+
+
+class Partition(NamedTuple):
+    name: str
+    start: Optional[datetime]  # None for post_default
+    end: Optional[datetime]
+    approx_rows: int
+    bytes: int
+    tablespace: str
+    archived_at: Optional[datetime]
+
+
+def month_bounds(name: str) -> tuple[datetime, datetime]:
+    """[start, end) in UTC of a post_pYYYY_MM partition."""
+    m = PARTITION_NAME.match(name)
+    if not m:
+        raise ValueError(f"Not a monthly post partition: {name}")
+    year, month = int(m.group(1)), int(m.group(2))
+    start = datetime(year, month, 1, tzinfo=timezone.utc)
+    end = datetime(year + month // 12, month % 12 + 1, 1, tzinfo=timezone.utc)
+    return start, end
+
+
+def ensure_partitions(months_ahead: Optional[int] = None, since: Optional[datetime] = None) -> int:
+    """Create missing monthly partitions; returns how many were created."""
+    if months_ahead is None:
+        months_ahead = int(os.getenv("POST_PARTITIONS_AHEAD", "3"))
+    with engine.begin() as conn:
+        return conn.execute(
+            text("SELECT post_ensure_partitions(:ahead, COALESCE(:since, NOW()))"),
+            {"ahead": months_ahead, "since": since},
+        ).scalar_one()
+
+
+def list_partitions() -> list[Partition]:
+    with engine.connect() as conn:
+        rows = conn.execute(LIST_PARTITIONS_SQL).mappings().all()
+    out = []
+    for row in rows:
+        start = end = None
+        if PARTITION_NAME.match(row["name"]):
+            start, end = month_bounds(row["name"])
+        out.append(
+            Partition(
+                row["name"], start, end, max(row["approx_rows"], 0),
+                row["bytes"], row["tablespace"], row["archived_at"],
+            )
+        )
+    return out
+
+
+def cold_partitions(older_than_months: int, now: Optional[datetime] = None) -> list[Partition]:
+    """Monthly partitions, not yet archived, that ended at least N months ago."""
+    now = now or datetime.now(timezone.utc)
+    months_now = now.year * 12 + now.month - 1
+    return [
+        p for p in list_partitions()
+        if p.end is not None
+        and p.archived_at is None
+        and months_now - (p.end.year * 12 + p.end.month - 1) >= older_than_months
+    ]
+
+
+class ArchiveResult(NamedTuple):
+    partition: str
+    rows: int
+    bytes_before: int
+    bytes_after: int
+    seconds: float
+
+
+def archive_partition(name: str, tablespace: Optional[str] = None) -> ArchiveResult:
+    """Rewrite partition `name` compactly (see the module docstring) and swap it in."""
+    start, end = month_bounds(name)
+    if tablespace and not re.fullmatch(r"\w+", tablespace):
+        raise ValueError(f"Invalid tablespace name: {tablespace}")
+    bounds = f"FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    copy = f"{name}_archived"
+    lock_timeout = os.getenv("POST_ARCHIVE_LOCK_TIMEOUT", "5s")
+    started = time.perf_counter()
+
+    with engine.begin() as conn:
+        conn.execute(text(f"SET LOCAL lock_timeout = '{lock_timeout}'"))
+        bytes_before = conn.execute(text("SELECT pg_total_relation_size(:t)"), {"t": name}).scalar_one()
+        conn.execute(text(READONLY_FUNCTION_SQL))
+        # row level: statement triggers would only fire for statements naming the partition
+        conn.execute(
+            text(
+                f"CREATE OR REPLACE TRIGGER post_archiving_readonly BEFORE INSERT OR UPDATE OR DELETE ON {name} "
+                "FOR EACH ROW EXECUTE FUNCTION post_archiving_readonly()"
+            )
+        )
+
+    try:
+        with engine.begin() as conn:
+            if tablespace:
+                # the table and its copied indexes follow default_tablespace
+                conn.execute(text(f'SET LOCAL default_tablespace = "{tablespace}"'))
+            conn.execute(text(f"DROP TABLE IF EXISTS {copy}"))  # left over by a crashed run
+            # INCLUDING INDEXES: ATTACH adopts the copies instead of building them under lock
+            conn.execute(
+                text(
+                    f"CREATE TABLE {copy} (LIKE post INCLUDING DEFAULTS INCLUDING CONSTRAINTS "
+                    "INCLUDING STORAGE INCLUDING INDEXES) WITH (fillfactor = 100)"
+                )
+            )
+            rows = conn.execute(text(f"INSERT INTO {copy} SELECT * FROM {name} ORDER BY id")).rowcount
+            # lets ATTACH skip its validation scan
+            conn.execute(
+                text(
+                    f"ALTER TABLE {copy} ADD CONSTRAINT {name}_bounds CHECK "
+                    f"(created_at >= '{start.isoformat()}' AND created_at < '{end.isoformat()}')"
+                )
+            )
+
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(f"VACUUM (FREEZE, ANALYZE) {copy}"))
+
+        with engine.begin() as conn:
+            conn.execute(text(f"SET LOCAL lock_timeout = '{lock_timeout}'"))
+            # parent first, like every query on post, so the swap cannot deadlock with them
+            conn.execute(text("LOCK TABLE post IN ACCESS EXCLUSIVE MODE"))
+            conn.execute(text(f"ALTER TABLE post DETACH PARTITION {name}"))
+            conn.execute(text(f"DROP TABLE {name}"))
+            conn.execute(text(f"ALTER TABLE {copy} RENAME TO {name}"))
+            conn.execute(text(f"ALTER TABLE post ATTACH PARTITION {name} FOR VALUES {bounds}"))
+            bytes_after = conn.execute(text("SELECT pg_total_relation_size(:t)"), {"t": name}).scalar_one()
+            conn.execute(
+                RECORD_ARCHIVE_SQL,
+                {"partition": name, "tablespace": tablespace, "rows": rows,
+                 "before": bytes_before, "after": bytes_after},
+            )
+    except Exception:
+        # leave the original partition as it was: writable, and no half-built copy
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {copy}"))
+            conn.execute(text(f"DROP TRIGGER IF EXISTS post_archiving_readonly ON {name}"))
+        raise
+
+    return ArchiveResult(name, rows, bytes_before, bytes_after, time.perf_counter() - started)
+
+
+def _maintenance_loop(interval_s: float) -> None:
+    while True:
+        try:
+            created = ensure_partitions()
+            if created:
+                print(f"[partitions] Created {created} post partition(s)")
+        except Exception as e:
+            print(f"[partitions] Could not ensure post partitions: {e}")
+        time.sleep(interval_s)
+
+
+def start_maintenance_thread() -> None:
+    interval_s = float(os.getenv("POST_PARTITION_CHECK_S", "21600"))
+    t = threading.Thread(target=_maintenance_loop, args=(interval_s,), name="post-partitions", daemon=True)
+    t.start()
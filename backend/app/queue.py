@@ -1,7 +1,26 @@
+import functools
 import json
 import os
+import time
+
 import pika
 
+from app import metrics
+from app.tracing import current_trace_id
+
+
+# job kind -> (env var, default) of its queue name
+QUEUES = {
+    "resize": ("RABBITMQ_QUEUE", "image_resize"),
+    "sentiment": ("RABBITMQ_SENTIMENT_QUEUE", "sentiment_analyze"),
+    "describe": ("RABBITMQ_DESCRIBE_QUEUE", "describe_requests"),
+}
+
+
+def queue_name(job: str) -> str:
+    env, default = QUEUES[job]
+    return os.getenv(env, default)
+
 
 def _amqp_params() -> pika.ConnectionParameters:
     host = os.getenv("RABBITMQ_HOST", "localhost")
@@ -14,61 +33,89 @@ def _amqp_params() -> pika.ConnectionParameters:
         credentials=pika.PlainCredentials(user, password),
     )
 
-def publish_resize_job(filename: str) -> None:
-    queue_name = os.getenv("RABBITMQ_QUEUE", "image_resize")
+def _job_properties() -> pika.BasicProperties:
+    # persistent; workers turn published_at into their queue_wait histogram and
+    # record trace_id with their completion time (see app/tracing.py)
+    return pika.BasicProperties(
+        delivery_mode=2,
+        headers={"published_at": time.time(), "trace_id": current_trace_id()},
+    )
+
+
+def _instrumented(job: str):
+    """Record publish latency and failures for /metrics."""
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                metrics.BROKER_PUBLISH_ERRORS.inc(job)
+                raise
+            finally:
+                metrics.BROKER_PUBLISH_SECONDS.observe(time.perf_counter() - started, job)
+
+        return wrapper
+
+    return decorate
+
+
+@_instrumented("resize")
+def publish_resize_job(filename: str, post_id: int | None = None) -> None:
+    name = queue_name("resize")
 
     connection = pika.BlockingConnection(_amqp_params())
     try:
         channel = connection.channel()
-        channel.queue_declare(queue=queue_name, durable=True)
+        channel.queue_declare(queue=name, durable=True)
 
-        body = json.dumps({"filename": filename}).encode("utf-8")
+        body = json.dumps({"filename": filename, "post_id": post_id}).encode("utf-8")
         channel.basic_publish(
             exchange="",
-            routing_key=queue_name,
+            routing_key=name,
             body=body,
-            properties=pika.BasicProperties(
-                delivery_mode=2  # make message persistent
-            ),
+            properties=_job_properties(),
         )
     finally:
         connection.close()
 
 
+@_instrumented("sentiment")
 def publish_sentiment_job(post_id: int) -> None:
-    queue_name = os.getenv("RABBITMQ_SENTIMENT_QUEUE", "sentiment_analyze")
+    name = queue_name("sentiment")
 
     connection = pika.BlockingConnection(_amqp_params())
     try:
         channel = connection.channel()
-        channel.queue_declare(queue=queue_name, durable=True)
+        channel.queue_declare(queue=name, durable=True)
 
         body = json.dumps({"post_id": post_id}).encode("utf-8")
         channel.basic_publish(
             exchange="",
-            routing_key=queue_name,
+            routing_key=name,
             body=body,
-            properties=pika.BasicProperties(
-                delivery_mode=2,  # make message persistent
-            ),
+            properties=_job_properties(),
         )
     finally:
         connection.close()
 
 
+@_instrumented("describe")
 def publish_describe_job(post_id: int) -> None:
-    queue_name = os.getenv("RABBITMQ_DESCRIBE_QUEUE", "describe_requests")
+    name = queue_name("describe")
     payload = {"post_id": post_id}
 
     conn = pika.BlockingConnection(_amqp_params())
     ch = conn.channel()
-    ch.queue_declare(queue=queue_name, durable=True)
+    ch.queue_declare(queue=name, durable=True)
 
     ch.basic_publish(
         exchange="",
-        routing_key=queue_name,
+        routing_key=name,
         body=json.dumps(payload).encode("utf-8"),
-        properties=pika.BasicProperties(delivery_mode=2),  # persistent
+        properties=_job_properties(),
     )
 
     conn.close()
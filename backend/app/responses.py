@@ -0,0 +1,29 @@
+"""
+JSON responses for trusted service output.
+
+With `response_model=List[PostOut]`, FastAPI validates every row the service
+returns through pydantic and serializes the result with the stdlib encoder.
+The service builds those rows itself (service._to_dict), so list endpoints
+return FastJSONResponse instead: FastAPI passes a returned Response through
+untouched, and orjson encodes the dicts directly. The response_model stays
+on the route for the OpenAPI schema; tests/test_responses.py checks that both
+paths produce the same JSON.
+"""
+from typing import Any
+
+import orjson
+from starlette.responses import Response
+
+# Z for UTC, like pydantic; other offsets are kept as +hh:mm
+ORJSON_OPTIONS = orjson.OPT_UTC_Z
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -1,15 +1,24 @@
 import os
 import uuid
+from datetime import datetime
 from typing import Optional, Any, List
 
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query, Request
 
 import app.service as service
-from app import queue
+from app import backpressure, conditional, queue, timelines
 from app.schemas import PostOut
 
 router = APIRouter()
 
+
+def _shed(e: backpressure.Backpressure) -> HTTPException:
+    return HTTPException(
+        status_code=e.status_code,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after_s)},
+    )
+
 ALLOWED_CONTENT_TYPES = {"image/jpeg", "image/png"}
 
 
@@ -46,6 +55,12 @@ async def create_post(
         if image.content_type not in ALLOWED_CONTENT_TYPES:
             raise HTTPException(status_code=400, detail="Only PNG and JPG images are allowed.")
 
+        # refuse before writing the upload (only when QUEUE_MAX_DEPTH_RESIZE is set)
+        try:
+            backpressure.admit("resize")
+        except backpressure.Backpressure as e:
+            raise _shed(e)
+
         ext = ".jpg" if image.content_type == "image/jpeg" else ".png"
         filename = f"{uuid.uuid4().hex}{ext}"
 
@@ -68,7 +83,7 @@ async def create_post(
         )
 
         if filename is not None:
-            queue.publish_resize_job(filename)
+            queue.publish_resize_job(filename, post_id)
 
         response: dict[str, Any] = {"id": post_id}
         if filename is not None:
@@ -84,36 +99,73 @@ async def create_post(
 
 @router.get("/posts/search", response_model=List[PostOut])
 def search_posts(
+    request: Request,
     q: str = Query(..., title="Search Query", description="Search in post content and usernames"),
 ):
     try:
-        return service.search_posts(q)
+        return conditional.feed_response(request, service.search_posts(q))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/posts", response_model=List[PostOut])
 def get_posts(
+    request: Request,
     user: Optional[str] = Query(None, description="Filter posts by exact username"),
-    order_by: str = Query("created_at", pattern="^(created_at|id)$"),
-    order_dir: str = Query("desc", pattern="^(asc|desc)$"),
+    order_by: Optional[str] = Query(
+        None, pattern="^(created_at|updated_at|id)$", description="Default created_at, or updated_at with since"
+    ),
+    order_dir: Optional[str] = Query(None, pattern="^(asc|desc)$", description="Default desc, or asc with since"),
     limit: Optional[int] = Query(None, ge=1, le=1000),
+    since: Optional[datetime] = Query(
+        None, description="Only posts changed after this time (poll with the X-Next-Since response header)"
+    ),
+    since_id: Optional[int] = Query(
+        None, description="With since: also posts changed at exactly `since` with a larger id (X-Next-Since-Id)"
+    ),
 ):
-    return service.get_posts(username=user, order_by=order_by, order_dir=order_dir, limit=limit)
+    if since is not None:
+        order_by, order_dir = order_by or "updated_at", order_dir or "asc"
+    query = dict(
+        username=user,
+        order_by=order_by or "created_at",
+        order_dir=order_dir or "desc",
+        limit=limit,
+        since=since,
+        since_id=since_id,
+    )
+    polling = since is not None and query["order_by"] == "updated_at" and query["order_dir"] == "asc"
+
+    # revalidation: answer 304 from (id, updated_at) alone, before loading any post
+    if request.headers.get("if-none-match"):
+        validators = service.get_posts_validators(**query)
+        etag = conditional.feed_etag(validators)
+        if conditional.etag_matches(request.headers["if-none-match"], etag):
+            headers = conditional.next_since_headers(since, validators, limit) if polling else None
+            return conditional.not_modified(etag, headers)
+
+    # trusted service output: skip response_model re-validation (see app/responses.py)
+    posts = service.get_posts(**query)
+    headers = None
+    if polling:
+        headers = conditional.next_since_headers(since, [(p["id"], p["updated_at"]) for p in posts], limit)
+    return conditional.feed_response(request, posts, headers)
 
 @router.post("/posts/{post_id}/sentiment", response_model=PostOut, status_code=202)
 def analyze_sentiment(post_id: int):
     try:
         return service.request_sentiment_analysis(post_id)
+    except backpressure.Backpressure as e:
+        raise _shed(e)
     except ValueError as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/posts/{post_id}", response_model=PostOut)
-def get_post(post_id: int):
+def get_post(post_id: int, request: Request):
     post = service.get_post_by_id(post_id)
     if post is None:
         raise HTTPException(status_code=404, detail="Post not found")
-    return post
+    return conditional.post_response(request, post)
 
 
 @router.post("/posts/{post_id}/describe", status_code=202)
@@ -133,9 +185,59 @@ def describe_image(post_id: int):
     if status == "PENDING":
         return {"status": "PENDING"}
 
-    # NONE or FAILED → retry
+    # NONE or FAILED → retry, unless the describe queue is shedding
+    try:
+        backpressure.admit("describe")
+    except backpressure.Backpressure as e:
+        raise _shed(e)
+
     service.mark_description_pending(post_id)
     queue.publish_describe_job(post_id)
 
     return {"status": "PENDING"}
 
+
+
+@router.get("/users/{username}/timeline", response_model=List[PostOut])
+def home_timeline(
+    request: Request,
+    username: str,
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0, description="Timelines keep the newest TIMELINE_MAX_ENTRIES posts"),
+):
+    """The user's posts and those of the users they follow, newest first (precomputed)."""
+    return conditional.feed_response(request, service.home_timeline(username, limit, offset))
+
+
+@router.get("/users/{username}/following", response_model=List[str])
+def get_following(username: str):
+    return timelines.following(username)
+
+
+@router.put("/users/{username}/following/{followee}")
+def follow_user(username: str, followee: str):
+    try:
+        added = timelines.follow(username, followee)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"following": followee, "timeline_added": added}
+
+
+@router.delete("/users/{username}/following/{followee}")
+def unfollow_user(username: str, followee: str):
+    removed = timelines.unfollow(username, followee)
+    return {"unfollowed": followee, "timeline_removed": removed}
+
+
+@router.get("/queues")
+def queue_status():
+    """Depth, consumers and shedding limit per job queue (cached for QUEUE_DEPTH_CACHE_S)."""
+    return backpressure.monitor.snapshot()
+
+
+@router.get("/enrichment/latency")
+def enrichment_latency(
+    minutes: int = Query(60, ge=1, le=7 * 24 * 60, description="Look-back window"),
+):
+    """p50/p95/p99 from enqueue to READY per enrichment kind (resize, sentiment, describe)."""
+    return service.enrichment_latency(minutes)
@@ -12,9 +12,14 @@ class PostOut(BaseModel):
     id: int
     image_filename: Optional[str] = None
     image_status: ImageStatus
+    image_width: Optional[int] = None
+    image_height: Optional[int] = None
+    image_placeholder: Optional[str] = None
+    image_dominant_color: Optional[str] = None
     content: Optional[str] = None
     username: str
     created_at: datetime
+    updated_at: datetime
     sentiment_status: str
     sentiment_label: str | None
     sentiment_score: float | None
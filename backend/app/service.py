@@ -1,11 +1,12 @@
-from datetime import datetime
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import Optional
 
 import os
 
-from sqlalchemy import select, or_
+from sqlalchemy import select, or_, text, tuple_
 
+from app import backpressure, timelines
 from app.db import SessionLocal
 from app.models import Post
 from app.queue import publish_sentiment_job
@@ -71,7 +72,15 @@ def add_post(
         db.add(post)
         db.commit()
         db.refresh(post)
-        return post.id
+        post_id, created_at = post.id, post.created_at
+
+    # separate transaction: the post exists even if this fails, and
+    # rebuild_timelines.py can repair the timelines afterwards
+    try:
+        timelines.fan_out(post_id, username, created_at)
+    except Exception as e:
+        print(f"[timelines] Fan-out of post {post_id} failed: {e}")
+    return post_id
 
 def get_latest_post():
     posts = get_posts(limit=1, order_by="created_at", order_dir="desc")
@@ -95,13 +104,15 @@ def search_posts(query: str):
         return [_to_dict(p) for p in rows]
 
 
-def get_posts(
-    username: Optional[str] = None,
-    order_by: str = "created_at",
-    order_dir: str = "desc",
-    limit: Optional[int] = None,
+def _posts_query(
+    username: Optional[str],
+    order_by: str,
+    order_dir: str,
+    limit: Optional[int],
+    since: Optional[datetime],
+    since_id: Optional[int],
 ):
-    order_by_map = {"created_at": Post.created_at, "id": Post.id}
+    order_by_map = {"created_at": Post.created_at, "updated_at": Post.updated_at, "id": Post.id}
     col = order_by_map.get(order_by, Post.created_at)
     col = col.asc() if order_dir.lower() == "asc" else col.desc()
 
@@ -110,45 +121,145 @@ def get_posts(
     if username:
         stmt = stmt.where(Post.username == username)
 
+    if since is not None:
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        if since_id is None:
+            stmt = stmt.where(Post.updated_at > since)
+        else:
+            # keyset continuation: posts changed at exactly `since` with a larger id, then later ones
+            stmt = stmt.where(tuple_(Post.updated_at, Post.id) > tuple_(since, since_id))
+
     # stable ordering (matches your old SQL behavior)
     stmt = stmt.order_by(col, Post.id.asc() if order_dir.lower() == "asc" else Post.id.desc())
 
     if limit is not None:
         stmt = stmt.limit(limit)
+    return stmt
+
+
+def get_posts(
+    username: Optional[str] = None,
+    order_by: str = "created_at",
+    order_dir: str = "desc",
+    limit: Optional[int] = None,
+    since: Optional[datetime] = None,
+    since_id: Optional[int] = None,
+):
+    """
+    Posts, optionally only those changed after `since` (naive times are UTC),
+    or changed at `since` with an id above `since_id`.
+    """
+    stmt = _posts_query(username, order_by, order_dir, limit, since, since_id)
 
     with SessionLocal() as db:
         rows = db.execute(stmt).scalars().all()
         return [_to_dict(p) for p in rows]
 
 
+def get_posts_validators(
+    username: Optional[str] = None,
+    order_by: str = "created_at",
+    order_dir: str = "desc",
+    limit: Optional[int] = None,
+    since: Optional[datetime] = None,
+    since_id: Optional[int] = None,
+) -> list[tuple[int, datetime]]:
+    """
+    (id, updated_at) of the posts get_posts() would return, in the same
+    order, without loading or converting the rows: enough to compute the
+    page's ETag (app/conditional.py) and answer 304.
+    """
+    stmt = _posts_query(username, order_by, order_dir, limit, since, since_id).with_only_columns(
+        Post.id, Post.updated_at
+    )
+    with SessionLocal() as db:
+        return [(row.id, row.updated_at) for row in db.execute(stmt)]
+
+
+HOME_TIMELINE_SQL = text(
+    """
+    SELECT post.* FROM post
+    WHERE username IN (SELECT followee FROM follow WHERE follower = :username UNION ALL SELECT :username)
+    ORDER BY created_at DESC, id DESC
+    LIMIT :limit OFFSET :offset
+    """
+)
+
+
+def home_timeline(username: str, limit: int = 50, offset: int = 0) -> list[dict]:
+    """
+    `username`'s posts and those of the users they follow, newest first, read
+    from the precomputed timeline: ids from one index range, then a single
+    batched query for the posts (bounded by created_at, so only the
+    partitions those ids live in are searched).
+    """
+    entries = timelines.page(username, limit, offset)
+    if not entries:
+        return []
+    times = [created_at for _, created_at in entries]
+    stmt = select(Post).where(
+        Post.id.in_([post_id for post_id, _ in entries]),
+        Post.created_at >= min(times),
+        Post.created_at <= max(times),
+    )
+    with SessionLocal() as db:
+        by_id = {p.id: p for p in db.execute(stmt).scalars()}
+        return [_to_dict(by_id[post_id]) for post_id, _ in entries if post_id in by_id]
+
+
+def home_timeline_on_the_fly(username: str, limit: int = 50, offset: int = 0) -> list[dict]:
+    """The same timeline merged from post on every call (the benchmark's reference)."""
+    stmt = select(Post).from_statement(HOME_TIMELINE_SQL)
+    params = {"username": username, "limit": limit, "offset": offset}
+    with SessionLocal() as db:
+        return [_to_dict(p) for p in db.execute(stmt, params).scalars()]
+
+
 def _to_dict(p: Post) -> dict:
     return {
         "id": p.id,
         "image_filename": p.image_filename,
         "image_status": p.image_status,
+        "image_width": getattr(p, "image_width", None),
+        "image_height": getattr(p, "image_height", None),
+        "image_placeholder": getattr(p, "image_placeholder", None),
+        "image_dominant_color": getattr(p, "image_dominant_color", None),
         "image_description": getattr(p, "image_description", None),
         "description_status": getattr(p, "description_status", None),
         "content": p.content,
         "username": p.username,
         "created_at": p.created_at,
+        "updated_at": p.updated_at,
         "sentiment_status": getattr(p, "sentiment_status", None),
         "sentiment_label": getattr(p, "sentiment_label", None),
         "sentiment_score": getattr(p, "sentiment_score", None),
     }
 
 def request_sentiment_analysis(post_id: int) -> dict:
-    """Set sentiment_status to PENDING and enqueue a sentiment job."""
+    """
+    Set sentiment_status to PENDING and enqueue a sentiment job.
+    Raises backpressure.Backpressure when the sentiment queue is shedding.
+    """
+    post = get_post_by_id(post_id)
+    if post is None:
+        raise ValueError("Post not found")
+
+    if not post["content"]:
+        raise ValueError("Post has no content for sentiment analysis")
+
+    if post["sentiment_status"] == "PENDING":
+        return post
+
+    # between the read and the write, so no DB connection is held while the
+    # broker is asked, and a refused request leaves the post as it was
+    backpressure.admit("sentiment")
+
     with SessionLocal() as db:
         post = db.get(Post, post_id)
         if post is None:
             raise ValueError("Post not found")
 
-        if not post.content:
-            raise ValueError("Post has no content for sentiment analysis")
-
-        if post.sentiment_status == "PENDING":
-            return _to_dict(post)
-
         post.sentiment_status = "PENDING"
         db.commit()
         db.refresh(post)
@@ -181,3 +292,57 @@ def mark_description_pending(post_id: int) -> None:
 
         db.commit()
 
+
+
+ENRICHMENT_LATENCY_SQL = text(
+    """
+    SELECT
+      kind,
+      count(*) AS jobs,
+      count(*) FILTER (WHERE status = 'FAILED') AS failed,
+      percentile_cont(ARRAY[0.5, 0.95, 0.99]) WITHIN GROUP (
+        ORDER BY extract(epoch FROM completed_at - enqueued_at)
+      ) FILTER (WHERE status = 'READY') AS total_s,
+      percentile_cont(ARRAY[0.5, 0.95, 0.99]) WITHIN GROUP (
+        ORDER BY extract(epoch FROM started_at - enqueued_at)
+      ) FILTER (WHERE status = 'READY') AS queue_wait_s,
+      percentile_cont(ARRAY[0.5, 0.95, 0.99]) WITHIN GROUP (
+        ORDER BY extract(epoch FROM completed_at - started_at)
+      ) FILTER (WHERE status = 'READY') AS processing_s
+    FROM enrichment_trace
+    WHERE completed_at >= now() - make_interval(mins => :minutes)
+      AND enqueued_at IS NOT NULL
+    GROUP BY kind
+    ORDER BY kind
+    """
+)
+
+
+def _percentiles_ms(values: Optional[list[float]]) -> Optional[dict]:
+    if values is None:
+        return None
+    return {name: round(v * 1000, 1) for name, v in zip(("p50", "p95", "p99"), values)}
+
+
+def enrichment_latency(window_minutes: int = 60) -> dict:
+    """
+    Enqueue-to-READY latency percentiles per enrichment kind over the last
+    `window_minutes`, split into queue wait and processing. Failed jobs are
+    counted but left out of the percentiles.
+    """
+    with SessionLocal() as db:
+        rows = db.execute(ENRICHMENT_LATENCY_SQL, {"minutes": window_minutes}).mappings().all()
+
+    return {
+        "window_minutes": window_minutes,
+        "kinds": {
+            row["kind"]: {
+                "jobs": row["jobs"],
+                "failed": row["failed"],
+                "total_ms": _percentiles_ms(row["total_s"]),
+                "queue_wait_ms": _percentiles_ms(row["queue_wait_s"]),
+                "processing_ms": _percentiles_ms(row["processing_s"]),
+            }
+            for row in rows
+        },
+    }
@@ -0,0 +1,47 @@
+"""
+Statement statistics for app.db.engine.
+
+The hook itself is worker_runtime.sqlstats, shared with the workers (see
+there for the fingerprinting, slow-query logging, sampled EXPLAIN plans and
+the SLOW_QUERY_* settings). Here it counts slow statements in
+db_slow_statements_total, tags their log lines with the request's trace
+id, and serves the top offenders at GET /debug/sql (DELETE resets them).
+
+Stats are per process (per uvicorn worker).
+"""
+from fastapi import APIRouter, HTTPException, Query
+from sqlalchemy.engine import Engine
+from worker_runtime import sqlstats
+from worker_runtime.sqlstats import STATS
+
+from app import metrics
+from app.tracing import request_trace_id
+
+
+def install(engine: Engine) -> None:
+    sqlstats.install(
+        engine,
+        "backend",
+        on_slow=metrics.DB_SLOW_STATEMENTS.inc,
+        trace_id=request_trace_id,
+    )
+
+
+router = APIRouter()
+
+
+@router.get("/debug/sql", include_in_schema=False)
+def top_statements(
+    limit: int = Query(20, ge=1, le=500),
+    order: str = Query("total"),
+) -> list[dict]:
+    try:
+        return STATS.top(limit, order)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.delete("/debug/sql", include_in_schema=False)
+def reset_statements() -> dict:
+    STATS.reset()
+    return {"status": "reset"}
@@ -0,0 +1,78 @@
+import hashlib
+import os
+
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, PathLike, StaticFiles
+from starlette.types import Scope
+
+# Uploaded filenames are random and files are only ever renamed into place
+# complete (never rewritten in place), so a served image can be cached
+# forever by browsers and CDNs.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def _webp_variants_enabled() -> bool:
+    return os.getenv("STATIC_WEBP_VARIANTS", "0").lower() in ("1", "true", "yes")
+
+
+def _accepts_webp(scope: Scope) -> bool:
+    return "image/webp" in Headers(scope=scope).get("accept", "")
+
+
+def strong_etag(path: str, stat_result: os.stat_result) -> str:
+    """
+    Validator from the path, size and mtime. Every backend replica reads the
+    same uploads volume, so they all answer with the same ETag; a file that is
+    ever replaced (resize-worker renames reduced images into place) gets a
+    new one even at the same size.
+    """
+    digest = hashlib.sha1(
+        f"{path}:{stat_result.st_size}:{stat_result.st_mtime_ns}".encode(), usedforsecurity=False
+    ).hexdigest()
+    return f'"{digest}"'
+
+
+class ImageStaticFiles(StaticFiles):
+    """
+    StaticFiles for uploads/original and uploads/reduced.
+
+    - long-lived immutable Cache-Control and strong ETags
+    - Range requests and zero-copy sends are handled by FileResponse
+    - optionally serves a precomputed `<name>.webp` sibling when the client
+      accepts WebP (enable with STATIC_WEBP_VARIANTS=1)
+    """
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if _webp_variants_enabled() and not path.endswith(".webp") and _accepts_webp(scope):
+            try:
+                return await super().get_response(f"{path}.webp", scope)
+            except HTTPException:
+                # no variant for this file -> fall through to the original
+                pass
+        return await super().get_response(path, scope)
+
+    def file_response(
+        self,
+        full_path: PathLike,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        headers = {
+            "cache-control": IMMUTABLE_CACHE_CONTROL,
+            "etag": strong_etag(os.path.relpath(full_path, self.directory), stat_result),
+        }
+        if _webp_variants_enabled():
+            headers["vary"] = "Accept"
+
+        response = FileResponse(
+            full_path,
+            status_code=status_code,
+            stat_result=stat_result,
+            headers=headers,
+        )
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -0,0 +1,194 @@
+"""
+Precomputed home timelines (fan-out on write).
+
+Every user's home timeline is their own posts plus those of the users they
+follow. Instead of merging those authors' posts on each read, the
+`timeline` table keeps the newest TIMELINE_MAX_ENTRIES (default 800)
+(created_at, post_id) pairs per user:
+
+    add_post   -> fan_out(): one INSERT ... SELECT into the author's and every
+                  follower's timeline, after the post has committed
+    follow     -> the followee's newest posts are copied in
+    unfollow   -> the followee's entries are removed
+
+Timelines are capped lazily: a fan-out trims each touched timeline with
+probability 1 / TIMELINE_TRIM_EVERY (default 20), so a timeline holds at
+most about cap + TRIM_EVERY entries and the trim cost is amortized.
+rebuild() recomputes a timeline from scratch (see rebuild_timelines.py).
+"""
+import os
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import text
+
+from app.db import engine
+
+
+def max_entries() -> int:
+    return int(os.getenv("TIMELINE_MAX_ENTRIES", "800"))
+
+
+def _trim_probability() -> float:
+    return 1 / max(1, int(os.getenv("TIMELINE_TRIM_EVERY", "20")))
+
+
+FAN_OUT_SQL = text(
+    """
+    INSERT INTO timeline (username, created_at, post_id, author)
+    SELECT follower, :created_at, :post_id, :author FROM follow WHERE followee = :author
+    UNION ALL
+    SELECT :author, :created_at, :post_id, :author
+    ON CONFLICT DO NOTHING
+    """
+)
+
+# {targets} selects the usernames whose timelines to cut back to :cap entries
+_TRIM_SQL = """
+    WITH targets AS ({targets}),
+    cutoff AS (
+      SELECT t.username, c.created_at, c.post_id
+      FROM targets t
+      CROSS JOIN LATERAL (
+        SELECT created_at, post_id FROM timeline tl
+        WHERE tl.username = t.username
+        ORDER BY created_at DESC, post_id DESC
+        OFFSET :cap LIMIT 1
+      ) c
+    )
+    DELETE FROM timeline tl USING cutoff c
+    WHERE tl.username = c.username
+      AND (tl.created_at, tl.post_id) <= (c.created_at, c.post_id)
+"""
+
+TRIM_FOLLOWERS_SQL = text(
+    _TRIM_SQL.format(
+        targets="""
+        SELECT follower AS username FROM follow WHERE followee = :author AND random() < :p
+        UNION ALL
+        SELECT CAST(:author AS TEXT) WHERE random() < :p
+        """
+    )
+)
+
+TRIM_USER_SQL = text(_TRIM_SQL.format(targets="SELECT CAST(:username AS TEXT) AS username"))
+
+BACKFILL_SQL = text(
+    """
+    INSERT INTO timeline (username, created_at, post_id, author)
+    SELECT :follower, created_at, id, username FROM post
+    WHERE username = :followee
+    ORDER BY created_at DESC, id DESC
+    LIMIT :cap
+    ON CONFLICT DO NOTHING
+    """
+)
+
+REBUILD_SQL = text(
+    """
+    INSERT INTO timeline (username, created_at, post_id, author)
+    SELECT :username, created_at, id, username FROM post
+    WHERE username IN (SELECT followee FROM follow WHERE follower = :username UNION ALL SELECT :username)
+    ORDER BY created_at DESC, id DESC
+    LIMIT :cap
+    """
+)
+
+TIMELINE_PAGE_SQL = text(
+    """
+    SELECT post_id, created_at FROM timeline
+    WHERE username = :username
+    ORDER BY created_at DESC, post_id DESC
+    LIMIT :limit OFFSET :offset
+    """
+)
+
+
+def fan_out(post_id: int, author: str, created_at: datetime) -> int:
+    """Put a new post into its author's and followers' timelines; returns rows added."""
+    params = {"post_id": post_id, "author": author, "created_at": created_at}
+    with engine.begin() as conn:
+        added = conn.execute(FAN_OUT_SQL, params).rowcount
+        conn.execute(TRIM_FOLLOWERS_SQL, {"author": author, "p": _trim_probability(), "cap": max_entries()})
+    return added
+
+
+def follow(follower: str, followee: str) -> int:
+    """Follow `followee` and copy their newest posts in; returns rows added."""
+    if follower == followee:
+        raise ValueError("Users cannot follow themselves")
+    with engine.begin() as conn:
+        inserted = conn.execute(
+            text("INSERT INTO follow (follower, followee) VALUES (:follower, :followee) ON CONFLICT DO NOTHING"),
+            {"follower": follower, "followee": followee},
+        ).rowcount
+        if not inserted:
+            return 0
+        added = conn.execute(
+            BACKFILL_SQL, {"follower": follower, "followee": followee, "cap": max_entries()}
+        ).rowcount
+        conn.execute(TRIM_USER_SQL, {"username": follower, "cap": max_entries()})
+    return added
+
+
+def unfollow(follower: str, followee: str) -> int:
+    """Stop following `followee` and drop their posts; returns rows removed."""
+    with engine.begin() as conn:
+        conn.execute(
+            text("DELETE FROM follow WHERE follower = :follower AND followee = :followee"),
+            {"follower": follower, "followee": followee},
+        )
+        return conn.execute(
+            text("DELETE FROM timeline WHERE username = :follower AND author = :followee"),
+            {"follower": follower, "followee": followee},
+        ).rowcount
+
+
+def following(username: str) -> list[str]:
+    with engine.connect() as conn:
+        return list(
+            conn.execute(
+                text("SELECT followee FROM follow WHERE follower = :username ORDER BY followee"),
+                {"username": username},
+            ).scalars()
+        )
+
+
+def page(username: str, limit: int, offset: int = 0) -> list[tuple[int, datetime]]:
+    """(post_id, created_at) of one page of `username`'s timeline, newest first."""
+    with engine.connect() as conn:
+        return [
+            (row.post_id, row.created_at)
+            for row in conn.execute(
+                TIMELINE_PAGE_SQL, {"username": username, "limit": limit, "offset": offset}
+            )
+        ]
+
+
+def rebuild(username: str) -> int:
+    """Recompute `username`'s timeline from follow and post; returns its size."""
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM timeline WHERE username = :username"), {"username": username})
+        return conn.execute(REBUILD_SQL, {"username": username, "cap": max_entries()}).rowcount
+
+
+def timeline_users(after: Optional[str] = None, batch: int = 1000) -> list[str]:
+    """Users who can have a timeline (followers and authors), in name order, paged by `after`."""
+    with engine.connect() as conn:
+        return list(
+            conn.execute(
+                text(
+                    """
+                    SELECT username FROM (
+                      SELECT follower AS username FROM follow
+                      UNION
+                      SELECT DISTINCT username FROM post
+                    ) u
+                    WHERE CAST(:after AS TEXT) IS NULL OR username > :after
+                    ORDER BY username
+                    LIMIT :batch
+                    """
+                ),
+                {"after": after, "batch": batch},
+            ).scalars()
+        )
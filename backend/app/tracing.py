@@ -0,0 +1,61 @@
+"""
+Trace ids for enrichment jobs.
+
+TraceMiddleware gives every request a trace id (the caller's X-Trace-Id when
+it looks sane, else a new one) and echoes it in the response. The queue
+publishers copy it into the AMQP headers, the workers write one
+enrichment_trace row per job, and /enrichment/latency reports percentiles
+from those rows.
+"""
+import re
+import uuid
+from contextvars import ContextVar
+from typing import Optional
+
+TRACE_HEADER = b"x-trace-id"
+
+_VALID_TRACE_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+_current_trace_id: ContextVar[Optional[str]] = ContextVar("trace_id", default=None)
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+
+def current_trace_id() -> str:
+    """Trace id of the current request; a fresh one outside a request."""
+    return _current_trace_id.get() or new_trace_id()
+
+
+def request_trace_id() -> Optional[str]:
+    """Trace id of the current request, or None outside one."""
+    return _current_trace_id.get()
+
+
+class TraceMiddleware:
+    """Pure ASGI middleware; the id reaches sync routes via the copied context."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope["headers"]).get(TRACE_HEADER, b"").decode("latin-1")
+        trace_id = incoming if _VALID_TRACE_ID.match(incoming) else new_trace_id()
+        token = _current_trace_id.set(trace_id)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (TRACE_HEADER, trace_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_trace_id.reset(token)
@@ -0,0 +1,146 @@
+"""
+CPU time and bytes on the wire of the /posts response path, without a database.
+
+Feeds of --rows posts (realistic rows from benchmark_service.generate_posts)
+are served through two in-process ASGI apps:
+
+    pydantic   the previous path: response_model validation + stdlib json,
+               no compression
+    fast       app.main's middleware stack and /posts route: orjson, no
+               re-validation, gzip / brotli negotiated from Accept-Encoding
+
+    uv run python benchmark_responses.py
+    uv run python benchmark_responses.py --rows 100 1000 --requests 300 --json responses.json
+
+CPU is process time per response (all threads, so thread-offloaded
+compression counts), bytes are the response body as sent.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import random
+import time
+from typing import List
+
+from fastapi import FastAPI
+
+import app.service as service
+from app.main import create_app
+from app.schemas import PostOut
+from benchmark_service import COPY_COLUMNS, generate_posts
+
+ENCODINGS = {"identity": "identity", "gzip": "gzip", "br": "br, gzip"}
+
+
+def feed_rows(count: int, seed: int) -> list[dict]:
+    """Rows shaped like service._to_dict output, newest first."""
+    rng = random.Random(seed)
+    rows = []
+    for i, values in enumerate(generate_posts(count, seed)):
+        row = dict(zip(COPY_COLUMNS, values))
+        row["id"] = count - i
+        row["updated_at"] = row["created_at"]
+        # reduced-image placeholders are ~32px JPEG data URIs: incompressible base64
+        row["image_placeholder"] = (
+            "data:image/jpeg;base64," + base64.b64encode(rng.randbytes(600)).decode()
+            if row["image_filename"] else None
+        )
+        rows.append(row)
+    rows.reverse()
+    return rows
+
+
+def pydantic_app(rows: list[dict]) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/posts", response_model=List[PostOut])
+    def get_posts():
+        return rows
+
+    return app
+
+
+async def request(app, accept_encoding: str) -> tuple[int, bytes, dict]:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/posts",
+        "raw_path": b"/posts",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench"), (b"accept-encoding", accept_encoding.encode())],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    start = next(m for m in messages if m["type"] == "http.response.start")
+    body = b"".join(m.get("body", b"") for m in messages if m["type"] == "http.response.body")
+    headers = {k.decode(): v.decode() for k, v in start["headers"]}
+    return start["status"], body, headers
+
+
+async def measure(app, accept_encoding: str, requests: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        await request(app, accept_encoding)
+    cpu_started, wall_started = time.process_time(), time.perf_counter()
+    for _ in range(requests):
+        status, body, headers = await request(app, accept_encoding)
+    cpu = time.process_time() - cpu_started
+    wall = time.perf_counter() - wall_started
+    assert status == 200, status
+    return {
+        "cpu_ms": round(cpu * 1000 / requests, 3),
+        "wall_ms": round(wall * 1000 / requests, 3),
+        "bytes": len(body),
+        "encoding": headers.get("content-encoding", "identity"),
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    results = {}
+    for count in args.rows:
+        rows = feed_rows(count, args.seed)
+        service.get_posts = lambda *a, _rows=rows, **kw: _rows
+        apps = {"pydantic": pydantic_app(rows), "fast": create_app()}
+        for app_name, app in apps.items():
+            encodings = ["identity"] if app_name == "pydantic" else list(ENCODINGS)
+            for encoding in encodings:
+                name = f"{app_name}[rows={count},{encoding}]"
+                entry = await measure(app, ENCODINGS[encoding], args.requests, args.warmup)
+                results[name] = entry
+                print(
+                    f"{name:<34}{entry['cpu_ms']:>9.3f} ms cpu {entry['wall_ms']:>9.3f} ms wall "
+                    f"{entry['bytes']:>10} B  ({entry['encoding']})"
+                )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,424 @@
+"""
+Micro-benchmarks for app.service against a large seeded post table, with JSON
+baselines and a comparison mode that catches query-plan and ORM regressions.
+
+Seed a dedicated database once (COPY, ~1-2 min for 1M rows), then record a
+baseline and compare later runs against it:
+
+    export DB_NAME=social_bench            # never the database you care about
+    uv run python benchmark_service.py --seed-rows 1000000 --seed-follows 2000
+    uv run python benchmark_service.py --save benchmarks/baseline.json
+    uv run python benchmark_service.py --compare benchmarks/baseline.json
+
+Each case reports min / median / p95 over --repeat runs after --warmup runs,
+the number of rows it returned and, for SQL cases, the shape of the plan
+Postgres chose (node types and indexes). --compare flags a case whose median
+grew by more than --threshold (and by at least --min-delta-ms) or whose plan
+shape changed, and exits with status 1 if any did.
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Optional
+
+import sqlalchemy
+from sqlalchemy import event, select, text
+
+import app.service as service
+from app import partitions, timelines
+from app.db import SessionLocal, engine
+from app.models import Post
+
+RARE_WORD = "quokka"  # in ~0.01% of posts
+MEDIUM_WORD = "lantern"  # in ~1% of posts
+HOT_USER = "user1"
+
+COPY_COLUMNS = (
+    "image_filename", "image_status", "image_width", "image_height", "image_dominant_color",
+    "content", "username", "created_at", "image_description", "description_status",
+    "sentiment_status", "sentiment_label", "sentiment_score",
+)
+
+
+# -------------------------
+# Seeding
+# -------------------------
+def _vocabulary(rng: random.Random, size: int = 3000) -> list[str]:
+    syllables = ["ka", "lo", "mi", "ra", "te", "su", "vo", "ne", "pi", "da", "ro", "ze", "an", "el"]
+    words = {"".join(rng.choices(syllables, k=rng.randint(1, 4))) for _ in range(size * 2)}
+    return sorted(words)[:size]
+
+
+def generate_posts(count: int, seed: int = 42, users: int = 50_000):
+    """
+    Yield COPY rows that look like production: ids follow created_at over the
+    last year, a few users write many posts (power law), word frequencies are
+    Zipf-like, ~40% of posts have an image and most are enriched.
+    """
+    rng = random.Random(seed)
+    vocab = _vocabulary(rng)
+    weights = [1 / (rank + 1) for rank in range(len(vocab))]
+    start = datetime.now(timezone.utc) - timedelta(days=365)
+    step_s = 365 * 24 * 3600 / max(count, 1)
+
+    for i in range(count):
+        created_at = start + timedelta(seconds=i * step_s + rng.random() * step_s)
+        username = f"user{int(users * rng.random() ** 3) + 1}"
+
+        has_image = rng.random() < 0.4
+        content = None
+        if not has_image or rng.random() < 0.6:
+            words = rng.choices(vocab, weights=weights, k=rng.randint(3, 30))
+            roll = rng.random()
+            if roll < 0.0001:
+                words.append(RARE_WORD)
+            elif roll < 0.01:
+                words.append(MEDIUM_WORD)
+            content = " ".join(words)[:280]
+
+        image = (None, "READY", None, None, None, None, "NONE")
+        if has_image:
+            described = rng.random() < 0.5
+            image = (
+                f"bench-{i}.jpg",
+                "READY",
+                512,
+                rng.choice([288, 384, 512, 683]),
+                f"#{rng.randrange(0x1000000):06x}",
+                " ".join(rng.choices(vocab, k=20))[:300] if described else None,
+                "READY" if described else "NONE",
+            )
+
+        sentiment = ("NONE", None, None)
+        if content and rng.random() < 0.6:
+            sentiment = ("READY", rng.choice(["POSITIVE", "NEGATIVE"]), round(rng.uniform(0.5, 1), 4))
+
+        yield (*image[:5], content, username, created_at, *image[5:], *sentiment)
+
+
+def seed(rows: int, seed_value: int, truncate: bool) -> None:
+    with engine.connect() as conn:
+        if truncate:
+            conn.execute(text("TRUNCATE TABLE post RESTART IDENTITY"))
+            conn.commit()
+        existing = conn.execute(text("SELECT count(*) FROM post")).scalar_one()
+
+    missing = rows - existing
+    if missing <= 0:
+        print(f"[benchmark] post already has {existing} rows, nothing to seed")
+        return
+
+    # generate_posts spans the last year; give every month its partition
+    partitions.ensure_partitions(since=datetime.now(timezone.utc) - timedelta(days=366))
+
+    print(f"[benchmark] COPY {missing} posts ...")
+    started = time.perf_counter()
+    raw = engine.raw_connection()
+    try:
+        conn = raw.driver_connection
+        with conn.cursor() as cur:
+            with cur.copy(f"COPY post ({', '.join(COPY_COLUMNS)}) FROM STDIN") as copy:
+                for row in generate_posts(missing, seed_value + existing):
+                    copy.write_row(row)
+            cur.execute("ANALYZE post")
+        conn.commit()
+    finally:
+        raw.close()
+    print(f"[benchmark] seeded in {time.perf_counter() - started:.1f}s")
+
+
+def seed_follows(followers: int, per_user: int, seed_value: int, users: int = 50_000) -> None:
+    """
+    Give `followers` random users `per_user` followees each, popular authors
+    being followed more (the same skew as posting), then rebuild their
+    precomputed timelines.
+    """
+    rng = random.Random(seed_value)
+    names = [f"user{i}" for i in rng.sample(range(1, users + 1), followers)]
+    with engine.begin() as conn:
+        conn.execute(text("TRUNCATE TABLE follow, timeline"))
+
+    print(f"[benchmark] COPY ~{followers * per_user} follows ...")
+    started = time.perf_counter()
+    raw = engine.raw_connection()
+    try:
+        conn = raw.driver_connection
+        with conn.cursor() as cur:
+            with cur.copy("COPY follow (follower, followee) FROM STDIN") as copy:
+                for follower in names:
+                    followees = {f"user{int(users * rng.random() ** 3) + 1}" for _ in range(per_user)}
+                    followees.discard(follower)
+                    for followee in followees:
+                        copy.write_row((follower, followee))
+            cur.execute("ANALYZE follow")
+        conn.commit()
+    finally:
+        raw.close()
+
+    for follower in names:
+        timelines.rebuild(follower)
+    with engine.connect() as conn:
+        conn.execute(text("ANALYZE timeline"))
+    print(f"[benchmark] follows and timelines seeded in {time.perf_counter() - started:.1f}s")
+
+
+# -------------------------
+# Plans
+# -------------------------
+def _plan_shape(node: dict) -> str:
+    label = node["Node Type"]
+    target = node.get("Index Name") or node.get("Relation Name")
+    if target:
+        label += f"({target})"
+    children = [_plan_shape(child) for child in node.get("Plans", [])]
+    return label + (" > " + ", ".join(children) if children else "")
+
+
+class StatementCapture:
+    """Remembers the SQL statements the engine runs while active."""
+
+    def __init__(self) -> None:
+        self.statements: list[tuple[str, object]] = []
+
+    def __enter__(self):
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            self.statements.append((statement, parameters))
+
+
+def explain(fn: Callable[[], object]) -> Optional[str]:
+    with StatementCapture() as capture:
+        fn()
+    if not capture.statements:
+        return None
+    shapes = []
+    with engine.connect() as conn:
+        for statement, parameters in capture.statements:
+            plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar_one()
+            shapes.append(_plan_shape(plan[0]["Plan"]))
+    return " | ".join(shapes)
+
+
+# -------------------------
+# Cases
+# -------------------------
+def _result_rows(result) -> int:
+    if result is None:
+        return 0
+    return len(result) if isinstance(result, list) else 1
+
+
+Cases = dict[str, tuple[Callable[[], object], bool]]
+
+
+def build_cases(
+    sample_ids: list[int], cold_user: str, followers: list[str]
+) -> tuple[Cases, Callable[[], None]]:
+    """
+    name -> (callable, is_sql), plus a cleanup for the rows add_post created.
+    Ids are drawn from a fixed list so runs are comparable.
+    """
+    cases: Cases = {}
+
+    for user_label, user in (("all", None), ("hot_user", HOT_USER), ("cold_user", cold_user)):
+        for order_by in ("created_at", "id"):
+            for order_dir in ("desc", "asc"):
+                # an unfiltered, unlimited feed would return the whole table
+                limits = (10, 100, 1000) if user is None else (10, 100, 1000, None)
+                for limit in limits:
+                    name = f"get_posts[user={user_label},{order_by} {order_dir},limit={limit}]"
+                    cases[name] = (
+                        lambda u=user, o=order_by, d=order_dir, l=limit: service.get_posts(
+                            username=u, order_by=o, order_dir=d, limit=l
+                        ),
+                        True,
+                    )
+
+    for label, term in (("rare", RARE_WORD), ("medium", MEDIUM_WORD), ("username", cold_user)):
+        cases[f"search_posts[{label}]"] = (lambda t=term: service.search_posts(t), True)
+
+    # precomputed timeline vs the merge query it replaces, for the same users
+    if followers:
+        for limit in (20, 100):
+            for label, fn in (
+                ("precomputed", service.home_timeline),
+                ("on_the_fly", service.home_timeline_on_the_fly),
+            ):
+                users = iter(followers * 1000)
+                cases[f"home_timeline[{label},limit={limit}]"] = (
+                    lambda f=fn, u=users, l=limit: f(next(u), l), True
+                )
+
+    ids = iter(sample_ids * 1000)
+    cases["get_post_by_id"] = (lambda: service.get_post_by_id(next(ids)), True)
+    cases["get_post_by_id[missing]"] = (lambda: service.get_post_by_id(-1), True)
+
+    created: list[int] = []
+    cases["add_post[content]"] = (
+        lambda: created.append(
+            service.add_post(image_filename=None, content="benchmark post", username="bench")
+        ),
+        False,
+    )
+
+    with SessionLocal() as db:
+        posts = db.execute(select(Post).order_by(Post.id.desc()).limit(1000)).scalars().all()
+        db.expunge_all()
+    cases["_to_dict[x1000]"] = (lambda: [service._to_dict(p) for p in posts], False)
+
+    return cases, lambda: _delete(created)
+
+
+def _delete(post_ids: list[int]) -> None:
+    if post_ids:
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM timeline WHERE post_id = ANY(:ids)"), {"ids": post_ids})
+            conn.execute(text("DELETE FROM post WHERE id = ANY(:ids)"), {"ids": post_ids})
+        post_ids.clear()
+
+
+def time_case(fn: Callable[[], object], repeat: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "min_ms": round(samples[0], 3),
+        "median_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))], 3),
+        "rows": _result_rows(result),
+    }
+
+
+def run(args: argparse.Namespace) -> dict:
+    with engine.connect() as conn:
+        total = conn.execute(text("SELECT count(*) FROM post")).scalar_one()
+        max_id = conn.execute(text("SELECT coalesce(max(id), 0) FROM post")).scalar_one()
+        cold_user = conn.execute(
+            text("SELECT username FROM post GROUP BY username ORDER BY count(*), username LIMIT 1")
+        ).scalar_one_or_none() or "nobody"
+        pg_version = conn.execute(text("SHOW server_version")).scalar_one()
+        followers = list(
+            conn.execute(text("SELECT DISTINCT follower FROM follow ORDER BY follower LIMIT 50")).scalars()
+        )
+
+    rng = random.Random(args.seed)
+    sample_ids = [rng.randint(1, max(max_id, 1)) for _ in range(200)]
+    cases, cleanup = build_cases(sample_ids, cold_user, followers)
+
+    results = {}
+    try:
+        for name, (fn, is_sql) in cases.items():
+            if args.filter and args.filter not in name:
+                continue
+            entry = time_case(fn, args.repeat, args.warmup)
+            if is_sql and not args.no_plans:
+                entry["plan"] = explain(fn)
+            results[name] = entry
+            print(f"{name:<60}{entry['median_ms']:>10.2f} ms  ({entry['rows']} rows)")
+    finally:
+        cleanup()
+
+    return {
+        "meta": {
+            "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_rev": _git_rev(),
+            "post_rows": total,
+            "postgres": pg_version,
+            "sqlalchemy": sqlalchemy.__version__,
+            "python": platform.python_version(),
+            "repeat": args.repeat,
+        },
+        "cases": results,
+    }
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(current: dict, baseline: dict, threshold: float, min_delta_ms: float) -> list[str]:
+    """Print a side-by-side table; return the names of regressed cases."""
+    regressions = []
+    print(f"\nbaseline {baseline['meta'].get('git_rev')} ({baseline['meta'].get('post_rows')} rows) "
+          f"vs current {current['meta'].get('git_rev')} ({current['meta'].get('post_rows')} rows)")
+    for name, now in current["cases"].items():
+        base = baseline["cases"].get(name)
+        if base is None:
+            print(f"  NEW      {name}")
+            continue
+        ratio = now["median_ms"] / base["median_ms"] if base["median_ms"] else float("inf")
+        slower = ratio > threshold and now["median_ms"] - base["median_ms"] >= min_delta_ms
+        plan_changed = base.get("plan") != now.get("plan")
+        flag = "SLOWER" if slower else ("PLAN" if plan_changed else "ok")
+        print(f"  {flag:<8} {name:<60}{base['median_ms']:>10.2f} -> {now['median_ms']:>10.2f} ms  x{ratio:.2f}")
+        if plan_changed:
+            print(f"           plan was: {base.get('plan')}\n           plan now: {now.get('plan')}")
+        if slower or plan_changed:
+            regressions.append(name)
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seed-rows", type=int, help="top the post table up to this many rows, then exit")
+    parser.add_argument("--truncate", action="store_true", help="with --seed-rows: empty post first")
+    parser.add_argument(
+        "--seed-follows", type=int, metavar="USERS",
+        help="give USERS users --follows-per-user followees, rebuild their timelines, then exit",
+    )
+    parser.add_argument("--follows-per-user", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--filter", help="only cases whose name contains this")
+    parser.add_argument("--no-plans", action="store_true", help="skip EXPLAIN")
+    parser.add_argument("--save", metavar="PATH", help="write results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=1.25, help="median ratio counted as slower")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="ignore smaller slowdowns")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.seed_rows is not None or args.seed_follows is not None:
+        if args.seed_rows is not None:
+            seed(args.seed_rows, args.seed, args.truncate)
+        if args.seed_follows is not None:
+            seed_follows(args.seed_follows, args.follows_per_user, args.seed)
+        return
+
+    current = run(args)
+    if args.save:
+        Path(args.save).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.save).write_text(json.dumps(current, indent=2) + "\n")
+        print(f"[benchmark] baseline written to {args.save}")
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        regressions = compare(current, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) regressed")
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+"""
+Load-test the whole stack over HTTP with a mixed, seeded workload and report
+throughput, latency percentiles and error rates per endpoint.
+
+Operations (weights via --mix):
+  create    multipart POST /posts, with a generated PNG for --image-ratio of them
+  feed      GET /posts with a random limit / order / optional user filter
+  search    GET /posts/search?q=<word>
+  post      GET /posts/{id}
+  describe  create an image post, open its SSE stream, POST /posts/{id}/describe
+            and wait for the description event (upload to caption, end to end)
+Plus --sse long-lived subscribers on /events/posts/{id} held for the whole run.
+
+Run it against the compose stack with the captioning stub standing in for
+Gemini, so describe jobs cost no quota and have a controlled latency:
+
+    CAPTION_PROVIDER=stub docker compose --profile loadtest up -d --build
+    uv run --group dev python loadtest_stack.py --duration 60 --users 20 --sse 200
+
+--users N runs N closed-loop clients; --rate R switches to an open loop with
+Poisson arrivals at R ops/s, where latency is measured from the scheduled
+start so a slow server cannot hide its queueing (no coordinated omission).
+The operation sequence is fixed by --seed; interleaving still depends on timing.
+"""
+import argparse
+import asyncio
+import json
+import random
+import struct
+import time
+import uuid
+import zlib
+from collections import Counter, defaultdict
+from typing import Optional
+
+import httpx
+
+WORDS = [
+    "coffee", "sunset", "weekend", "release", "train", "garden", "concert",
+    "deadline", "holiday", "rain", "pizza", "bug", "launch", "beach", "music",
+]
+USERS = [f"lt-user-{i}" for i in range(50)]
+FEED_LIMITS = [10, 20, 50, 100, 500, None]
+DEFAULT_MIX = "create=2,feed=10,search=3,post=4,describe=1"
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def noise_png(rng: random.Random, size: int) -> bytes:
+    """Random RGB PNG built with zlib only (no Pillow needed on the load host)."""
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return (
+            struct.pack(">I", len(data))
+            + kind
+            + data
+            + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+        )
+
+    rows = b"".join(b"\x00" + rng.randbytes(size * 3) for _ in range(size))
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(rows, 1))
+        + chunk(b"IEND", b"")
+    )
+
+
+def parse_mix(spec: str) -> dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in OPERATIONS:
+            raise SystemExit(f"unknown operation in --mix: {name!r} (known: {', '.join(OPERATIONS)})")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+class Stats:
+    """Latencies and errors per endpoint; reset() drops the warm-up."""
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.started = time.perf_counter()
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, Counter] = defaultdict(Counter)
+
+    def record(self, endpoint: str, seconds: float, error: Optional[str] = None) -> None:
+        self.latencies[endpoint].append(seconds)
+        if error is not None:
+            self.errors[endpoint][error] += 1
+
+    def report(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        endpoints = {}
+        for endpoint in sorted(self.latencies):
+            values = self.latencies[endpoint]
+            errors = sum(self.errors[endpoint].values())
+            endpoints[endpoint] = {
+                "requests": len(values),
+                "per_s": round(len(values) / elapsed, 2),
+                "error_rate": round(errors / len(values), 4),
+                "errors": dict(self.errors[endpoint]),
+                "p50_ms": round(_percentile(values, 50) * 1000, 1),
+                "p95_ms": round(_percentile(values, 95) * 1000, 1),
+                "p99_ms": round(_percentile(values, 99) * 1000, 1),
+                "max_ms": round(max(values) * 1000, 1),
+            }
+        return {"elapsed_s": round(elapsed, 1), "endpoints": endpoints}
+
+
+class LoadTest:
+    def __init__(self, client: httpx.AsyncClient, args: argparse.Namespace):
+        self.client = client
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.stats = Stats()
+        self.run_id = uuid.uuid4().hex[:8]
+        self.requests = 0
+        self.post_ids: list[int] = []
+        self.image_post_ids: list[int] = []
+        self.images = [noise_png(self.rng, args.image_size) for _ in range(args.distinct_images)]
+        self.sse_events = 0
+
+    def trace_headers(self) -> dict:
+        # lets /enrichment/latency and the logs be filtered down to this run
+        self.requests += 1
+        return {"X-Trace-Id": f"lt-{self.run_id}-{self.requests}"}
+
+    async def request(
+        self, endpoint: str, method: str, url: str, scheduled: Optional[float] = None, **kwargs
+    ) -> Optional[httpx.Response]:
+        started = scheduled if scheduled is not None else time.perf_counter()
+        try:
+            resp = await self.client.request(method, url, headers=self.trace_headers(), **kwargs)
+        except httpx.HTTPError as e:
+            self.stats.record(endpoint, time.perf_counter() - started, type(e).__name__)
+            return None
+        error = None if resp.status_code < 400 else str(resp.status_code)
+        self.stats.record(endpoint, time.perf_counter() - started, error)
+        return resp if error is None else None
+
+    # -------------------------
+    # Operations
+    # -------------------------
+    async def op_create(self, scheduled=None, with_image: Optional[bool] = None) -> Optional[int]:
+        rng = self.rng
+        if with_image is None:
+            with_image = rng.random() < self.args.image_ratio
+        data = {"username": rng.choice(USERS)}
+        if not with_image or rng.random() < 0.7:
+            data["content"] = " ".join(rng.choices(WORDS, k=rng.randint(3, 20)))[:280]
+        files = None
+        if with_image:
+            files = {"image": ("lt.png", rng.choice(self.images), "image/png")}
+
+        resp = await self.request("POST /posts", "POST", "/posts", scheduled, data=data, files=files)
+        if resp is None:
+            return None
+        post_id = resp.json()["id"]
+        self.post_ids.append(post_id)
+        if with_image:
+            self.image_post_ids.append(post_id)
+        return post_id
+
+    async def op_feed(self, scheduled=None) -> None:
+        rng = self.rng
+        params = {
+            "order_by": rng.choice(["created_at", "id"]),
+            "order_dir": rng.choice(["desc", "desc", "asc"]),
+        }
+        limit = rng.choice(FEED_LIMITS)
+        if limit is not None:
+            params["limit"] = limit
+        if rng.random() < 0.3:
+            params["user"] = rng.choice(USERS)
+        await self.request("GET /posts", "GET", "/posts", scheduled, params=params)
+
+    async def op_search(self, scheduled=None) -> None:
+        q = self.rng.choice(WORDS + USERS[:5])
+        await self.request("GET /posts/search", "GET", "/posts/search", scheduled, params={"q": q})
+
+    async def op_post(self, scheduled=None) -> None:
+        if not self.post_ids:
+            await self.op_create(scheduled)
+            return
+        post_id = self.rng.choice(self.post_ids)
+        await self.request("GET /posts/{id}", "GET", f"/posts/{post_id}", scheduled)
+
+    async def op_describe(self, scheduled=None) -> None:
+        """Upload, subscribe, request a caption and time until the SSE event arrives."""
+        started = scheduled if scheduled is not None else time.perf_counter()
+        post_id = await self.op_create(with_image=True)
+        if post_id is None:
+            self.stats.record("describe (end to end)", time.perf_counter() - started, "create failed")
+            return
+
+        error = "timeout"
+        try:
+            async with asyncio.timeout(self.args.describe_timeout_s):
+                async with self.client.stream("GET", f"/events/posts/{post_id}") as resp:
+                    lines = resp.aiter_lines()
+                    async for line in lines:
+                        if line.startswith("event: ready"):
+                            break
+                    await self.request(
+                        "POST /posts/{id}/describe", "POST", f"/posts/{post_id}/describe"
+                    )
+                    async for line in lines:
+                        if line.startswith("data:"):
+                            event = json.loads(line[5:])
+                            status = event.get("description_status") or event.get("status")
+                            error = None if status == "READY" else f"status {status}"
+                            break
+        except TimeoutError:
+            pass
+        except httpx.HTTPError as e:
+            error = type(e).__name__
+        self.stats.record("describe (end to end)", time.perf_counter() - started, error)
+
+    # -------------------------
+    # Drivers
+    # -------------------------
+    def pick(self) -> str:
+        names = list(self.args.mix_weights)
+        return self.rng.choices(names, weights=[self.args.mix_weights[n] for n in names])[0]
+
+    async def closed_loop_user(self, deadline: float) -> None:
+        while time.perf_counter() < deadline:
+            await OPERATIONS[self.pick()](self)
+            if self.args.think_ms:
+                await asyncio.sleep(self.rng.expovariate(1000 / self.args.think_ms))
+
+    async def open_loop(self, deadline: float) -> None:
+        in_flight: set[asyncio.Task] = set()
+        next_at = time.perf_counter()
+        while next_at < deadline:
+            await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+            if len(in_flight) >= self.args.max_in_flight:
+                # the backlog is the signal: count it as an error rather than queue forever
+                self.stats.record("dropped (max in flight)", 0.0, "dropped")
+            else:
+                task = asyncio.create_task(OPERATIONS[self.pick()](self, scheduled=next_at))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+            next_at += self.rng.expovariate(self.args.rate)
+        if in_flight:
+            await asyncio.gather(*in_flight, return_exceptions=True)
+
+    async def sse_subscriber(self, deadline: float) -> None:
+        """Hold one stream open until the deadline, reconnecting if it drops."""
+        while time.perf_counter() < deadline:
+            post_id = self.rng.choice(self.image_post_ids or self.post_ids or [1])
+            started = time.perf_counter()
+            connected = False
+            try:
+                async with asyncio.timeout(max(0.0, deadline - time.perf_counter())):
+                    async with self.client.stream("GET", f"/events/posts/{post_id}") as resp:
+                        async for line in resp.aiter_lines():
+                            if line.startswith("event: ready") and not connected:
+                                connected = True
+                                self.stats.record("SSE connect", time.perf_counter() - started)
+                            elif line.startswith("data:") and connected:
+                                self.sse_events += 1
+            except TimeoutError:
+                return
+            except httpx.HTTPError as e:
+                self.stats.record("SSE connect", time.perf_counter() - started, type(e).__name__)
+                await asyncio.sleep(0.5)
+
+    async def run(self) -> dict:
+        args = self.args
+        for _ in range(args.seed_posts):
+            await self.op_create()
+
+        total = args.warmup_s + args.duration
+        deadline = time.perf_counter() + total
+        tasks = [asyncio.create_task(self.sse_subscriber(deadline)) for _ in range(args.sse)]
+        if args.rate:
+            tasks.append(asyncio.create_task(self.open_loop(deadline)))
+        else:
+            tasks += [asyncio.create_task(self.closed_loop_user(deadline)) for _ in range(args.users)]
+
+        if args.warmup_s:
+            await asyncio.sleep(args.warmup_s)
+            self.stats.reset()
+            self.sse_events = 0
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        report = self.stats.report()
+        report["config"] = {
+            "base_url": args.base_url,
+            "mode": f"open loop {args.rate}/s" if args.rate else f"closed loop x {args.users}",
+            "mix": args.mix,
+            "sse_subscribers": args.sse,
+            "seed": args.seed,
+            "trace_prefix": f"lt-{self.run_id}-",
+        }
+        report["sse_events_received"] = self.sse_events
+        return report
+
+
+OPERATIONS = {
+    "create": LoadTest.op_create,
+    "feed": LoadTest.op_feed,
+    "search": LoadTest.op_search,
+    "post": LoadTest.op_post,
+    "describe": LoadTest.op_describe,
+}
+
+
+def print_report(report: dict) -> None:
+    print(f"{report['config']['mode']}, {report['elapsed_s']} s measured, "
+          f"{report['config']['sse_subscribers']} SSE subscribers "
+          f"({report['sse_events_received']} events)")
+    header = f"{'endpoint':<28}{'requests':>9}{'per_s':>9}{'err%':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, e in report["endpoints"].items():
+        print(
+            f"{name:<28}{e['requests']:>9}{e['per_s']:>9}{e['error_rate'] * 100:>6.1f}%"
+            f"{e['p50_ms']:>9}{e['p95_ms']:>9}{e['p99_ms']:>9}{e['max_ms']:>9}"
+        )
+        if e["errors"]:
+            print(f"{'':<28}errors: {e['errors']}")
+
+
+async def amain(args: argparse.Namespace) -> dict:
+    limits = httpx.Limits(max_connections=args.users + args.sse + args.max_in_flight + 16)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout_s, limits=limits) as client:
+        return await LoadTest(client, args).run()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--duration", type=float, default=60, help="measured seconds")
+    parser.add_argument("--warmup-s", type=float, default=5, help="run but discard stats")
+    parser.add_argument("--users", type=int, default=10, help="closed-loop clients")
+    parser.add_argument("--rate", type=float, help="open-loop ops/s instead of --users")
+    parser.add_argument("--max-in-flight", type=int, default=200, help="open-loop cap")
+    parser.add_argument("--think-ms", type=float, default=0, help="mean pause between a user's ops")
+    parser.add_argument("--sse", type=int, default=0, help="long-lived SSE subscribers")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="operation=weight,...")
+    parser.add_argument("--image-ratio", type=float, default=0.5, help="share of creates with an image")
+    parser.add_argument("--image-size", type=int, default=256, help="edge length in px")
+    parser.add_argument("--distinct-images", type=int, default=20)
+    parser.add_argument("--seed-posts", type=int, default=50, help="posts created before the run")
+    parser.add_argument("--describe-timeout-s", type=float, default=60)
+    parser.add_argument("--timeout-s", type=float, default=30, help="per-request timeout")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", metavar="PATH", help="also write the report as JSON")
+    args = parser.parse_args()
+    args.mix_weights = parse_mix(args.mix)
+
+    report = asyncio.run(amain(args))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Maintenance of the monthly post partitions.
+
+    uv run python manage_partitions.py list
+    uv run python manage_partitions.py ensure --ahead 3 [--since 2024-01-01]
+    uv run python manage_partitions.py archive --older-than-months 12 [--tablespace archive] [--dry-run]
+
+`ensure` is what the backend already runs periodically; --since also
+creates past months, e.g. before a backfill. `archive` rewrites every cold
+partition compactly (see app/partitions.py), one at a time; put
+--tablespace (or POST_ARCHIVE_TABLESPACE) on compressed storage to also
+shrink it on disk. Writes to a partition fail while it is being archived.
+"""
+import argparse
+import os
+from datetime import datetime, timezone
+
+from app import partitions
+
+
+def _mb(n: int) -> str:
+    return f"{n / 1024 / 1024:.1f} MB"
+
+
+def cmd_list(args: argparse.Namespace) -> None:
+    print(f"{'partition':<18} {'rows (est.)':>12} {'size':>10}  {'tablespace':<12} archived")
+    for p in partitions.list_partitions():
+        archived = p.archived_at.strftime("%Y-%m-%d %H:%M") if p.archived_at else "-"
+        print(f"{p.name:<18} {p.approx_rows:>12} {_mb(p.bytes):>10}  {p.tablespace:<12} {archived}")
+
+
+def cmd_ensure(args: argparse.Namespace) -> None:
+    since = None
+    if args.since:
+        since = datetime.fromisoformat(args.since).replace(tzinfo=timezone.utc)
+    created = partitions.ensure_partitions(args.ahead, since)
+    print(f"[partitions] created {created} partition(s)")
+
+
+def cmd_archive(args: argparse.Namespace) -> None:
+    cold = partitions.cold_partitions(args.older_than_months)
+    if not cold:
+        print(f"[partitions] nothing older than {args.older_than_months} month(s) to archive")
+        return
+    for p in cold:
+        if args.dry_run:
+            print(f"[partitions] would archive {p.name} (~{p.approx_rows} rows, {_mb(p.bytes)})")
+            continue
+        print(f"[partitions] archiving {p.name} ...")
+        r = partitions.archive_partition(p.name, args.tablespace or None)
+        print(
+            f"[partitions] {r.partition}: {r.rows} rows, {_mb(r.bytes_before)} -> "
+            f"{_mb(r.bytes_after)} in {r.seconds:.1f}s"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("list", help="partitions with size and archive state").set_defaults(func=cmd_list)
+
+    ensure = sub.add_parser("ensure", help="create missing monthly partitions")
+    ensure.add_argument("--ahead", type=int, default=None, help="months after the current one")
+    ensure.add_argument("--since", help="also create months from this date (YYYY-MM-DD, UTC)")
+    ensure.set_defaults(func=cmd_ensure)
+
+    archive = sub.add_parser("archive", help="rewrite cold partitions compactly")
+    archive.add_argument("--older-than-months", type=int, default=int(os.getenv("POST_ARCHIVE_AFTER_MONTHS", "12")))
+    archive.add_argument("--tablespace", default=os.getenv("POST_ARCHIVE_TABLESPACE", ""))
+    archive.add_argument("--dry-run", action="store_true")
+    archive.set_defaults(func=cmd_archive)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
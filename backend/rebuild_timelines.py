@@ -0,0 +1,47 @@
+"""
+Recompute precomputed home timelines from the follow and post tables.
+
+    uv run python rebuild_timelines.py                 # every follower and author
+    uv run python rebuild_timelines.py --user alice --user bob
+
+Use it after deploying timelines onto existing data, after changing
+TIMELINE_MAX_ENTRIES, or when fan-out errors were logged. Each user is
+rebuilt in its own transaction, so it can run while the app is serving.
+"""
+import argparse
+import time
+
+from app import timelines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--user", action="append", help="only these users (repeatable)")
+    parser.add_argument("--batch", type=int, default=1000, help="users listed per query")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    users = entries = 0
+
+    def rebuild(username: str) -> None:
+        nonlocal users, entries
+        entries += timelines.rebuild(username)
+        users += 1
+        if users % 1000 == 0:
+            print(f"[timelines] {users} timelines, {entries} entries ...")
+
+    if args.user:
+        for username in args.user:
+            rebuild(username)
+    else:
+        after = None
+        while batch := timelines.timeline_users(after, args.batch):
+            for username in batch:
+                rebuild(username)
+            after = batch[-1]
+
+    print(f"[timelines] rebuilt {users} timelines ({entries} entries) in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
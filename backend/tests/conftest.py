@@ -28,14 +28,22 @@ def _connect():
 # Must match your current db/init.sql schema (at least columns used by tests)
 POST_TABLE_SQL = """
 CREATE TABLE IF NOT EXISTS post (
-  id                  SERIAL PRIMARY KEY,
+  id                  SERIAL,
   image_filename      TEXT,
   image_status        TEXT NOT NULL DEFAULT 'READY',
+  image_width          INTEGER,
+  image_height         INTEGER,
+  image_placeholder    TEXT,
+  image_dominant_color TEXT,
   image_description   TEXT,
   description_status  TEXT NOT NULL DEFAULT 'NONE',
+  sentiment_status    TEXT NOT NULL DEFAULT 'NONE',
+  sentiment_label     TEXT,
+  sentiment_score     REAL,
   content             TEXT,
   username            TEXT NOT NULL,
   created_at          TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  updated_at          TIMESTAMPTZ NOT NULL DEFAULT NOW(),
 
   CONSTRAINT post_content_or_image
     CHECK (content IS NOT NULL OR image_filename IS NOT NULL),
@@ -55,7 +63,52 @@ CREATE TABLE IF NOT EXISTS post (
       (image_filename IS NULL AND description_status = 'NONE')
       OR
       (image_filename IS NOT NULL AND description_status IN ('NONE', 'PENDING', 'READY', 'FAILED'))
-    )
+    ),
+
+  PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+CREATE TABLE IF NOT EXISTS post_default PARTITION OF post DEFAULT;
+CREATE OR REPLACE FUNCTION post_touch_updated_at() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  IF NEW IS DISTINCT FROM OLD AND NEW.updated_at IS NOT DISTINCT FROM OLD.updated_at THEN
+    NEW.updated_at := clock_timestamp();
+  END IF;
+  RETURN NEW;
+END
+$$;
+CREATE OR REPLACE TRIGGER post_touch_updated_at
+  BEFORE UPDATE ON post
+  FOR EACH ROW EXECUTE FUNCTION post_touch_updated_at();
+"""
+
+ENRICHMENT_TRACE_SQL = """
+CREATE TABLE IF NOT EXISTS enrichment_trace (
+  trace_id      TEXT NOT NULL,
+  kind          TEXT NOT NULL,
+  post_id       INTEGER,
+  enqueued_at   TIMESTAMPTZ,
+  started_at    TIMESTAMPTZ NOT NULL,
+  completed_at  TIMESTAMPTZ NOT NULL,
+  status        TEXT NOT NULL,
+  PRIMARY KEY (trace_id, kind)
+);
+"""
+
+TIMELINE_SQL = """
+CREATE TABLE IF NOT EXISTS follow (
+  follower    TEXT NOT NULL,
+  followee    TEXT NOT NULL,
+  created_at  TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (follower, followee),
+  CONSTRAINT follow_not_self CHECK (follower <> followee)
+);
+CREATE TABLE IF NOT EXISTS timeline (
+  username    TEXT NOT NULL,
+  created_at  TIMESTAMPTZ NOT NULL,
+  post_id     INTEGER NOT NULL,
+  author      TEXT NOT NULL,
+  PRIMARY KEY (username, created_at, post_id)
 );
 """
 
@@ -75,9 +128,11 @@ def setup_db_and_env(monkeypatch):
 
     with _connect() as conn, conn.cursor() as cur:
         cur.execute(POST_TABLE_SQL)
+        cur.execute(ENRICHMENT_TRACE_SQL)
+        cur.execute(TIMELINE_SQL)
         conn.commit()
 
-        cur.execute("TRUNCATE TABLE post RESTART IDENTITY;")
+        cur.execute("TRUNCATE TABLE post, enrichment_trace, follow, timeline RESTART IDENTITY;")
         conn.commit()
 
     yield
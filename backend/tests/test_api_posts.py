@@ -38,7 +38,7 @@ def test_create_post_content_only_via_api(client: TestClient):
 
 def test_create_post_with_image_via_api(client: TestClient, monkeypatch):
     # Mock RabbitMQ publisher so tests don't require a running RabbitMQ
-    monkeypatch.setattr("app.queue.publish_resize_job", lambda filename: None)
+    monkeypatch.setattr("app.queue.publish_resize_job", lambda filename, post_id=None: None)
 
     # Minimal valid PNG (1x1)
     tiny_png = (
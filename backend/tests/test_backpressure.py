@@ -0,0 +1,140 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from pika.exceptions import ChannelClosedByBroker
+
+import app.service as service
+from app import backpressure
+from app.backpressure import QueueMonitor, QueueState
+
+
+class FakeChannel:
+    is_closed = False
+
+    def __init__(self, depths):
+        self.depths = depths
+        self.declares = 0
+
+    def queue_declare(self, queue, passive):
+        assert passive
+        self.declares += 1
+        if queue not in self.depths:
+            raise ChannelClosedByBroker(404, "NOT_FOUND")
+        messages, consumers = self.depths[queue]
+        return SimpleNamespace(method=SimpleNamespace(message_count=messages, consumer_count=consumers))
+
+
+class FakeConnection:
+    is_closed = False
+
+    def __init__(self, channel):
+        self._channel = channel
+
+    def channel(self):
+        return self._channel
+
+
+def _set_state(monkeypatch, messages, consumers):
+    monkeypatch.setattr(
+        backpressure.monitor, "state", lambda name: QueueState(messages, consumers, 0.0)
+    )
+
+
+def test_monitor_caches_passive_declares(monkeypatch):
+    channel = FakeChannel({"describe_requests": (12, 2)})
+    monkeypatch.setattr("app.backpressure.pika.BlockingConnection", lambda params: FakeConnection(channel))
+    monitor = QueueMonitor(ttl_s=60)
+
+    assert monitor.state("describe_requests")[:2] == (12, 2)
+    assert monitor.state("describe_requests")[:2] == (12, 2)
+    assert channel.declares == 1
+
+    # an undeclared queue has nothing waiting and nobody consuming
+    assert monitor.state("missing")[:2] == (0, 0)
+
+
+def test_admit_sheds_full_and_unattended_queues(monkeypatch):
+    monkeypatch.setenv("QUEUE_MAX_DEPTH_DESCRIBE", "100")
+    monkeypatch.setenv("QUEUE_RETRY_AFTER_S", "10")
+
+    _set_state(monkeypatch, 99, 1)
+    backpressure.admit("describe")
+
+    _set_state(monkeypatch, 250, 1)
+    with pytest.raises(backpressure.Backpressure) as full:
+        backpressure.admit("describe")
+    assert full.value.status_code == 429
+    assert full.value.retry_after_s == 25
+
+    # no consumers only sheds when asked to
+    _set_state(monkeypatch, 0, 0)
+    backpressure.admit("describe")
+    monkeypatch.setenv("QUEUE_REQUIRE_CONSUMERS", "1")
+    with pytest.raises(backpressure.Backpressure) as unattended:
+        backpressure.admit("describe")
+    assert unattended.value.status_code == 503
+
+    # resize is never shed by default
+    backpressure.admit("resize")
+
+
+def test_describe_returns_429_with_retry_after(client: TestClient, monkeypatch):
+    monkeypatch.setattr("app.queue.publish_resize_job", lambda filename, post_id=None: None)
+    published = []
+    monkeypatch.setattr("app.queue.publish_describe_job", published.append)
+    tiny_png = (
+        b"\x89PNG\r\n\x1a\n"
+        b"\x00\x00\x00\rIHDR"
+        b"\x00\x00\x00\x01\x00\x00\x00\x01\x08\x06\x00\x00\x00\x1f\x15\xc4\x89"
+        b"\x00\x00\x00\nIDATx\x9cc`\x00\x00\x00\x02\x00\x01\xe2!\xbc3"
+        b"\x00\x00\x00\x00IEND\xaeB`\x82"
+    )
+    post_id = client.post(
+        "/posts", data={"username": "bob"}, files={"image": ("t.png", tiny_png, "image/png")}
+    ).json()["id"]
+
+    _set_state(monkeypatch, 10_000, 3)
+    resp = client.post(f"/posts/{post_id}/describe")
+
+    assert resp.status_code == 429
+    assert int(resp.headers["retry-after"]) > 0
+    assert published == []
+    # the post stays retryable instead of sitting in PENDING
+    assert service.get_post_by_id(post_id)["description_status"] == "NONE"
+
+    _set_state(monkeypatch, 0, 3)
+    resp = client.post(f"/posts/{post_id}/describe")
+    assert resp.status_code == 202
+    assert published == [post_id]
+
+
+def test_sentiment_is_refused_before_a_session_opens(client: TestClient, monkeypatch):
+    published = []
+    monkeypatch.setattr(service, "publish_sentiment_job", published.append)
+    post_id = service.add_post(None, "hello", "alice")
+
+    sessions = []
+    real_session = service.SessionLocal
+    monkeypatch.setattr(service, "SessionLocal", lambda: sessions.append(1) or real_session())
+
+    def shed(job):
+        # only the short read before the check has come and gone
+        assert sessions == [1]
+        raise backpressure.Backpressure(job, 429, 5, "full")
+
+    monkeypatch.setattr(backpressure, "admit", shed)
+    resp = client.post(f"/posts/{post_id}/sentiment")
+    assert resp.status_code == 429
+    assert published == []
+    assert service.get_post_by_id(post_id)["sentiment_status"] == "NONE"
+
+    monkeypatch.setattr(backpressure, "admit", lambda job: None)
+    assert client.post(f"/posts/{post_id}/sentiment").status_code == 202
+    assert published == [post_id]
+
+    # an already PENDING post is returned as is, without asking the broker
+    monkeypatch.setattr(backpressure, "admit", shed)
+    resp = client.post(f"/posts/{post_id}/sentiment")
+    assert resp.status_code == 202 and resp.json()["sentiment_status"] == "PENDING"
+    assert published == [post_id]
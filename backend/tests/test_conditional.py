@@ -0,0 +1,175 @@
+from datetime import datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+import app.service as service
+from app import conditional
+from app.db import SessionLocal
+from app.main import app
+
+T0 = datetime(2026, 10, 19, 12, 0, 0, 250000, tzinfo=timezone.utc)
+
+
+def _post(post_id: int, updated_at: datetime) -> dict:
+    return {"id": post_id, "content": f"post {post_id}", "updated_at": updated_at}
+
+
+def test_etags_change_with_ids_order_and_updated_at():
+    page = [(2, T0), (1, T0)]
+    tag = conditional.feed_etag(page)
+    assert tag.startswith('W/"f') and tag == conditional.feed_etag(list(page))
+    assert tag != conditional.feed_etag(page[::-1])
+    assert tag != conditional.feed_etag([(2, T0 + timedelta(microseconds=1)), (1, T0)])
+    assert tag != conditional.feed_etag(page[:1])
+    # the same instant in another zone is the same version
+    assert conditional.post_etag(1, T0) == conditional.post_etag(1, T0.astimezone(timezone(timedelta(hours=2))))
+
+
+def test_if_none_match_uses_weak_comparison():
+    tag = conditional.post_etag(7, T0)
+    assert conditional.etag_matches(tag, tag)
+    assert conditional.etag_matches(tag.removeprefix("W/"), tag)
+    assert conditional.etag_matches(f'"other", {tag}', tag)
+    assert conditional.etag_matches("*", tag)
+    assert not conditional.etag_matches('W/"other"', tag)
+    assert not conditional.etag_matches(None, tag)
+
+
+def test_next_since_overlaps_partial_pages_and_continues_full_ones(monkeypatch):
+    monkeypatch.setenv("POST_SINCE_OVERLAP_S", "5")
+    since = T0 - timedelta(minutes=1)
+    assert conditional.next_since(since, [], 100) == (since, None)
+
+    page = [(4, T0 - timedelta(seconds=30)), (3, T0)]
+    assert conditional.next_since(since, page, 100) == (T0 - timedelta(seconds=5), None)
+    # never behind the poll it follows
+    assert conditional.next_since(T0 - timedelta(seconds=2), page, 100) == (T0 - timedelta(seconds=2), None)
+    # a full page continues after its last post
+    assert conditional.next_since(since, page, 2) == (T0, 3)
+
+    assert conditional.next_since_headers(since, page, 2) == {
+        "X-Next-Since": "2026-10-19T12:00:00.250000Z",
+        "X-Next-Since-Id": "3",
+    }
+
+
+def test_feed_page_revalidates_without_loading_posts(monkeypatch):
+    posts = [_post(2, T0), _post(1, T0 - timedelta(hours=1))]
+    monkeypatch.setattr(service, "get_posts", lambda **kwargs: posts)
+    monkeypatch.setattr(service, "get_posts_validators", lambda **kwargs: [(p["id"], p["updated_at"]) for p in posts])
+    client = TestClient(app)
+
+    first = client.get("/posts")
+    assert first.status_code == 200
+    assert first.headers["cache-control"] == "no-cache"
+    assert first.headers["last-modified"] == "Mon, 19 Oct 2026 12:00:00 GMT"
+    etag = first.headers["etag"]
+
+    def fail(**kwargs):
+        raise AssertionError("a matching If-None-Match must not load posts")
+
+    monkeypatch.setattr(service, "get_posts", fail)
+    again = client.get("/posts", headers={"If-None-Match": etag, "Accept-Encoding": "gzip"})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == etag
+    assert "content-encoding" not in again.headers
+
+    # a change to any post on the page is a new version
+    posts[1] = _post(1, T0 + timedelta(seconds=1))
+    monkeypatch.setattr(service, "get_posts", lambda **kwargs: posts)
+    changed = client.get("/posts", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+
+
+def test_since_defaults_to_oldest_change_first(monkeypatch):
+    calls = []
+
+    def get_posts(**kwargs):
+        calls.append(kwargs)
+        return [_post(5, T0)]
+
+    monkeypatch.setattr(service, "get_posts", get_posts)
+    client = TestClient(app)
+
+    resp = client.get("/posts", params={"since": "2026-10-19T11:00:00Z", "limit": 1})
+    assert calls[-1]["order_by"] == "updated_at" and calls[-1]["order_dir"] == "asc"
+    assert calls[-1]["since"] == datetime(2026, 10, 19, 11, 0, tzinfo=timezone.utc)
+    assert resp.headers["x-next-since"] == "2026-10-19T12:00:00.250000Z"
+    assert resp.headers["x-next-since-id"] == "5"
+
+    plain = client.get("/posts")
+    assert calls[-1]["order_by"] == "created_at" and calls[-1]["order_dir"] == "desc"
+    assert "x-next-since" not in plain.headers
+
+
+# ---- against the database (conftest) ----
+
+
+def test_updated_at_follows_every_write():
+    post_id = service.add_post(None, "hello", "alice")
+    created = service.get_post_by_id(post_id)["updated_at"]
+
+    # a worker-style UPDATE, not through the ORM
+    with SessionLocal() as db:
+        db.execute(text("UPDATE post SET sentiment_status = 'PENDING' WHERE id = :id"), {"id": post_id})
+        db.commit()
+    touched = service.get_post_by_id(post_id)["updated_at"]
+    assert touched > created
+
+    # a no-op update keeps the version
+    with SessionLocal() as db:
+        db.execute(text("UPDATE post SET sentiment_status = 'PENDING' WHERE id = :id"), {"id": post_id})
+        db.commit()
+    assert service.get_post_by_id(post_id)["updated_at"] == touched
+
+
+def test_single_post_conditional_get(client: TestClient):
+    post_id = service.add_post(None, "hello", "alice")
+
+    first = client.get(f"/posts/{post_id}")
+    assert first.status_code == 200 and first.json()["updated_at"]
+    etag = first.headers["etag"]
+    assert client.get(f"/posts/{post_id}", headers={"If-None-Match": etag}).status_code == 304
+
+    with SessionLocal() as db:
+        db.execute(
+            text("UPDATE post SET sentiment_status = 'READY', sentiment_label = 'POSITIVE' WHERE id = :id"),
+            {"id": post_id},
+        )
+        db.commit()
+    changed = client.get(f"/posts/{post_id}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.json()["sentiment_label"] == "POSITIVE"
+
+
+def test_feed_conditional_get_and_since(client: TestClient):
+    a = service.add_post(None, "first", "alice")
+    b = service.add_post(None, "second", "bob")
+    started = service.get_post_by_id(b)["updated_at"]
+
+    first = client.get("/posts")
+    assert [p["id"] for p in first.json()] == [b, a]
+    assert client.get("/posts", headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+
+    with SessionLocal() as db:
+        db.execute(text("UPDATE post SET sentiment_status = 'PENDING' WHERE id = :id"), {"id": a})
+        db.commit()
+    assert client.get("/posts", headers={"If-None-Match": first.headers["etag"]}).status_code == 200
+
+    changed = client.get("/posts", params={"since": started.isoformat()})
+    assert [p["id"] for p in changed.json()] == [a]
+    assert changed.headers["x-next-since"]
+
+    # paging with since_id through posts sharing one updated_at
+    with SessionLocal() as db:
+        db.execute(text("UPDATE post SET updated_at = :t"), {"t": started})
+        db.commit()
+    before = started - timedelta(seconds=1)
+    page1 = client.get("/posts", params={"since": before.isoformat(), "limit": 1})
+    assert [p["id"] for p in page1.json()] == [a]
+    page2 = client.get(
+        "/posts",
+        params={"since": page1.headers["x-next-since"], "since_id": page1.headers["x-next-since-id"], "limit": 1},
+    )
+    assert [p["id"] for p in page2.json()] == [b]
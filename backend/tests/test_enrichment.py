@@ -0,0 +1,88 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app import queue
+from app.db import SessionLocal
+from app.tracing import current_trace_id
+
+
+def test_trace_id_is_echoed_and_put_in_job_headers(client: TestClient, monkeypatch):
+    seen = {}
+
+    def fake_publish(filename, post_id=None):
+        seen["headers"] = queue._job_properties().headers
+
+    monkeypatch.setattr("app.queue.publish_resize_job", fake_publish)
+    tiny_png = (
+        b"\x89PNG\r\n\x1a\n"
+        b"\x00\x00\x00\rIHDR"
+        b"\x00\x00\x00\x01\x00\x00\x00\x01\x08\x06\x00\x00\x00\x1f\x15\xc4\x89"
+        b"\x00\x00\x00\nIDATx\x9cc`\x00\x00\x00\x02\x00\x01\xe2!\xbc3"
+        b"\x00\x00\x00\x00IEND\xaeB`\x82"
+    )
+
+    resp = client.post(
+        "/posts",
+        data={"username": "bob"},
+        files={"image": ("t.png", tiny_png, "image/png")},
+        headers={"X-Trace-Id": "upload-123"},
+    )
+
+    assert resp.status_code == 200
+    assert resp.headers["x-trace-id"] == "upload-123"
+    assert seen["headers"]["trace_id"] == "upload-123"
+    assert seen["headers"]["published_at"] <= time.time()
+
+    # malformed ids are replaced, and every response gets one
+    resp = client.get("/posts", headers={"X-Trace-Id": "bad id\x7f"})
+    assert resp.headers["x-trace-id"] != "bad id\x7f"
+    assert len(resp.headers["x-trace-id"]) == 32
+
+
+def test_current_trace_id_outside_a_request_is_fresh():
+    assert current_trace_id() != current_trace_id()
+
+
+def test_enrichment_latency_percentiles(client: TestClient):
+    now = datetime.now(timezone.utc)
+    rows = [
+        # (trace_id, kind, enqueued seconds ago, queue wait s, processing s, status)
+        ("a", "resize", 10, 1.0, 1.0, "READY"),
+        ("b", "resize", 10, 1.0, 3.0, "READY"),
+        ("c", "resize", 10, 0.5, 0.5, "FAILED"),
+        ("a", "describe", 20, 2.0, 8.0, "READY"),
+        ("old", "describe", 3 * 3600, 0.0, 1.0, "READY"),
+    ]
+    with SessionLocal() as db:
+        for trace_id, kind, ago, wait, work, status in rows:
+            enqueued = now - timedelta(seconds=ago)
+            started = enqueued + timedelta(seconds=wait)
+            db.execute(
+                text(
+                    "INSERT INTO enrichment_trace VALUES "
+                    "(:trace_id, :kind, NULL, :enqueued, :started, :completed, :status)"
+                ),
+                {
+                    "trace_id": trace_id,
+                    "kind": kind,
+                    "enqueued": enqueued,
+                    "started": started,
+                    "completed": started + timedelta(seconds=work),
+                    "status": status,
+                },
+            )
+        db.commit()
+
+    resp = client.get("/enrichment/latency", params={"minutes": 60})
+
+    assert resp.status_code == 200
+    kinds = resp.json()["kinds"]
+    assert set(kinds) == {"resize", "describe"}
+    assert kinds["resize"]["jobs"] == 3
+    assert kinds["resize"]["failed"] == 1
+    assert kinds["resize"]["total_ms"]["p50"] == 3000.0
+    assert kinds["resize"]["queue_wait_ms"]["p99"] == 1000.0
+    assert kinds["describe"]["processing_ms"] == {"p50": 8000.0, "p95": 8000.0, "p99": 8000.0}
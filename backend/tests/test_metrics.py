@@ -0,0 +1,47 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import metrics, queue
+
+
+def test_metrics_reports_route_latency_and_pool_state(client: TestClient):
+    client.get("/posts")
+    client.get("/posts/12345")  # 404, same route template as any other id
+
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+
+    body = resp.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/posts",status="200"}' in body
+    assert 'route="/posts/{post_id}",status="404"' in body
+    assert 'db_pool_connections{state="checked_out"} 0' in body
+    assert "db_pool_checkout_seconds_count" in body
+    assert 'sse_subscribers{kind="streams"}' in body
+
+
+def test_broker_publish_errors_are_counted(monkeypatch):
+    def refuse(*args, **kwargs):
+        raise ConnectionError("broker down")
+
+    monkeypatch.setattr(queue.pika, "BlockingConnection", refuse)
+
+    with pytest.raises(ConnectionError):
+        queue.publish_describe_job(1)
+
+    body = metrics.REGISTRY.render()
+    assert 'broker_publish_errors_total{job="describe"}' in body
+    assert 'broker_publish_seconds_count{job="describe"}' in body
+
+
+def test_histogram_buckets_are_cumulative():
+    hist = metrics.Histogram("t_seconds", "test", ("k",), buckets=(0.1, 1.0))
+    hist.observe(0.05, "a")
+    hist.observe(0.5, "a")
+    hist.observe(5.0, "a")
+
+    lines = list(hist.render())
+    assert 't_seconds_bucket{k="a",le="0.1"} 1' in lines
+    assert 't_seconds_bucket{k="a",le="1.0"} 2' in lines
+    assert 't_seconds_bucket{k="a",le="+Inf"} 3' in lines
+    assert 't_seconds_count{k="a"} 3' in lines
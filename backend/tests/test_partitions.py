@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app import partitions, service
+from app.db import SessionLocal
+
+
+def _partition_of(post_id: int) -> str:
+    with SessionLocal() as db:
+        return db.execute(text("SELECT tableoid::regclass::text FROM post WHERE id = :id"), {"id": post_id}).scalar_one()
+
+
+def test_month_bounds():
+    assert partitions.month_bounds("post_p2025_12") == (
+        datetime(2025, 12, 1, tzinfo=timezone.utc),
+        datetime(2026, 1, 1, tzinfo=timezone.utc),
+    )
+    with pytest.raises(ValueError):
+        partitions.month_bounds("post_default")
+
+
+def test_new_posts_land_in_the_current_month():
+    partitions.ensure_partitions(3)
+    now = datetime.now(timezone.utc)
+    names = {p.name for p in partitions.list_partitions()}
+    assert f"post_p{now:%Y_%m}" in names
+    assert partitions.ensure_partitions(3) == 0  # idempotent
+
+    post_id = service.add_post(None, "hello", "alice")
+    assert _partition_of(post_id) == f"post_p{now:%Y_%m}"
+
+
+def test_archived_partition_is_still_read_and_written(client: TestClient):
+    now = datetime.now(timezone.utc)
+    old = (now.replace(day=15) - timedelta(days=400)).replace(hour=12)
+    partitions.ensure_partitions(3, since=old)
+    name = f"post_p{old:%Y_%m}"
+
+    with SessionLocal() as db:
+        old_id = db.execute(
+            text("INSERT INTO post (content, username, created_at) VALUES ('a cold quokka', 'carol', :t) RETURNING id"),
+            {"t": old},
+        ).scalar_one()
+        db.commit()
+    assert name in {p.name for p in partitions.cold_partitions(12)}
+
+    try:
+        result = partitions.archive_partition(name)
+        assert result.rows == 1
+
+        assert _partition_of(old_id) == name
+        assert client.get(f"/posts/{old_id}").json()["content"] == "a cold quokka"
+        assert [p["id"] for p in client.get("/posts/search", params={"q": "quokka"}).json()] == [old_id]
+        assert name not in {p.name for p in partitions.cold_partitions(12)}
+
+        # the read-only trigger went away with the old table
+        with SessionLocal() as db:
+            db.execute(text("UPDATE post SET sentiment_status = 'PENDING' WHERE id = :id"), {"id": old_id})
+            db.commit()
+        assert service.get_post_by_id(old_id)["sentiment_status"] == "PENDING"
+    finally:
+        with SessionLocal() as db:
+            db.execute(text("DELETE FROM post_partition_archive WHERE partition = :p"), {"p": name})
+            db.commit()
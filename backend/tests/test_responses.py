@@ -0,0 +1,123 @@
+import gzip
+import json
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.responses import PlainTextResponse, StreamingResponse
+
+import app.service as service
+from app.compression import CompressionMiddleware, negotiate
+from app.schemas import PostOut
+
+
+def _row(i: int, **overrides) -> dict:
+    row = {
+        "id": i,
+        "image_filename": None,
+        "image_status": "READY",
+        "image_width": None,
+        "image_height": None,
+        "image_placeholder": None,
+        "image_dominant_color": None,
+        "image_description": None,
+        "description_status": "NONE",
+        "content": f"post {i} héllo 💧",
+        "username": "alice",
+        "created_at": datetime(2026, 10, 19, 12, 0, i % 60, 123456, tzinfo=timezone.utc),
+        "updated_at": datetime(2026, 10, 19, 12, 5, i % 60, 654321, tzinfo=timezone.utc),
+        "sentiment_status": "READY",
+        "sentiment_label": "POSITIVE",
+        "sentiment_score": 0.9876000285148621,
+    }
+    row.update(overrides)
+    return row
+
+
+def test_fast_path_matches_the_response_model_path(client: TestClient, monkeypatch):
+    rows = [
+        _row(1),
+        _row(2, created_at=datetime(2026, 10, 19, 12, 0, tzinfo=timezone(timedelta(hours=2)))),
+        _row(3, image_filename="a.png", image_status="PENDING", sentiment_score=None, sentiment_label=None),
+    ]
+    monkeypatch.setattr(service, "get_posts", lambda **kwargs: rows)
+
+    reference = FastAPI()
+
+    @reference.get("/posts", response_model=List[PostOut])
+    def reference_posts():
+        return rows
+
+    expected = TestClient(reference).get("/posts")
+    resp = client.get("/posts")
+    assert resp.headers["content-type"] == "application/json"
+    assert resp.json() == expected.json()
+    assert len(resp.content) == len(expected.content)
+
+
+def test_negotiate_prefers_brotli_and_respects_q_values():
+    assert negotiate("gzip, deflate, br") == "br"
+    assert negotiate("br;q=0.5, gzip") == "gzip"
+    assert negotiate("gzip;q=0, br;q=0") is None
+    assert negotiate("*") == "br"
+    assert negotiate("identity") is None
+    assert negotiate("") is None
+
+
+def _compressed_app() -> tuple[TestClient, bytes]:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=1000, thread_size=5000)
+    big = json.dumps([_row(i, created_at=None, updated_at=None) for i in range(100)])
+
+    @app.get("/big")
+    def get_big():
+        return PlainTextResponse(big, media_type="application/json")
+
+    @app.get("/small")
+    def get_small():
+        return {"ok": True}
+
+    @app.get("/stream")
+    def get_stream():
+        return StreamingResponse(iter([b"data: " + b"x" * 2000 + b"\n\n"] * 2), media_type="text/event-stream")
+
+    return TestClient(app), big.encode()
+
+
+def test_compression_negotiation_and_thresholds():
+    client, big = _compressed_app()
+
+    resp = client.get("/big", headers={"Accept-Encoding": "br"})
+    assert resp.headers["content-encoding"] == "br"
+    assert resp.headers["vary"] == "Accept-Encoding"
+    assert int(resp.headers["content-length"]) < len(big)
+    assert resp.content == big  # httpx decodes br when brotli is installed
+
+    raw = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert raw.headers["content-encoding"] == "gzip"
+    assert raw.content == big  # httpx decodes gzip
+
+    plain = client.get("/big", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers and plain.content == big
+    # could have been compressed for another client, so caches must key on it
+    assert plain.headers["vary"] == "Accept-Encoding"
+    assert client.get("/big", headers={"Accept-Encoding": ""}).headers["vary"] == "Accept-Encoding"
+
+    small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+    assert small.headers["vary"] == "Accept-Encoding"
+
+    stream = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in stream.headers
+    assert "vary" not in stream.headers
+    assert len(stream.content) > 4000
+
+
+def test_gzip_output_is_deterministic():
+    client, big = _compressed_app()
+    with client.stream("GET", "/big", headers={"Accept-Encoding": "gzip"}) as first:
+        a = b"".join(first.iter_raw())
+    with client.stream("GET", "/big", headers={"Accept-Encoding": "gzip"}) as second:
+        b = b"".join(second.iter_raw())
+    assert a == b and gzip.decompress(a) == big
@@ -0,0 +1,35 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app import metrics, sqlstats
+
+
+def test_debug_sql_lists_statement_fingerprints(client: TestClient):
+    client.delete("/debug/sql")
+    client.get("/posts/search", params={"q": "hello"})
+    client.get("/posts/search", params={"q": "other words"})
+
+    resp = client.get("/debug/sql", params={"order": "count", "limit": 50})
+    assert resp.status_code == 200
+    searches = [row for row in resp.json() if "ILIKE" in row["fingerprint"]]
+    assert len(searches) == 1
+    assert searches[0]["count"] == 2
+    assert "hello" not in searches[0]["fingerprint"]
+    assert searches[0]["max_ms"] >= searches[0]["mean_ms"] > 0
+
+    assert client.get("/debug/sql", params={"order": "nope"}).status_code == 400
+
+
+def test_slow_statements_are_counted_and_tagged_with_the_trace_id(monkeypatch, capsys):
+    monkeypatch.setenv("SLOW_QUERY_MS", "0")
+    monkeypatch.setenv("SLOW_QUERY_EXPLAIN_RATE", "0")
+    monkeypatch.setattr(sqlstats, "request_trace_id", lambda: "abc123")
+    engine = create_engine("sqlite://")
+    sqlstats.install(engine)
+    before = metrics.DB_SLOW_STATEMENTS._values.get((), 0)
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 42"))
+
+    assert metrics.DB_SLOW_STATEMENTS._values.get((), 0) == before + 1
+    assert "trace abc123" in capsys.readouterr().out
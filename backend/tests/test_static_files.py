@@ -0,0 +1,88 @@
+import os
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.static_files import ImageStaticFiles
+
+
+def _image_dir(kind: str) -> Path:
+    # IMAGE_ROOT is pointed at the repo uploads folder by conftest
+    return Path(os.environ["IMAGE_ROOT"]) / kind
+
+
+@pytest.fixture
+def client() -> TestClient:
+    # app.main mounts /static on IMAGE_ROOT as it was at import time, which is
+    # not necessarily the folder conftest points at; mount a fresh one on it
+    app = FastAPI()
+    app.mount("/static", ImageStaticFiles(directory=os.environ["IMAGE_ROOT"]), name="static")
+    return TestClient(app)
+
+
+def test_static_image_is_cached_immutably(client: TestClient):
+    resp = client.get("/static/original/charmander.png")
+    assert resp.status_code == 200
+    assert resp.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert resp.headers["accept-ranges"] == "bytes"
+
+    etag = resp.headers["etag"]
+    assert etag.startswith('"') and not etag.startswith("W/")
+
+    # Revalidation short-circuits to 304 with the same validator
+    resp2 = client.get(
+        "/static/original/charmander.png",
+        headers={"If-None-Match": etag},
+    )
+    assert resp2.status_code == 304
+    assert resp2.headers["etag"] == etag
+
+
+def test_static_image_range_request(client: TestClient):
+    full = (_image_dir("original") / "charmander.png").read_bytes()
+
+    resp = client.get("/static/original/charmander.png", headers={"Range": "bytes=0-7"})
+    assert resp.status_code == 206
+    assert resp.content == full[:8]
+
+
+def test_static_image_serves_webp_variant_when_accepted(client: TestClient, monkeypatch):
+    monkeypatch.setenv("STATIC_WEBP_VARIANTS", "1")
+
+    reduced_dir = _image_dir("reduced")
+    variant = reduced_dir / "variant-test.png.webp"
+    (reduced_dir / "variant-test.png").write_bytes(b"png-bytes")
+    variant.write_bytes(b"webp-bytes")
+    try:
+        resp = client.get("/static/reduced/variant-test.png", headers={"Accept": "image/webp,*/*"})
+        assert resp.status_code == 200
+        assert resp.content == b"webp-bytes"
+        assert resp.headers["content-type"] == "image/webp"
+        assert "Accept" in resp.headers["vary"]
+
+        resp = client.get("/static/reduced/variant-test.png", headers={"Accept": "image/png"})
+        assert resp.content == b"png-bytes"
+    finally:
+        variant.unlink()
+        (reduced_dir / "variant-test.png").unlink()
+
+
+def test_static_etag_changes_when_a_file_is_replaced(client: TestClient):
+    reduced = _image_dir("reduced") / "etag-test.png"
+    reduced.write_bytes(b"first")
+    try:
+        etag = client.get("/static/reduced/etag-test.png").headers["etag"]
+
+        # same size, renamed into place like resize-worker does
+        replacement = reduced.with_name(".etag-test.png.tmp")
+        replacement.write_bytes(b"other")
+        os.utime(replacement, ns=(0, reduced.stat().st_mtime_ns + 1_000_000))
+        os.replace(replacement, reduced)
+
+        resp = client.get("/static/reduced/etag-test.png", headers={"If-None-Match": etag})
+        assert resp.status_code == 200 and resp.content == b"other"
+        assert resp.headers["etag"] != etag
+    finally:
+        reduced.unlink()
@@ -0,0 +1,55 @@
+from fastapi.testclient import TestClient
+
+import app.service as service
+from app import timelines
+
+
+def _ids(posts: list[dict]) -> list[int]:
+    return [p["id"] for p in posts]
+
+
+def test_fan_out_on_write_and_follow_backfill(client: TestClient):
+    a1 = service.add_post(None, "alice one", "alice")
+    b1 = service.add_post(None, "bob one", "bob")
+
+    # own posts only until following someone; following copies bob's posts in
+    assert _ids(client.get("/users/alice/timeline").json()) == [a1]
+    resp = client.put("/users/alice/following/bob")
+    assert resp.status_code == 200 and resp.json()["timeline_added"] == 1
+    assert client.get("/users/alice/following").json() == ["bob"]
+
+    # new posts fan out to followers, not to users bob follows
+    b2 = service.add_post(None, "bob two", "bob")
+    c1 = service.add_post(None, "carol one", "carol")
+    timeline = client.get("/users/alice/timeline").json()
+    assert _ids(timeline) == [b2, b1, a1]
+    assert timeline[0]["content"] == "bob two"
+    assert _ids(client.get("/users/bob/timeline").json()) == [b2, b1]
+
+    # same result as merging on the fly, page by page
+    for offset in (0, 1, 2):
+        assert _ids(service.home_timeline("alice", 1, offset)) == _ids(
+            service.home_timeline_on_the_fly("alice", 1, offset)
+        )
+
+    resp = client.delete("/users/alice/following/bob")
+    assert resp.json()["timeline_removed"] == 2
+    assert _ids(client.get("/users/alice/timeline").json()) == [a1]
+    assert c1 not in _ids(service.home_timeline("alice"))
+
+    assert client.put("/users/alice/following/alice").status_code == 400
+
+
+def test_timelines_are_capped_and_rebuilt(monkeypatch):
+    monkeypatch.setenv("TIMELINE_MAX_ENTRIES", "3")
+    monkeypatch.setenv("TIMELINE_TRIM_EVERY", "1")
+    timelines.follow("dave", "erin")
+    ids = [service.add_post(None, f"post {i}", "erin") for i in range(5)]
+
+    assert _ids(service.home_timeline("dave", 10)) == ids[::-1][:3]
+
+    monkeypatch.setenv("TIMELINE_MAX_ENTRIES", "4")
+    assert timelines.rebuild("dave") == 4
+    assert _ids(service.home_timeline("dave", 10)) == ids[::-1][:4]
+    assert _ids(service.home_timeline("dave", 10)) == _ids(service.home_timeline_on_the_fly("dave", 4))
+    assert timelines.timeline_users() == ["dave", "erin"]
@@ -1,15 +1,29 @@
+-- Range-partitioned by month of created_at (post_pYYYY_MM, created by
+-- post_ensure_partitions below; the backend keeps a few months ahead).
+-- The primary key has to include the partition key; ids stay unique
+-- because they all come from post_id_seq.
 CREATE TABLE IF NOT EXISTS post (
-  id                SERIAL PRIMARY KEY,
+  id                SERIAL,
 
   -- Image
   image_filename    TEXT,
   image_status      TEXT NOT NULL DEFAULT 'READY',
 
+  -- Reduced image metadata (filled by resize-worker)
+  image_width          INTEGER,
+  image_height         INTEGER,
+  image_placeholder    TEXT,
+  image_dominant_color TEXT,
+
   -- Post content
   content           TEXT,
   username          TEXT NOT NULL,
   created_at        TIMESTAMPTZ NOT NULL DEFAULT NOW(),
 
+  -- Last write to the row (set by post_touch_updated_at on every UPDATE);
+  -- ETags and GET /posts?since= are derived from it
+  updated_at        TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+
   -- Image description (AI)
   image_description  TEXT,
   description_status TEXT NOT NULL DEFAULT 'NONE',
@@ -49,5 +63,184 @@ CREATE TABLE IF NOT EXISTS post (
 
   -- Sentiment status logic
   CONSTRAINT post_sentiment_status
-    CHECK (sentiment_status IN ('NONE', 'PENDING', 'READY', 'FAILED'))
+    CHECK (sentiment_status IN ('NONE', 'PENDING', 'READY', 'FAILED')),
+
+  PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- Columns added after the first release, for databases created before
+-- them (re-run this file to upgrade); no-ops on a fresh database
+ALTER TABLE post
+  ADD COLUMN IF NOT EXISTS image_width          INTEGER,
+  ADD COLUMN IF NOT EXISTS image_height         INTEGER,
+  ADD COLUMN IF NOT EXISTS image_placeholder    TEXT,
+  ADD COLUMN IF NOT EXISTS image_dominant_color TEXT,
+  -- NOW() is stored once as the missing value (no table rewrite): existing
+  -- posts read as changed at upgrade time, so every ETag changes once
+  ADD COLUMN IF NOT EXISTS updated_at           TIMESTAMPTZ NOT NULL DEFAULT NOW();
+
+-- Feed order; lets the planner read partitions newest first and stop early
+CREATE INDEX IF NOT EXISTS post_created_at ON post (created_at, id);
+
+-- Per-author feeds (get_posts(username=...)) and timeline merges / rebuilds
+CREATE INDEX IF NOT EXISTS post_username_created_at ON post (username, created_at, id);
+
+-- GET /posts?since= (changed posts, oldest change first)
+CREATE INDEX IF NOT EXISTS post_updated_at ON post (updated_at, id);
+
+-- Keeps updated_at current for every writer (backend and workers alike).
+-- clock_timestamp() rather than NOW(), so rows changed by one long
+-- transaction still get distinct, increasing times. No-op updates keep
+-- theirs, and so do updates that set updated_at themselves (backfills).
+CREATE OR REPLACE FUNCTION post_touch_updated_at() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  IF NEW IS DISTINCT FROM OLD AND NEW.updated_at IS NOT DISTINCT FROM OLD.updated_at THEN
+    NEW.updated_at := clock_timestamp();
+  END IF;
+  RETURN NEW;
+END
+$$;
+
+-- defined on the parent, so every partition (also archived ones) gets it
+CREATE OR REPLACE TRIGGER post_touch_updated_at
+  BEFORE UPDATE ON post
+  FOR EACH ROW EXECUTE FUNCTION post_touch_updated_at();
+
+-- Catches rows outside every monthly partition so inserts never fail;
+-- expected to stay empty (a month cannot be created while it has rows for it).
+-- Skipped on a database whose post predates partitioning, so the rest of
+-- this file still applies there; db/partition_post.sql converts it.
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'post'::regclass) THEN
+    CREATE TABLE IF NOT EXISTS post_default PARTITION OF post DEFAULT;
+  ELSE
+    RAISE NOTICE 'post is not partitioned yet, run db/partition_post.sql';
+  END IF;
+END
+$$;
+
+-- Create the monthly partitions from the month of `since` up to
+-- `months_ahead` months after the current one (UTC months). Returns the
+-- number created. Safe to call concurrently and repeatedly.
+CREATE OR REPLACE FUNCTION post_ensure_partitions(
+  months_ahead INTEGER DEFAULT 3,
+  since        TIMESTAMPTZ DEFAULT NOW()
+) RETURNS INTEGER
+LANGUAGE plpgsql AS $$
+DECLARE
+  -- month arithmetic on UTC wall-clock time, whatever the session TimeZone
+  month_start TIMESTAMP := date_trunc('month', since AT TIME ZONE 'UTC');
+  last_start  TIMESTAMP := date_trunc('month', NOW() AT TIME ZONE 'UTC') + make_interval(months => months_ahead);
+  part        TEXT;
+  created     INTEGER := 0;
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'post'::regclass) THEN
+    RAISE NOTICE 'post is not partitioned yet, run db/partition_post.sql';
+    RETURN 0;
+  END IF;
+
+  PERFORM pg_advisory_xact_lock(hashtext('post_ensure_partitions'));
+
+  WHILE month_start <= last_start LOOP
+    part := 'post_p' || to_char(month_start, 'YYYY_MM');
+    IF to_regclass(part) IS NULL THEN
+      EXECUTE format(
+        'CREATE TABLE %I PARTITION OF post FOR VALUES FROM (%L) TO (%L)',
+        part,
+        month_start AT TIME ZONE 'UTC',
+        (month_start + interval '1 month') AT TIME ZONE 'UTC'
+      );
+      created := created + 1;
+    END IF;
+    month_start := month_start + interval '1 month';
+  END LOOP;
+
+  RETURN created;
+END
+$$;
+
+SELECT post_ensure_partitions();
+
+-- Partitions rewritten by the archival job (backend/manage_partitions.py)
+CREATE TABLE IF NOT EXISTS post_partition_archive (
+  partition     TEXT PRIMARY KEY,
+  archived_at   TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  tablespace    TEXT,
+  row_count     BIGINT NOT NULL,
+  bytes_before  BIGINT NOT NULL,
+  bytes_after   BIGINT NOT NULL
 );
+
+-- Sentiment results shared by all sentiment-worker replicas,
+-- keyed by normalized content hash and model
+CREATE TABLE IF NOT EXISTS sentiment_cache (
+  content_hash  TEXT NOT NULL,
+  model_id      TEXT NOT NULL,
+  label         TEXT NOT NULL,
+  score         REAL NOT NULL,
+  created_at    TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+
+  PRIMARY KEY (content_hash, model_id)
+);
+
+-- Image captions shared by all describe-worker replicas, keyed by the
+-- original image bytes, the Gemini model and the effective prompt
+CREATE TABLE IF NOT EXISTS caption_cache (
+  image_hash    TEXT NOT NULL,
+  model         TEXT NOT NULL,
+  prompt_hash   TEXT NOT NULL,
+  caption       TEXT NOT NULL,
+  created_at    TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+
+  PRIMARY KEY (image_hash, model, prompt_hash)
+);
+
+-- Who follows whom (users are just usernames)
+CREATE TABLE IF NOT EXISTS follow (
+  follower    TEXT NOT NULL,
+  followee    TEXT NOT NULL,
+  created_at  TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+
+  PRIMARY KEY (follower, followee),
+
+  CONSTRAINT follow_not_self
+    CHECK (follower <> followee)
+);
+
+-- fan-out reads a post author's followers
+CREATE INDEX IF NOT EXISTS follow_followee ON follow (followee, follower);
+
+-- Precomputed home timelines: the newest TIMELINE_MAX_ENTRIES posts of each
+-- user and the users they follow, maintained on write by app/timelines.py.
+-- author lets unfollow drop a followee's entries without touching post.
+CREATE TABLE IF NOT EXISTS timeline (
+  username    TEXT NOT NULL,
+  created_at  TIMESTAMPTZ NOT NULL,
+  post_id     INTEGER NOT NULL,
+  author      TEXT NOT NULL,
+
+  PRIMARY KEY (username, created_at, post_id)
+);
+
+-- One row per traced enrichment job (resize / sentiment / describe), written
+-- by the worker when the job ends; the trace id comes from the request that
+-- enqueued it. Feeds GET /enrichment/latency.
+CREATE TABLE IF NOT EXISTS enrichment_trace (
+  trace_id      TEXT NOT NULL,
+  kind          TEXT NOT NULL,
+  post_id       INTEGER,
+  enqueued_at   TIMESTAMPTZ,
+  started_at    TIMESTAMPTZ NOT NULL,
+  completed_at  TIMESTAMPTZ NOT NULL,
+  status        TEXT NOT NULL,
+
+  PRIMARY KEY (trace_id, kind),
+
+  CONSTRAINT enrichment_trace_status
+    CHECK (status IN ('READY', 'FAILED'))
+);
+
+CREATE INDEX IF NOT EXISTS enrichment_trace_completed_at
+  ON enrichment_trace (completed_at);
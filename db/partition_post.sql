@@ -0,0 +1,44 @@
+-- One-off migration of an existing, unpartitioned post table to the
+-- monthly range partitions of init.sql. Run init.sql first: on the
+-- unpartitioned table it adds the newer columns, indexes and functions
+-- (post_ensure_partitions, post_touch_updated_at) and skips post_default.
+-- Then:
+--
+--   psql -v ON_ERROR_STOP=1 -f db/partition_post.sql
+--
+-- Copies every row while holding an exclusive lock on post, so plan for
+-- downtime of roughly one sequential rewrite of the table. The old table
+-- is kept as post_unpartitioned; drop it once the new one checks out.
+BEGIN;
+
+LOCK TABLE post IN ACCESS EXCLUSIVE MODE;
+
+ALTER TABLE post RENAME TO post_unpartitioned;
+ALTER INDEX post_pkey RENAME TO post_unpartitioned_pkey;
+ALTER INDEX IF EXISTS post_created_at RENAME TO post_unpartitioned_created_at;
+ALTER INDEX IF EXISTS post_username_created_at RENAME TO post_unpartitioned_username_created_at;
+ALTER INDEX IF EXISTS post_updated_at RENAME TO post_unpartitioned_updated_at;
+
+CREATE TABLE post (
+  LIKE post_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE,
+  PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE INDEX post_created_at ON post (created_at, id);
+CREATE INDEX post_username_created_at ON post (username, created_at, id);
+CREATE INDEX post_updated_at ON post (updated_at, id);
+CREATE TABLE post_default PARTITION OF post DEFAULT;
+CREATE TRIGGER post_touch_updated_at
+  BEFORE UPDATE ON post
+  FOR EACH ROW EXECUTE FUNCTION post_touch_updated_at();
+
+-- the SERIAL sequence must outlive post_unpartitioned
+ALTER SEQUENCE post_id_seq OWNED BY post.id;
+
+SELECT post_ensure_partitions(3, COALESCE((SELECT min(created_at) FROM post_unpartitioned), NOW()));
+
+INSERT INTO post SELECT * FROM post_unpartitioned;
+
+COMMIT;
+
+ANALYZE post;
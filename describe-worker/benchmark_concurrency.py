@@ -0,0 +1,78 @@
+"""
+Compare caption throughput of one request at a time against N requests in
+flight on a shared httpx.AsyncClient, using a local mock of the Gemini
+generateContent endpoint with fixed latency.
+
+    uv run python benchmark_concurrency.py --jobs 200 --latency-ms 500 --concurrency 1,8,32
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from describe_worker import gemini_caption_async, make_async_client
+
+
+def start_mock_server(latency_s: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(latency_s)
+            body = json.dumps(
+                {"candidates": [{"content": {"parts": [{"text": "A mock caption."}]}}]}
+            ).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def run_async(jobs: int, image: bytes, concurrency: int) -> float:
+    sem = asyncio.Semaphore(concurrency)
+    async with make_async_client(concurrency) as client:
+
+        async def one() -> None:
+            async with sem:
+                await gemini_caption_async(client, image, "image/png", "Describe.")
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(jobs)))
+        return jobs / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--image-kb", type=int, default=256)
+    parser.add_argument("--concurrency", default="1,8,32")
+    args = parser.parse_args()
+
+    server = start_mock_server(args.latency_ms / 1000)
+    os.environ["GEMINI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}"
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+    image = os.urandom(args.image_kb * 1024)
+
+    for n in (int(c) for c in args.concurrency.split(",")):
+        rate = asyncio.run(run_async(args.jobs, image, n))
+        print(f"async client, {n:>3} in flight:   {rate:8.1f} jobs/s")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Measure sustained caption throughput against a local mock provider that
+enforces a request quota (429 + Retry-After above it) and can inject an
+outage window of 503s, with and without the resilience layer.
+
+    uv run python benchmark_throttling.py --jobs 200 --quota 20 --concurrency 16 --outage-s 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from caption_client import AdaptiveRateLimiter, CircuitBreaker, ResilientCaptioner
+from describe_worker import gemini_caption_async, make_async_client
+
+
+def start_throttling_server(quota: float, latency_s: float, outage_s: float) -> ThreadingHTTPServer:
+    lock = threading.Lock()
+    bucket = {"tokens": quota, "updated": time.monotonic()}
+    started = time.monotonic()
+    # the outage starts one second in, once the clients are warmed up
+    outage = (started + 1, started + 1 + outage_s)
+
+    def admit() -> bool:
+        with lock:
+            now = time.monotonic()
+            bucket["tokens"] = min(quota, bucket["tokens"] + (now - bucket["updated"]) * quota)
+            bucket["updated"] = now
+            if bucket["tokens"] >= 1:
+                bucket["tokens"] -= 1
+                return True
+            return False
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+
+        def reply(self, status: int, body: bytes, headers: dict) -> None:
+            self.send_response(status)
+            for k, v in headers.items():
+                self.send_header(k, v)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if outage[0] <= time.monotonic() < outage[1]:
+                self.reply(503, b"", {})
+                return
+            if not admit():
+                self.reply(429, b"", {"Retry-After": "1"})
+                return
+            time.sleep(latency_s)
+            body = json.dumps(
+                {"candidates": [{"content": {"parts": [{"text": "A mock caption."}]}}]}
+            ).encode()
+            self.reply(200, body, {"Content-Type": "application/json"})
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def run(jobs: int, concurrency: int, resilient: bool, rate: float) -> dict:
+    sem = asyncio.Semaphore(concurrency)
+    ok = failed = 0
+
+    async with make_async_client(concurrency) as client:
+
+        async def call(image_bytes: bytes, mime_type: str, prompt: str) -> str:
+            return await gemini_caption_async(client, image_bytes, mime_type, prompt)
+
+        captioner = ResilientCaptioner(
+            call,
+            AdaptiveRateLimiter(rate=rate, burst=max(1, int(rate))),
+            CircuitBreaker(failure_threshold=5, cooldown_s=1.0),
+            max_attempts=6,
+        )
+        caption = captioner.caption if resilient else call
+
+        async def one() -> None:
+            nonlocal ok, failed
+            async with sem:
+                try:
+                    await caption(b"\x00" * 1024, "image/png", "Describe.")
+                    ok += 1
+                except Exception:
+                    failed += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(jobs)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "mode": "resilient" if resilient else "plain",
+        "ok": ok,
+        "failed": failed,
+        "ok_per_s": round(ok / elapsed, 1),
+        "requests": captioner.attempts if resilient else jobs,
+        "throttled": captioner.throttled if resilient else "-",
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--quota", type=float, default=20, help="provider requests/s")
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--outage-s", type=float, default=0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rate", type=float, default=40, help="client's starting rate limit")
+    parser.add_argument("--json", action="store_true", help="print raw JSON results")
+    args = parser.parse_args()
+
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+    results = []
+    for resilient in (False, True):
+        # fresh server per run so each one sees the same quota and outage window
+        server = start_throttling_server(args.quota, args.latency_ms / 1000, args.outage_s)
+        os.environ["GEMINI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}"
+        results.append(asyncio.run(run(args.jobs, args.concurrency, resilient, args.rate)))
+        server.shutdown()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    cols = ["mode", "ok", "failed", "ok_per_s", "requests", "throttled"]
+    print("  ".join(f"{c:>10}" for c in cols))
+    for r in results:
+        print("  ".join(f"{r[c]!s:>10}" for c in cols))
+
+
+if __name__ == "__main__":
+    main()
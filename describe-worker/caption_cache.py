@@ -0,0 +1,62 @@
+"""
+Inspect or invalidate the shared caption cache.
+
+    uv run python caption_cache.py stats
+    uv run python caption_cache.py purge --stale   # entries from another model/prompt
+    uv run python caption_cache.py purge --all
+
+--stale compares against the current CAPTION_PROVIDER / GEMINI_MODEL / DESCRIBE_PROMPT /
+DESCRIBE_MAX_CHARS, i.e. exactly what the worker would use right now.
+"""
+import argparse
+import os
+
+from sqlalchemy import text
+
+from caption_providers import make_provider
+from describe_worker import (
+    describe_prompt,
+    make_engine,
+    prompt_hash,
+    purge_caption_cache,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats")
+    purge = sub.add_parser("purge")
+    which = purge.add_mutually_exclusive_group(required=True)
+    which.add_argument("--stale", action="store_true")
+    which.add_argument("--all", action="store_true")
+    args = parser.parse_args()
+
+    engine = make_engine()
+    model = make_provider().model
+    p_hash = prompt_hash(describe_prompt(int(os.getenv("DESCRIBE_MAX_CHARS", "300"))))
+
+    if args.command == "stats":
+        with engine.connect() as conn:
+            rows = conn.execute(
+                text(
+                    """
+                    SELECT model, prompt_hash, COUNT(*) FROM caption_cache
+                    GROUP BY model, prompt_hash ORDER BY COUNT(*) DESC
+                    """
+                )
+            ).all()
+        for row_model, row_hash, count in rows:
+            current = " (current)" if (row_model, row_hash) == (model, p_hash) else ""
+            print(f"{row_model}  {row_hash[:12]}  {count}{current}")
+        return
+
+    if args.all:
+        deleted = purge_caption_cache(engine)
+    else:
+        deleted = purge_caption_cache(engine, keep_model=model, keep_prompt_hash=p_hash)
+    print(f"[caption-cache] Deleted {deleted} entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+Resilience layer around a captioning call: an adaptive token-bucket rate
+limiter, bounded exponential-backoff retries for transient errors and a
+circuit breaker that holds back new calls while the provider is down.
+"""
+import asyncio
+import email.utils
+import os
+import random
+import time
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+CaptionCall = Callable[[bytes, str, str], Awaitable[str]]
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After as seconds; accepts both delta-seconds and an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket whose refill rate follows the provider: halved on every 429
+    (and paused for Retry-After), nudged back up on each success (AIMD).
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        min_rate: float = 0.1,
+        increase: float = 0.05,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.increase = increase
+        self.clock = clock
+
+        self.tokens = float(burst)
+        self.updated = clock()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> None:
+        # the lock makes waiters queue up fairly instead of racing for tokens
+        async with self._lock:
+            while True:
+                now = self.clock()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def on_throttled(self, retry_after: Optional[float]) -> None:
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = min(self.tokens, 0.0)
+        if retry_after:
+            self.blocked_until = max(self.blocked_until, self.clock() + retry_after)
+
+    def on_success(self) -> None:
+        self.rate = min(self.max_rate, self.rate + self.increase * self.max_rate)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive provider failures. While open,
+    callers wait in before_call() instead of failing, so in-flight slots (and
+    with them, consumption from the queue) pause. After `cooldown_s` a single
+    trial call is let through; its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        cooldown_s: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.cooldown_s = cooldown_s
+        self.clock = clock
+
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if self._trial_running else "open"
+
+    async def before_call(self) -> None:
+        while self.opened_at is not None:
+            remaining = self.opened_at + self.cooldown_s - self.clock()
+            if remaining <= 0 and not self._trial_running:
+                self._trial_running = True
+                return
+            await asyncio.sleep(max(remaining, 0.1))
+
+    async def wait_until_closed(self) -> None:
+        """Like before_call() but without claiming the half-open trial."""
+        while self.opened_at is not None:
+            remaining = self.opened_at + self.cooldown_s - self.clock()
+            if remaining <= 0 and not self._trial_running:
+                return
+            await asyncio.sleep(max(remaining, 0.1))
+
+    def record_success(self) -> None:
+        if self.opened_at is not None:
+            print("[describe-worker] Circuit closed, provider recovered")
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._trial_running or (
+            self.opened_at is None and self.failures >= self.failure_threshold
+        ):
+            self.opened_at = self.clock()
+            self._trial_running = False
+            print(
+                f"[describe-worker] Circuit open after {self.failures} failures, "
+                f"pausing for {self.cooldown_s:.0f}s"
+            )
+
+
+class ResilientCaptioner:
+    """
+    Wraps a caption call with rate limiting, retries and circuit breaking.
+    Non-retryable errors (e.g. 400/403) are raised immediately, and so is a
+    Retry-After longer than `max_delay_s`: no retry sleeps past that cap.
+    """
+
+    def __init__(
+        self,
+        call: CaptionCall,
+        limiter: AdaptiveRateLimiter,
+        breaker: CircuitBreaker,
+        max_attempts: int = 4,
+        base_delay_s: float = 0.5,
+        max_delay_s: float = 30.0,
+    ):
+        self.call = call
+        self.limiter = limiter
+        self.breaker = breaker
+        self.max_attempts = max_attempts
+        self.base_delay_s = base_delay_s
+        self.max_delay_s = max_delay_s
+
+        self.attempts = 0
+        self.retries = 0
+        self.throttled = 0
+
+    def backoff(self, attempt: int) -> float:
+        # "full jitter" so retries from many in-flight jobs do not line up
+        return random.uniform(0, min(self.max_delay_s, self.base_delay_s * 2 ** (attempt - 1)))
+
+    async def caption(self, image_bytes: bytes, mime_type: str, prompt: str) -> str:
+        for attempt in range(1, self.max_attempts + 1):
+            await self.breaker.before_call()
+            await self.limiter.acquire()
+            self.attempts += 1
+
+            retry_after: Optional[float] = None
+            try:
+                result = await self.call(image_bytes, mime_type, prompt)
+            except httpx.HTTPStatusError as e:
+                status = e.response.status_code
+                if status not in RETRYABLE_STATUS:
+                    self.breaker.record_success()  # provider is up, request is bad
+                    raise
+                retry_after = parse_retry_after(e.response.headers.get("Retry-After"))
+                if status == 429:
+                    self.throttled += 1
+                    self.limiter.on_throttled(
+                        min(retry_after, self.max_delay_s) if retry_after is not None else None
+                    )
+                    # a quota answer still proves the provider is reachable
+                    if self.breaker.state == "half_open":
+                        self.breaker.record_success()
+                else:
+                    self.breaker.record_failure()
+                if attempt == self.max_attempts:
+                    raise
+                if retry_after is not None and retry_after > self.max_delay_s:
+                    # fail now rather than hold the job (and its in-flight
+                    # slot) that long; the message can be retried later
+                    raise
+            except (httpx.TimeoutException, httpx.TransportError):
+                self.breaker.record_failure()
+                if attempt == self.max_attempts:
+                    raise
+            except Exception:
+                # the provider answered, just not with a usable caption
+                self.breaker.record_success()
+                raise
+            else:
+                self.limiter.on_success()
+                self.breaker.record_success()
+                return result
+
+            self.retries += 1
+            await asyncio.sleep(
+                min(retry_after, self.max_delay_s) if retry_after is not None else self.backoff(attempt)
+            )
+
+        raise RuntimeError("unreachable")
+
+
+def make_captioner(call: CaptionCall) -> ResilientCaptioner:
+    """Build a ResilientCaptioner configured from DESCRIBE_* env vars."""
+    return ResilientCaptioner(
+        call,
+        AdaptiveRateLimiter(
+            rate=float(os.getenv("DESCRIBE_RATE_LIMIT", "5")),
+            burst=int(os.getenv("DESCRIBE_RATE_BURST", "5")),
+        ),
+        CircuitBreaker(
+            failure_threshold=int(os.getenv("DESCRIBE_BREAKER_FAILURES", "5")),
+            cooldown_s=float(os.getenv("DESCRIBE_BREAKER_COOLDOWN_S", "30")),
+        ),
+        max_attempts=int(os.getenv("DESCRIBE_MAX_ATTEMPTS", "4")),
+        base_delay_s=float(os.getenv("DESCRIBE_RETRY_BASE_S", "0.5")),
+    )
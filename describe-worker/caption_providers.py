@@ -0,0 +1,150 @@
+"""
+Captioning backends reached over HTTP, chosen with CAPTION_PROVIDER
+(gemini by default, stub for load tests against stub_provider.py).
+A provider only builds the request and parses the response; the shared
+AsyncClient and the resilience layer (caption_client.py) stay the same
+whichever one is configured.
+"""
+import base64
+import os
+from abc import ABC, abstractmethod
+from typing import Optional
+
+import httpx
+
+
+# -------------------------
+# Gemini
+# -------------------------
+def gemini_model() -> str:
+    return os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+
+
+def gemini_request(image_bytes: bytes, mime_type: str, prompt: str) -> tuple[str, dict, dict]:
+    """
+    Build (url, headers, json payload) for a Gemini generateContent call.
+    """
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise RuntimeError("GEMINI_API_KEY is not set")
+
+    model = gemini_model()
+    base_url = os.getenv(
+        "GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta"
+    ).rstrip("/")
+    url = f"{base_url}/models/{model}:generateContent"
+
+    image_b64 = base64.b64encode(image_bytes).decode("utf-8")
+
+    payload = {
+        "contents": [
+            {
+                "parts": [
+                    {"inlineData": {"mimeType": mime_type, "data": image_b64}},
+                    {"text": prompt},
+                ]
+            }
+        ]
+    }
+
+    headers = {
+        "x-goog-api-key": api_key,
+        "Content-Type": "application/json",
+    }
+    return url, headers, payload
+
+
+def parse_caption(data: dict) -> str:
+    try:
+        return data["candidates"][0]["content"]["parts"][0]["text"].strip()
+    except Exception as e:
+        raise RuntimeError(f"Unexpected Gemini response format: {e}; data={data!r}")
+
+
+# -------------------------
+# Providers
+# -------------------------
+class CaptionProvider(ABC):
+    """A captioning backend: subclasses build the request and parse the response."""
+
+    name = ""
+
+    @property
+    @abstractmethod
+    def model(self) -> str:
+        """Identifies the captions this provider produces (part of the cache key)."""
+
+    @abstractmethod
+    def request(self, image_bytes: bytes, mime_type: str, prompt: str) -> tuple[str, dict, dict]:
+        """(url, headers, json payload) for one caption call."""
+
+    @abstractmethod
+    def parse(self, data: dict) -> str:
+        """The caption from a decoded JSON response."""
+
+    async def caption(
+        self,
+        client: httpx.AsyncClient,
+        image_bytes: bytes,
+        mime_type: str,
+        prompt: str,
+    ) -> str:
+        url, headers, payload = self.request(image_bytes, mime_type, prompt)
+        resp = await client.post(url, headers=headers, json=payload)
+        resp.raise_for_status()
+        return self.parse(resp.json())
+
+
+class GeminiProvider(CaptionProvider):
+    name = "gemini"
+
+    @property
+    def model(self) -> str:
+        return gemini_model()
+
+    def request(self, image_bytes: bytes, mime_type: str, prompt: str) -> tuple[str, dict, dict]:
+        return gemini_request(image_bytes, mime_type, prompt)
+
+    def parse(self, data: dict) -> str:
+        return parse_caption(data)
+
+
+class StubProvider(CaptionProvider):
+    """Talks to stub_provider.py, a local deterministic server for load tests."""
+
+    name = "stub"
+
+    @property
+    def model(self) -> str:
+        return "stub"
+
+    def request(self, image_bytes: bytes, mime_type: str, prompt: str) -> tuple[str, dict, dict]:
+        base_url = os.getenv("CAPTION_STUB_URL", "http://caption-stub:8090").rstrip("/")
+        payload = {
+            "image": base64.b64encode(image_bytes).decode("utf-8"),
+            "mime_type": mime_type,
+            "prompt": prompt,
+        }
+        return f"{base_url}/caption", {"Content-Type": "application/json"}, payload
+
+    def parse(self, data: dict) -> str:
+        try:
+            return data["caption"].strip()
+        except Exception as e:
+            raise RuntimeError(f"Unexpected stub response format: {e}; data={data!r}")
+
+
+CAPTION_PROVIDERS: dict[str, type[CaptionProvider]] = {
+    GeminiProvider.name: GeminiProvider,
+    StubProvider.name: StubProvider,
+}
+
+
+def make_provider(name: Optional[str] = None) -> CaptionProvider:
+    name = (name or os.getenv("CAPTION_PROVIDER", "gemini")).lower()
+    try:
+        return CAPTION_PROVIDERS[name]()
+    except KeyError:
+        raise RuntimeError(
+            f"Unknown CAPTION_PROVIDER {name!r}; expected one of {', '.join(CAPTION_PROVIDERS)}"
+        )
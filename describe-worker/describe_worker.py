@@ -1,85 +1,27 @@
-import base64
-import json
+import asyncio
+import hashlib
+import io
 import os
 import time
 from pathlib import Path
 from typing import Optional
 
 import httpx
-import pika
-from sqlalchemy import create_engine, text
+from PIL import ExifTags, Image, ImageOps
+from sqlalchemy import text
 from sqlalchemy.engine import Engine
 
+from caption_client import ResilientCaptioner, make_captioner
+from caption_providers import GeminiProvider, gemini_model, make_provider
+from worker_runtime import env_bool, make_engine, stage, wait_for_db
+from worker_runtime.aio import AsyncWorker
 
-# -------------------------
-# RabbitMQ
-# -------------------------
-def amqp_params() -> pika.ConnectionParameters:
-    host = os.getenv("RABBITMQ_HOST", "rabbitmq")
-    port = int(os.getenv("RABBITMQ_PORT", "5672"))
-    user = os.getenv("RABBITMQ_USER", "guest")
-    password = os.getenv("RABBITMQ_PASSWORD", "guest")
-    credentials = pika.PlainCredentials(user, password)
-    return pika.ConnectionParameters(host=host, port=port, credentials=credentials)
-
-
-def wait_for_rabbitmq() -> pika.BlockingConnection:
-    while True:
-        try:
-            return pika.BlockingConnection(amqp_params())
-        except Exception as e:
-            print(f"[describe-worker] RabbitMQ not ready yet: {e}. Retrying...")
-            time.sleep(2)
-
-
-def publish_result(post_id: int) -> None:
-    """
-    Publish a small "result trigger" so the backend (listening on results queue)
-    can read the canonical state from DB and push SSE to clients.
-    """
-    results_queue = os.getenv("RABBITMQ_DESCRIBE_RESULTS_QUEUE", "describe_results")
-    payload = {"post_id": post_id}
-
-    conn = pika.BlockingConnection(amqp_params())
-    ch = conn.channel()
-    ch.queue_declare(queue=results_queue, durable=True)
-
-    ch.basic_publish(
-        exchange="",
-        routing_key=results_queue,
-        body=json.dumps(payload).encode("utf-8"),
-        properties=pika.BasicProperties(delivery_mode=2),  # persistent
-    )
-    conn.close()
+NAME = "describe-worker"
 
 
 # -------------------------
 # Database
 # -------------------------
-def db_url() -> str:
-    host = os.getenv("DB_HOST", "db")
-    port = os.getenv("DB_PORT", "5432")
-    name = os.getenv("DB_NAME", "social")
-    user = os.getenv("DB_USER", "admin")
-    pw = os.getenv("DB_PASSWORD", "password")
-    return f"postgresql+psycopg://{user}:{pw}@{host}:{port}/{name}"
-
-
-def make_engine() -> Engine:
-    return create_engine(db_url(), pool_pre_ping=True)
-
-
-def wait_for_db(engine: Engine) -> None:
-    while True:
-        try:
-            with engine.connect() as conn:
-                conn.execute(text("SELECT 1"))
-            return
-        except Exception as e:
-            print(f"[describe-worker] DB not ready yet: {e}. Retrying...")
-            time.sleep(2)
-
-
 def get_post_image_filename(engine: Engine, post_id: int) -> Optional[str]:
     with engine.connect() as conn:
         row = conn.execute(
@@ -91,6 +33,15 @@ def get_post_image_filename(engine: Engine, post_id: int) -> Optional[str]:
         return row[0]
 
 
+def get_post_image_status(engine: Engine, post_id: int) -> Optional[str]:
+    with engine.connect() as conn:
+        row = conn.execute(
+            text("SELECT image_status FROM post WHERE id = :id"),
+            {"id": post_id},
+        ).fetchone()
+        return row[0] if row else None
+
+
 def set_description_status(
     engine: Engine,
     post_id: int,
@@ -132,7 +83,157 @@ def set_description_status(
 
 
 # -------------------------
-# Gemini
+# Caption cache
+# -------------------------
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def lookup_caption(engine: Engine, image_hash: str, model: str, p_hash: str) -> Optional[str]:
+    with engine.connect() as conn:
+        row = conn.execute(
+            text(
+                """
+                SELECT caption FROM caption_cache
+                WHERE image_hash = :image_hash AND model = :model AND prompt_hash = :prompt_hash
+                """
+            ),
+            {"image_hash": image_hash, "model": model, "prompt_hash": p_hash},
+        ).fetchone()
+        return row[0] if row else None
+
+
+def store_caption(engine: Engine, image_hash: str, model: str, p_hash: str, caption: str) -> None:
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                """
+                INSERT INTO caption_cache (image_hash, model, prompt_hash, caption)
+                VALUES (:image_hash, :model, :prompt_hash, :caption)
+                ON CONFLICT (image_hash, model, prompt_hash) DO NOTHING
+                """
+            ),
+            {"image_hash": image_hash, "model": model, "prompt_hash": p_hash, "caption": caption},
+        )
+
+
+def purge_caption_cache(
+    engine: Engine,
+    keep_model: Optional[str] = None,
+    keep_prompt_hash: Optional[str] = None,
+) -> int:
+    """
+    Delete cached captions. With keep_model/keep_prompt_hash, only entries made
+    with a different model or prompt are removed (i.e. the stale ones).
+    Returns the number of deleted rows.
+    """
+    with engine.begin() as conn:
+        if keep_model is None:
+            result = conn.execute(text("DELETE FROM caption_cache"))
+        else:
+            result = conn.execute(
+                text(
+                    """
+                    DELETE FROM caption_cache
+                    WHERE model <> :model OR prompt_hash <> :prompt_hash
+                    """
+                ),
+                {"model": keep_model, "prompt_hash": keep_prompt_hash},
+            )
+        return result.rowcount
+
+
+# -------------------------
+# Image preparation
+# -------------------------
+def downscale_image(image_bytes: bytes, max_dim: int) -> tuple[bytes, Optional[str]]:
+    """
+    Shrink so the longest side is at most `max_dim` and re-encode as JPEG,
+    upright (EXIF Orientation applied, since the tag is dropped on re-encode).
+    Images that are already small enough and upright are returned unchanged
+    (mime None).
+    """
+    with Image.open(io.BytesIO(image_bytes)) as im:
+        orientation = im.getexif().get(ExifTags.Base.Orientation, 1)
+        if max(im.size) <= max_dim and orientation == 1:
+            return image_bytes, None
+
+        # draft() lets the JPEG decoder skip most of the full-size decode
+        im.draft("RGB", (max_dim, max_dim))
+        im = ImageOps.exif_transpose(im)
+        if im.mode in ("P", "RGBA", "LA"):
+            im = im.convert("RGBA")
+            white_bg = Image.new("RGBA", im.size, (255, 255, 255, 255))
+            im = Image.alpha_composite(white_bg, im).convert("RGB")
+        else:
+            im = im.convert("RGB")
+
+        im.thumbnail((max_dim, max_dim), Image.LANCZOS)
+        buf = io.BytesIO()
+        im.save(buf, format="JPEG", quality=85)
+        return buf.getvalue(), "image/jpeg"
+
+
+def prepare_image(
+    original_path: Path,
+    reduced_path: Optional[Path],
+    max_dim: int,
+) -> tuple[bytes, str, int]:
+    """
+    Pick the bytes to send to the captioning model: the reduced rendition if
+    one is given and exists, otherwise the original downscaled in memory.
+    Only pass `reduced_path` once resize-worker has marked the post READY;
+    before that the file may still be being written.
+    Returns (image bytes, mime type, size of the original file).
+    """
+    original_size = original_path.stat().st_size
+
+    if reduced_path is not None and reduced_path.exists():
+        return reduced_path.read_bytes(), mime_from_filename(reduced_path.name), original_size
+
+    image_bytes = original_path.read_bytes()
+    mime_type = mime_from_filename(original_path.name)
+    if max_dim > 0:
+        image_bytes, new_mime = downscale_image(image_bytes, max_dim)
+        mime_type = new_mime or mime_type
+    return image_bytes, mime_type, original_size
+
+
+class TransferStats:
+    """Running totals of what downscaling saved on the captioning requests."""
+
+    def __init__(self) -> None:
+        self.jobs = 0
+        self.original_bytes = 0
+        self.sent_bytes = 0
+        self.caption_ms = 0.0
+
+    def record(self, original_bytes: int, sent_bytes: int, caption_ms: float) -> None:
+        self.jobs += 1
+        self.original_bytes += original_bytes
+        self.sent_bytes += sent_bytes
+        self.caption_ms += caption_ms
+
+    def summary(self) -> str:
+        saved = 1 - self.sent_bytes / self.original_bytes if self.original_bytes else 0.0
+        avg_ms = self.caption_ms / self.jobs if self.jobs else 0.0
+        return (
+            f"{self.jobs} jobs, sent {self.sent_bytes / 1e6:.1f} MB of "
+            f"{self.original_bytes / 1e6:.1f} MB originals ({saved:.0%} saved), "
+            f"avg caption {avg_ms:.0f} ms"
+        )
+
+
+# -------------------------
+# Caption calls (providers: caption_providers.py)
 # -------------------------
 def mime_from_filename(filename: str) -> str:
     ext = Path(filename).suffix.lower()
@@ -143,45 +244,28 @@ def mime_from_filename(filename: str) -> str:
     return "application/octet-stream"
 
 
-def gemini_caption(image_bytes: bytes, mime_type: str, prompt: str) -> str:
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise RuntimeError("GEMINI_API_KEY is not set")
+def gemini_timeout() -> float:
+    return float(os.getenv("GEMINI_TIMEOUT", "60"))
 
-    model = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
-    url = (
-        "https://generativelanguage.googleapis.com/v1beta/"
-        f"models/{model}:generateContent"
-    )
-
-    image_b64 = base64.b64encode(image_bytes).decode("utf-8")
 
-    payload = {
-        "contents": [
-            {
-                "parts": [
-                    {"inlineData": {"mimeType": mime_type, "data": image_b64}},
-                    {"text": prompt},
-                ]
-            }
-        ]
-    }
-
-    headers = {
-        "x-goog-api-key": api_key,
-        "Content-Type": "application/json",
-    }
+def make_async_client(max_in_flight: int) -> httpx.AsyncClient:
+    # one pooled client per worker: keep-alive connections are reused across jobs
+    return httpx.AsyncClient(
+        timeout=gemini_timeout(),
+        limits=httpx.Limits(
+            max_connections=max_in_flight,
+            max_keepalive_connections=max_in_flight,
+        ),
+    )
 
-    timeout_s = float(os.getenv("GEMINI_TIMEOUT", "60"))
-    with httpx.Client(timeout=timeout_s) as client:
-        resp = client.post(url, headers=headers, json=payload)
-        resp.raise_for_status()
-        data = resp.json()
 
-    try:
-        return data["candidates"][0]["content"]["parts"][0]["text"].strip()
-    except Exception as e:
-        raise RuntimeError(f"Unexpected Gemini response format: {e}; data={data!r}")
+async def gemini_caption_async(
+    client: httpx.AsyncClient,
+    image_bytes: bytes,
+    mime_type: str,
+    prompt: str,
+) -> str:
+    return await GeminiProvider().caption(client, image_bytes, mime_type, prompt)
 
 
 def clamp_text(s: str, max_chars: int) -> str:
@@ -194,90 +278,204 @@ def clamp_text(s: str, max_chars: int) -> str:
 # -------------------------
 # Worker main
 # -------------------------
-def main() -> None:
-    request_queue = os.getenv("RABBITMQ_DESCRIBE_QUEUE", "describe_requests")
+class DescribeJob:
+    """
+    Everything a single describe job needs; shared by all in-flight jobs.
+    Blocking DB and file calls are pushed to threads so the event loop only
+    ever waits on the network.
+    """
 
-    image_root = Path(os.getenv("IMAGE_ROOT", "/app/uploads"))
-    original_dir = image_root / "original"
-    original_dir.mkdir(parents=True, exist_ok=True)
+    def __init__(
+        self,
+        engine: Engine,
+        captioner: ResilientCaptioner,
+        original_dir: Path,
+        reduced_dir: Path,
+        prompt: str,
+        max_chars: int,
+        model: Optional[str] = None,
+    ):
+        self.engine = engine
+        self.captioner = captioner
+        self.original_dir = original_dir
+        self.reduced_dir = reduced_dir
+        self.prompt = prompt
+        self.max_chars = max_chars
+
+        self.use_reduced = env_bool("DESCRIBE_USE_REDUCED", "1")
+        self.max_dim = int(os.getenv("DESCRIBE_MAX_DIMENSION", "1024"))
+        # 0 = don't wait; otherwise wait up to this long for resize-worker
+        self.wait_ready_s = float(os.getenv("DESCRIBE_WAIT_FOR_READY_S", "0"))
+        self.stats = TransferStats()
+
+        self.use_cache = env_bool("DESCRIBE_CACHE", "1")
+        self.model = model or gemini_model()
+        self.prompt_hash = prompt_hash(prompt)
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def cache_hit_rate(self) -> float:
+        lookups = self.cache_hits + self.cache_misses
+        return self.cache_hits / lookups if lookups else 0.0
+
+    async def finish(self, post_id: int, status: str, description: Optional[str] = None) -> None:
+        with stage("db_update"):
+            await asyncio.to_thread(set_description_status, self.engine, post_id, status, description)
+
+    async def wait_for_reduced(self, post_id: int) -> bool:
+        """
+        Poll image_status until resize-worker marks the post READY.
+        Returns False on FAILED or when DESCRIBE_WAIT_FOR_READY_S runs out
+        (with the default 0, the status is read once).
+        """
+        deadline = time.monotonic() + self.wait_ready_s
+        while True:
+            status = await asyncio.to_thread(get_post_image_status, self.engine, post_id)
+            if status == "READY":
+                return True
+            if status != "PENDING" or time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.5)
+
+    async def run(self, post_id: int) -> None:
+        with stage("db_read"):
+            filename = await asyncio.to_thread(get_post_image_filename, self.engine, post_id)
+        if filename is None:
+            # post not found OR no image_filename (both mean "can't describe")
+            await self.finish(post_id, "FAILED")
+            return
 
-    max_chars = int(os.getenv("DESCRIBE_MAX_CHARS", "300"))
+        img_path = self.original_dir / filename
+        if not img_path.exists():
+            await self.finish(post_id, "FAILED")
+            return
 
+        # IMPORTANT:
+        # Do NOT set status to PROCESSING (it violates DB constraint).
+        # Backend already set description_status = PENDING.
+
+        image_hash = None
+        if self.use_cache:
+            with stage("hash"):
+                image_hash = await asyncio.to_thread(file_sha256, img_path)
+            with stage("cache_lookup"):
+                cached = await asyncio.to_thread(
+                    lookup_caption, self.engine, image_hash, self.model, self.prompt_hash
+                )
+            if cached is not None:
+                self.cache_hits += 1
+                await self.finish(post_id, "READY", description=cached)
+                print(
+                    f"[describe-worker] Post {post_id}: description READY from cache "
+                    f"(hit rate {self.cache_hit_rate():.1%})"
+                )
+                return
+            self.cache_misses += 1
+
+        # the reduced file is complete only once the post is READY; until then
+        # (or with DESCRIBE_WAIT_FOR_READY_S=0, after one look) use the original
+        reduced_path = None
+        if self.use_reduced:
+            with stage("wait_reduced"):
+                if await self.wait_for_reduced(post_id):
+                    reduced_path = self.reduced_dir / filename
+
+        with stage("image_prep"):
+            image_bytes, mime_type, original_size = await asyncio.to_thread(
+                prepare_image, img_path, reduced_path, self.max_dim
+            )
+
+        started = time.perf_counter()
+        with stage("caption"):
+            caption = await self.captioner.caption(image_bytes, mime_type, self.prompt)
+        caption_ms = (time.perf_counter() - started) * 1000
+        caption = clamp_text(caption, max_chars=self.max_chars)
+
+        if image_hash is not None:
+            with stage("cache_store"):
+                await asyncio.to_thread(
+                    store_caption, self.engine, image_hash, self.model, self.prompt_hash, caption
+                )
+
+        await self.finish(post_id, "READY", description=caption)
+        self.stats.record(original_size, len(image_bytes), caption_ms)
+        print(
+            f"[describe-worker] Post {post_id}: description READY "
+            f"(sent {len(image_bytes) / 1024:.0f} KB of {original_size / 1024:.0f} KB, "
+            f"caption {caption_ms:.0f} ms); totals: {self.stats.summary()}, "
+            f"cache hit rate {self.cache_hit_rate():.1%}, "
+            f"{self.captioner.retries} retries, {self.captioner.throttled} throttled, "
+            f"rate {self.captioner.limiter.rate:.2f}/s"
+        )
+
+    async def handle(self, payload: dict) -> dict:
+        post_id = int(payload["post_id"])
+        await self.run(post_id)
+        # "result trigger": the backend reads the canonical state from DB and pushes SSE
+        return {"post_id": post_id}
+
+    async def on_failure(self, payload: dict, exc: Exception) -> Optional[dict]:
+        try:
+            post_id = int(payload["post_id"])
+        except Exception:
+            return None
+        await self.finish(post_id, "FAILED")
+        return {"post_id": post_id}
+
+
+def describe_prompt(max_chars: int) -> str:
     base_prompt = os.getenv(
         "DESCRIBE_PROMPT",
         "Describe this image clearly and objectively for a visually impaired person. "
         "Focus on what is visible, including people, objects, actions, and setting. "
         "Do not speculate beyond what can be seen.",
     )
-    prompt = f"{base_prompt} Limit the description to at most 3 sentences and under {max_chars} characters."
-
-    engine = make_engine()
-    wait_for_db(engine)
-
-    connection = wait_for_rabbitmq()
-    channel = connection.channel()
-    channel.queue_declare(queue=request_queue, durable=True)
-    channel.basic_qos(prefetch_count=1)
-
-    print(f"[describe-worker] Listening on queue: {request_queue}")
-
-    def handle(ch, method, properties, body: bytes):
-        post_id: Optional[int] = None
-        try:
-            payload = json.loads(body.decode("utf-8"))
-            post_id = int(payload["post_id"])
-
-            filename = get_post_image_filename(engine, post_id)
-            if filename is None:
-                # post not found OR no image_filename (both mean "can't describe")
-                set_description_status(engine, post_id, "FAILED")
-                publish_result(post_id)
-                ch.basic_ack(delivery_tag=method.delivery_tag)
-                return
-
-            img_path = original_dir / filename
-            if not img_path.exists():
-                set_description_status(engine, post_id, "FAILED")
-                publish_result(post_id)
-                ch.basic_ack(delivery_tag=method.delivery_tag)
-                return
-
-            # IMPORTANT:
-            # Do NOT set status to PROCESSING (it violates DB constraint).
-            # Backend already set description_status = PENDING.
-            # If you want a distinct PROCESSING state, update DB constraint + frontend types.
-            # set_description_status(engine, post_id, "PENDING")
-
-            image_bytes = img_path.read_bytes()
-            mime_type = mime_from_filename(filename)
+    return f"{base_prompt} Limit the description to at most 3 sentences and under {max_chars} characters."
 
-            caption = gemini_caption(image_bytes, mime_type, prompt)
-            caption = clamp_text(caption, max_chars=max_chars)
 
-            set_description_status(engine, post_id, "READY", description=caption)
-            publish_result(post_id)
+async def amain() -> None:
+    max_in_flight = int(os.getenv("DESCRIBE_CONCURRENCY", "8"))
 
-            print(f"[describe-worker] Post {post_id}: description READY")
-            ch.basic_ack(delivery_tag=method.delivery_tag)
-
-        except Exception as e:
-            print(f"[describe-worker] Job failed: {e}")
+    image_root = Path(os.getenv("IMAGE_ROOT", "/app/uploads"))
+    original_dir = image_root / "original"
+    original_dir.mkdir(parents=True, exist_ok=True)
+    reduced_dir = image_root / "reduced"
 
-            if post_id is not None:
-                try:
-                    set_description_status(engine, post_id, "FAILED")
-                    publish_result(post_id)
-                except Exception as db_err:
-                    print(f"[describe-worker] Failed to update FAILED status: {db_err}")
+    max_chars = int(os.getenv("DESCRIBE_MAX_CHARS", "300"))
+    prompt = describe_prompt(max_chars)
+
+    provider = make_provider()
+
+    engine = make_engine(NAME)
+    await asyncio.to_thread(wait_for_db, engine, NAME)
+
+    async with make_async_client(max_in_flight) as client:
+
+        async def call(image_bytes: bytes, mime_type: str, prompt: str) -> str:
+            return await provider.caption(client, image_bytes, mime_type, prompt)
+
+        captioner = make_captioner(call)
+        job = DescribeJob(
+            engine, captioner, original_dir, reduced_dir, prompt, max_chars,
+            model=provider.model,
+        )
+        worker = AsyncWorker(
+            NAME,
+            os.getenv("RABBITMQ_DESCRIBE_QUEUE", "describe_requests"),
+            job.handle,
+            concurrency=max_in_flight,
+            on_failure=job.on_failure,
+            # while the circuit is open, hold prefetched messages instead of failing them
+            before_job=captioner.breaker.wait_until_closed,
+            result_queue=os.getenv("RABBITMQ_DESCRIBE_RESULTS_QUEUE", "describe_results"),
+            trace_kind="describe",
+        )
+        print(f"[describe-worker] Caption provider {provider.name}/{provider.model}")
+        await worker.run()
 
-            # Avoid infinite loops on bad jobs
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
 
-    channel.basic_consume(queue=request_queue, on_message_callback=handle)
-    try:
-        channel.start_consuming()
-    finally:
-        connection.close()
+def main() -> None:
+    asyncio.run(amain())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,167 @@
+"""
+Load-test the describe pipeline end to end: create posts with images, publish
+their describe requests to RabbitMQ and wait until the running describe-worker
+has marked each one READY or FAILED, then report jobs/sec and latency.
+
+Run the worker with CAPTION_PROVIDER=stub and stub_provider.py (or the
+`caption-stub` compose service) so no Gemini key or network is needed:
+
+    docker compose --profile loadtest up -d caption-stub
+    CAPTION_PROVIDER=stub docker compose up -d describe-worker
+    uv run python loadtest_describe.py --jobs 500 --distinct-images 100
+
+Completion is detected by polling the post table rather than consuming
+describe_results, which the backend is listening on.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import statistics
+import time
+import uuid
+from pathlib import Path
+
+import aio_pika
+from PIL import Image
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from worker_runtime import amqp_settings, make_engine, wait_for_db
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def write_images(original_dir: Path, count: int, size: int) -> list[str]:
+    """Write `count` distinct PNGs; posts cycle through them, so repeats hit the caption cache."""
+    original_dir.mkdir(parents=True, exist_ok=True)
+    run_id = uuid.uuid4().hex[:8]
+    names = []
+    for i in range(count):
+        img = Image.effect_noise((size, size), 64).convert("RGB")
+        buf = io.BytesIO()
+        img.save(buf, format="PNG")
+        name = f"loadtest-{run_id}-{i}.png"
+        (original_dir / name).write_bytes(buf.getvalue())
+        names.append(name)
+    return names
+
+
+def create_posts(engine: Engine, filenames: list[str], jobs: int) -> list[int]:
+    with engine.begin() as conn:
+        rows = conn.execute(
+            text(
+                """
+                INSERT INTO post (username, image_filename, image_status, description_status)
+                SELECT 'loadtest', f, 'READY', 'PENDING' FROM unnest(CAST(:files AS text[])) AS f
+                RETURNING id
+                """
+            ),
+            {"files": [filenames[i % len(filenames)] for i in range(jobs)]},
+        ).all()
+    return [row.id for row in rows]
+
+
+def finished_posts(engine: Engine, post_ids: list[int]) -> dict[int, str]:
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text(
+                """
+                SELECT id, description_status FROM post
+                WHERE id = ANY(:ids) AND description_status IN ('READY', 'FAILED')
+                """
+            ),
+            {"ids": post_ids},
+        ).all()
+    return {row.id: row.description_status for row in rows}
+
+
+def delete_posts(engine: Engine, post_ids: list[int]) -> None:
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM post WHERE id = ANY(:ids)"), {"ids": post_ids})
+
+
+async def publish_requests(post_ids: list[int], queue_name: str) -> dict[int, float]:
+    sent_at = {}
+    connection = await aio_pika.connect_robust(**amqp_settings())
+    async with connection:
+        channel = await connection.channel()
+        await channel.declare_queue(queue_name, durable=True)
+        for post_id in post_ids:
+            await channel.default_exchange.publish(
+                aio_pika.Message(
+                    body=json.dumps({"post_id": post_id}).encode("utf-8"),
+                    delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                    headers={"published_at": time.time()},
+                ),
+                routing_key=queue_name,
+            )
+            sent_at[post_id] = time.perf_counter()
+    return sent_at
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--distinct-images", type=int, help="default: one image per job")
+    parser.add_argument("--image-size", type=int, default=768, help="edge length in px")
+    parser.add_argument("--timeout-s", type=float, default=600)
+    parser.add_argument("--poll-ms", type=float, default=50)
+    parser.add_argument("--keep", action="store_true", help="keep the posts and images afterwards")
+    parser.add_argument("--json", action="store_true", help="print raw JSON results")
+    args = parser.parse_args()
+
+    original_dir = Path(os.getenv("IMAGE_ROOT", "/app/uploads")) / "original"
+    queue_name = os.getenv("RABBITMQ_DESCRIBE_QUEUE", "describe_requests")
+
+    engine = make_engine()
+    wait_for_db(engine, "loadtest")
+
+    filenames = write_images(original_dir, args.distinct_images or args.jobs, args.image_size)
+    post_ids = create_posts(engine, filenames, args.jobs)
+
+    started = time.perf_counter()
+    sent_at = asyncio.run(publish_requests(post_ids, queue_name))
+
+    done_at: dict[int, float] = {}
+    statuses: dict[int, str] = {}
+    deadline = started + args.timeout_s
+    while len(statuses) < len(post_ids) and time.perf_counter() < deadline:
+        pending = [pid for pid in post_ids if pid not in statuses]
+        for pid, status in finished_posts(engine, pending).items():
+            statuses[pid] = status
+            done_at[pid] = time.perf_counter()
+        time.sleep(args.poll_ms / 1000)
+    elapsed = time.perf_counter() - started
+
+    latencies_ms = [(done_at[pid] - sent_at[pid]) * 1000 for pid in done_at]
+    result = {
+        "jobs": args.jobs,
+        "ready": sum(1 for s in statuses.values() if s == "READY"),
+        "failed": sum(1 for s in statuses.values() if s == "FAILED"),
+        "timed_out": len(post_ids) - len(statuses),
+        "jobs_per_s": round(len(statuses) / elapsed, 1),
+        "latency_p50_ms": round(statistics.median(latencies_ms), 1) if latencies_ms else None,
+        "latency_p95_ms": round(_percentile(latencies_ms, 95), 1) if latencies_ms else None,
+        "latency_p99_ms": round(_percentile(latencies_ms, 99), 1) if latencies_ms else None,
+    }
+
+    if not args.keep:
+        delete_posts(engine, post_ids)
+        for name in filenames:
+            (original_dir / name).unlink(missing_ok=True)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    for key, value in result.items():
+        print(f"{key:>16}  {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Local captioning stub for load tests (CAPTION_PROVIDER=stub).
+
+Answers POST /caption with a caption derived from the image hash, after a
+log-normally distributed delay, and fails a configurable share of requests
+with 503 or 429 + Retry-After. Random draws come from a seeded generator so
+runs are repeatable.
+
+    uv run python stub_provider.py --port 8090 --latency-ms 400 --error-rate 0.02 --throttle-rate 0.05
+"""
+import argparse
+import base64
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ["cat", "dog", "tree", "bicycle", "window", "street", "mountain", "cup", "lamp", "river"]
+
+
+def stub_caption(image_bytes: bytes) -> str:
+    digest = hashlib.sha256(image_bytes).digest()
+    subject, place = WORDS[digest[0] % len(WORDS)], WORDS[digest[1] % len(WORDS)]
+    return f"A {subject} next to a {place}. (stub {digest.hex()[:8]})"
+
+
+def start_stub_server(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    latency_ms: float = 300,
+    latency_sigma: float = 0.3,
+    error_rate: float = 0.0,
+    throttle_rate: float = 0.0,
+    retry_after_s: float = 1,
+    seed: int = 0,
+) -> ThreadingHTTPServer:
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    def draw() -> tuple[float, float]:
+        with lock:
+            return rng.lognormvariate(math.log(max(latency_ms, 0.1)), latency_sigma), rng.random()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+
+        def reply(self, status: int, data: dict, headers: dict) -> None:
+            body = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            for k, v in headers.items():
+                self.send_header(k, v)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if self.path != "/caption":
+                self.reply(404, {"error": "not found"}, {})
+                return
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            delay_ms, roll = draw()
+
+            if roll < throttle_rate:
+                self.reply(429, {"error": "quota"}, {"Retry-After": f"{retry_after_s:g}"})
+                return
+            time.sleep(delay_ms / 1000)
+            if roll < throttle_rate + error_rate:
+                self.reply(503, {"error": "unavailable"}, {})
+                return
+            self.reply(200, {"caption": stub_caption(base64.b64decode(request["image"]))}, {})
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=300, help="median latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.3, help="log-normal spread")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share answered with 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share answered with 429")
+    parser.add_argument("--retry-after-s", type=float, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = start_stub_server(
+        args.host,
+        args.port,
+        args.latency_ms,
+        args.latency_sigma,
+        args.error_rate,
+        args.throttle_rate,
+        args.retry_after_s,
+        args.seed,
+    )
+    print(f"[caption-stub] Listening on {args.host}:{server.server_port}")
+    threading.Event().wait()
+
+
+if __name__ == "__main__":
+    main()
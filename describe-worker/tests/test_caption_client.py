@@ -0,0 +1,141 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+# Make sure the project root (the directory containing describe_worker.py) is on sys.path
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from caption_client import (
+    AdaptiveRateLimiter,
+    CircuitBreaker,
+    ResilientCaptioner,
+    parse_retry_after,
+)
+from describe_worker import gemini_caption_async
+
+CAPTION_JSON = {"candidates": [{"content": {"parts": [{"text": "A cat."}]}}]}
+
+
+def make_captioner(handler, **kwargs) -> tuple[ResilientCaptioner, httpx.AsyncClient]:
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    async def call(image_bytes, mime_type, prompt):
+        return await gemini_caption_async(client, image_bytes, mime_type, prompt)
+
+    captioner = ResilientCaptioner(
+        call,
+        AdaptiveRateLimiter(rate=1000, burst=10),
+        kwargs.pop("breaker", CircuitBreaker(failure_threshold=3, cooldown_s=0.05)),
+        base_delay_s=0,
+        **kwargs,
+    )
+    return captioner, client
+
+
+def test_parse_retry_after_seconds_and_date():
+    assert parse_retry_after("2") == 2.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+def test_retries_throttled_requests_and_slows_down(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+    calls = {"n": 0}
+
+    def handler(request):
+        calls["n"] += 1
+        if calls["n"] % 2:
+            return httpx.Response(429, headers={"Retry-After": "0"})
+        return httpx.Response(200, json=CAPTION_JSON)
+
+    async def run():
+        captioner, client = make_captioner(handler)
+        async with client:
+            captions = [await captioner.caption(b"img", "image/png", "Describe.") for _ in range(3)]
+        return captioner, captions
+
+    captioner, captions = asyncio.run(run())
+    assert captions == ["A cat."] * 3
+    assert captioner.throttled == 3
+    assert captioner.limiter.rate < captioner.limiter.max_rate
+
+
+def test_long_retry_after_fails_the_attempt_instead_of_sleeping(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+    calls = {"n": 0}
+    slept = []
+
+    async def fake_sleep(seconds):
+        slept.append(seconds)
+
+    def handler(request):
+        calls["n"] += 1
+        return httpx.Response(429, headers={"Retry-After": "3600"})
+
+    async def run():
+        captioner, client = make_captioner(handler, max_delay_s=5)
+        async with client:
+            try:
+                await captioner.caption(b"img", "image/png", "Describe.")
+            finally:
+                assert captioner.limiter.blocked_until - captioner.limiter.clock() <= 5
+
+    monkeypatch.setattr("caption_client.asyncio.sleep", fake_sleep)
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(run())
+    assert calls["n"] == 1
+    assert slept == []
+
+
+def test_client_errors_are_not_retried(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+    calls = {"n": 0}
+
+    def handler(request):
+        calls["n"] += 1
+        return httpx.Response(400)
+
+    async def run():
+        captioner, client = make_captioner(handler)
+        async with client:
+            await captioner.caption(b"img", "image/png", "Describe.")
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(run())
+    assert calls["n"] == 1
+
+
+def test_circuit_opens_on_outage_and_closes_after_recovery(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+    state = {"down": True, "calls": 0}
+
+    def handler(request):
+        state["calls"] += 1
+        if state["down"]:
+            return httpx.Response(503)
+        return httpx.Response(200, json=CAPTION_JSON)
+
+    async def run():
+        breaker = CircuitBreaker(failure_threshold=3, cooldown_s=0.05)
+        captioner, client = make_captioner(handler, breaker=breaker, max_attempts=3)
+        async with client:
+            with pytest.raises(httpx.HTTPStatusError):
+                await captioner.caption(b"img", "image/png", "Describe.")
+            assert breaker.state == "open"
+
+            # no calls reach the provider while the circuit is open
+            calls_when_opened = state["calls"]
+            pending = asyncio.create_task(captioner.caption(b"img", "image/png", "Describe."))
+            await asyncio.sleep(0.01)
+            assert state["calls"] == calls_when_opened
+
+            state["down"] = False
+            assert await pending == "A cat."
+            assert breaker.state == "closed"
+
+    asyncio.run(run())
@@ -1,31 +1,34 @@
+import asyncio
+import io
+import json
 import os
 import sys
 from pathlib import Path
+from types import SimpleNamespace
 
 import httpx
+import pytest
+from PIL import ExifTags, Image
 
 # Make sure the project root (the directory containing describe_worker.py) is on sys.path
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from describe_worker import gemini_caption
-
-
-class DummyResponse:
-    def __init__(self, json_data):
-        self._json = json_data
-
-    def raise_for_status(self):
-        pass
-
-    def json(self):
-        return self._json
+import describe_worker
+from caption_providers import CaptionProvider, StubProvider, make_provider
+from describe_worker import (
+    file_sha256,
+    gemini_caption_async,
+    prepare_image,
+    prompt_hash,
+)
+from stub_provider import start_stub_server
 
 
 def test_gemini_caption_extracts_text(monkeypatch):
     # Arrange
-    os.environ["GEMINI_API_KEY"] = "test-key"
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
 
     fake_response = {
         "candidates": [
@@ -39,21 +42,185 @@ def test_gemini_caption_extracts_text(monkeypatch):
         ]
     }
 
-    def fake_post(self, url, headers=None, json=None):
+    def handler(request: httpx.Request) -> httpx.Response:
         # Basic sanity checks on payload
-        parts = json["contents"][0]["parts"]
+        parts = json.loads(request.content)["contents"][0]["parts"]
         assert "inlineData" in parts[0]
         assert "text" in parts[1]
-        return DummyResponse(fake_response)
-
-    monkeypatch.setattr(httpx.Client, "post", fake_post)
+        return httpx.Response(200, json=fake_response)
 
     image_bytes = b"fake-image-bytes"
     mime_type = "image/png"
     prompt = "Describe this image."
 
     # Act
-    caption = gemini_caption(image_bytes, mime_type, prompt)
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await gemini_caption_async(client, image_bytes, mime_type, prompt)
+
+    caption = asyncio.run(run())
 
     # Assert
     assert caption == "A small orange cartoon creature holding a flame."
+
+
+def test_gemini_caption_async_uses_shared_client(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    monkeypatch.setenv("GEMINI_BASE_URL", "http://mock-gemini")
+
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(str(request.url))
+        return httpx.Response(
+            200,
+            json={"candidates": [{"content": {"parts": [{"text": " A mock caption. "}]}}]},
+        )
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await asyncio.gather(
+                *(gemini_caption_async(client, b"img", "image/png", "Describe.") for _ in range(3))
+            )
+
+    captions = asyncio.run(run())
+
+    assert captions == ["A mock caption."] * 3
+    assert seen[0] == "http://mock-gemini/models/gemini-2.5-flash:generateContent"
+    assert len(seen) == 3
+
+
+def _write_png(path: Path, size) -> None:
+    Image.new("RGBA", size, (200, 10, 10, 255)).save(path)
+
+
+def test_prepare_image_downscales_large_original(tmp_path: Path):
+    original = tmp_path / "big.png"
+    _write_png(original, (3000, 2000))
+
+    image_bytes, mime_type, original_size = prepare_image(original, None, max_dim=1024)
+
+    assert mime_type == "image/jpeg"
+    assert original_size == original.stat().st_size
+    with Image.open(io.BytesIO(image_bytes)) as im:
+        assert max(im.size) == 1024
+
+
+def test_prepare_image_prefers_reduced_rendition(tmp_path: Path):
+    original = tmp_path / "orig.png"
+    reduced = tmp_path / "reduced.png"
+    _write_png(original, (3000, 2000))
+    _write_png(reduced, (512, 341))
+
+    image_bytes, mime_type, _ = prepare_image(original, reduced, max_dim=1024)
+
+    assert image_bytes == reduced.read_bytes()
+    assert mime_type == "image/png"
+
+
+def _write_rotated_jpeg(path: Path, size) -> None:
+    # stored landscape, displayed portrait (Orientation 6 = rotate 90° CW)
+    exif = Image.Exif()
+    exif[ExifTags.Base.Orientation] = 6
+    Image.new("RGB", size, (10, 200, 10)).save(path, exif=exif)
+
+
+def test_prepare_image_applies_exif_orientation(tmp_path: Path):
+    big = tmp_path / "big.jpg"
+    _write_rotated_jpeg(big, (3000, 2000))
+    image_bytes, mime_type, _ = prepare_image(big, None, max_dim=1024)
+    with Image.open(io.BytesIO(image_bytes)) as im:
+        assert im.size == (683, 1024)
+        assert im.getexif().get(ExifTags.Base.Orientation, 1) == 1
+
+    # small enough, but still re-encoded upright
+    small = tmp_path / "small.jpg"
+    _write_rotated_jpeg(small, (300, 200))
+    image_bytes, mime_type, _ = prepare_image(small, None, max_dim=1024)
+    assert mime_type == "image/jpeg"
+    with Image.open(io.BytesIO(image_bytes)) as im:
+        assert im.size == (200, 300)
+
+
+def test_reduced_rendition_is_used_only_once_ready(tmp_path: Path, monkeypatch):
+    (tmp_path / "original").mkdir()
+    (tmp_path / "reduced").mkdir()
+    _write_png(tmp_path / "original" / "a.png", (3000, 2000))
+    _write_png(tmp_path / "reduced" / "a.png", (512, 341))  # possibly half-written
+
+    monkeypatch.setenv("DESCRIBE_CACHE", "0")
+    status = {"image": "PENDING"}
+    sent = []
+    monkeypatch.setattr(describe_worker, "get_post_image_filename", lambda engine, post_id: "a.png")
+    monkeypatch.setattr(describe_worker, "get_post_image_status", lambda engine, post_id: status["image"])
+    monkeypatch.setattr(describe_worker, "set_description_status", lambda *args: None)
+
+    async def caption(image_bytes, mime_type, prompt):
+        sent.append(mime_type)
+        return "A red square."
+
+    captioner = SimpleNamespace(caption=caption, retries=0, throttled=0, limiter=SimpleNamespace(rate=1.0))
+    job = describe_worker.DescribeJob(
+        None, captioner, tmp_path / "original", tmp_path / "reduced", "Describe.", 300
+    )
+
+    asyncio.run(job.run(1))
+    status["image"] = "READY"
+    asyncio.run(job.run(1))
+
+    # PENDING: the original, downscaled to JPEG; READY: the reduced PNG
+    assert sent == ["image/jpeg", "image/png"]
+
+
+def test_cache_keys_change_with_content_and_prompt(tmp_path: Path):
+    a = tmp_path / "a.png"
+    b = tmp_path / "b.png"
+    _write_png(a, (10, 10))
+    a_copy = tmp_path / "a-copy.png"
+    a_copy.write_bytes(a.read_bytes())
+    Image.new("RGB", (10, 10), (0, 0, 255)).save(b)
+
+    # same bytes under another filename share the cache entry
+    assert file_sha256(a) == file_sha256(a_copy)
+    assert file_sha256(a) != file_sha256(b)
+    assert prompt_hash("Describe.") != prompt_hash("Describe briefly.")
+
+
+def test_stub_provider_round_trip(monkeypatch):
+    server = start_stub_server(latency_ms=1)
+    monkeypatch.setenv("CAPTION_STUB_URL", f"http://127.0.0.1:{server.server_port}")
+    provider = make_provider("stub")
+    assert isinstance(provider, StubProvider)
+
+    async def run():
+        async with httpx.AsyncClient() as client:
+            return await asyncio.gather(
+                provider.caption(client, b"one", "image/png", "Describe."),
+                provider.caption(client, b"one", "image/png", "Describe."),
+                provider.caption(client, b"two", "image/png", "Describe."),
+            )
+
+    try:
+        first, again, other = asyncio.run(run())
+    finally:
+        server.shutdown()
+
+    # deterministic per image, so cache behaviour is reproducible in load tests
+    assert first == again
+    assert first != other
+
+
+def test_make_provider_rejects_unknown_name():
+    with pytest.raises(RuntimeError, match="CAPTION_PROVIDER"):
+        make_provider("nope")
+
+
+def test_provider_interface_is_abstract():
+    class Incomplete(CaptionProvider):
+        name = "incomplete"
+
+        def parse(self, data: dict) -> str:
+            return ""
+
+    with pytest.raises(TypeError, match="model"):
+        Incomplete()
@@ -64,6 +64,15 @@ export class PostCard {
     this.imgSrc = null;
   }
 
+  // Inline LQIP/dominant color from resize-worker, painted until the image loads.
+  get placeholderBackground(): string | null {
+    const color = this.post.image_dominant_color ?? '';
+    if (this.post.image_placeholder) {
+      return `${color} url("${this.post.image_placeholder}") center / cover no-repeat`.trim();
+    }
+    return color || null;
+  }
+
   get imageDescription(): string | null {
     return (this.post.image_description ?? '').trim() || null;
   }
@@ -8,6 +8,10 @@ export interface Post {
   /* Image */
   image_filename: string | null;
   image_status: 'PENDING' | 'READY' | 'FAILED';
+  image_width: number | null;
+  image_height: number | null;
+  image_placeholder: string | null;
+  image_dominant_color: string | null;
 
   /* Post content */
   content: string | null;
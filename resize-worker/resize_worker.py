@@ -1,36 +1,16 @@
-import json
+import base64
+import io
 import os
-import time
+import uuid
 from pathlib import Path
 
-import pika
-from PIL import Image
-
-from sqlalchemy import create_engine, text
+from PIL import Image, ImageOps
+from sqlalchemy import text
 from sqlalchemy.engine import Engine
 
+from worker_runtime import Worker, env_bool, make_engine, stage, wait_for_db
 
-def amqp_params() -> pika.ConnectionParameters:
-    host = os.getenv("RABBITMQ_HOST", "localhost")
-    port = int(os.getenv("RABBITMQ_PORT", "5672"))
-    user = os.getenv("RABBITMQ_USER", "guest")
-    password = os.getenv("RABBITMQ_PASSWORD", "guest")
-    credentials = pika.PlainCredentials(user, password)
-    return pika.ConnectionParameters(host=host, port=port, credentials=credentials)
-
-
-def db_url() -> str:
-    host = os.getenv("DB_HOST", "localhost")
-    port = os.getenv("DB_PORT", "5432")
-    name = os.getenv("DB_NAME", "social")
-    user = os.getenv("DB_USER", "admin")
-    pw = os.getenv("DB_PASSWORD", "password")
-    return f"postgresql+psycopg://{user}:{pw}@{host}:{port}/{name}"
-
-
-def make_engine() -> Engine:
-    # pool_pre_ping avoids stale connections
-    return create_engine(db_url(), pool_pre_ping=True)
+NAME = "resize-worker"
 
 
 def ensure_dirs(image_root: Path) -> tuple[Path, Path]:
@@ -41,8 +21,84 @@ def ensure_dirs(image_root: Path) -> tuple[Path, Path]:
     return original_dir, reduced_dir
 
 
-def resize_image(src: Path, dst: Path, max_width: int = 512) -> None:
+def placeholder_data_uri(im: Image.Image, size: int = 32) -> str:
+    """
+    Tiny low-quality JPEG of the image (longest side `size` px) as a data URI.
+    Small enough to inline in every PostOut so clients can paint immediately.
+    """
+    thumb = im.copy()
+    thumb.thumbnail((size, size), Image.BILINEAR)
+    buf = io.BytesIO()
+    thumb.save(buf, format="JPEG", quality=40)
+    return "data:image/jpeg;base64," + base64.b64encode(buf.getvalue()).decode("ascii")
+
+
+def dominant_color(im: Image.Image) -> str:
+    # Averaging down to a single pixel is cheap and good enough for a backdrop
+    r, g, b = im.resize((1, 1), Image.BOX).getpixel((0, 0))[:3]
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def image_meta(im: Image.Image) -> dict:
+    """
+    Layout/placeholder metadata for an RGB image, stored next to image_status.
+    """
+    w, h = im.size
+    return {
+        "width": w,
+        "height": h,
+        "placeholder": placeholder_data_uri(im),
+        "dominant_color": dominant_color(im),
+    }
+
+
+def read_image_meta(path: Path) -> dict:
+    with Image.open(path) as im:
+        return image_meta(im.convert("RGB"))
+
+
+def webp_variant_path(dst: Path) -> Path:
+    # Sibling the backend's static handler looks for when the client accepts WebP
+    return dst.with_name(dst.name + ".webp")
+
+
+def save_atomically(im: Image.Image, dst: Path, **params) -> None:
+    """
+    Encode into a temporary file next to `dst`, then rename it into place.
+    Reduced images are served as immutable, and handle() takes an existing
+    dst as done, so neither may ever see a partially written file.
+    """
+    tmp = dst.with_name(f".{dst.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        im.save(tmp, **params)
+        os.replace(tmp, dst)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def resize_image(
+    src: Path,
+    dst: Path,
+    max_width: int = 512,
+    webp_variant: bool = False,
+) -> dict:
+    """
+    Write an upright (EXIF orientation applied) reduced copy of `src` to
+    `dst` and return its metadata (see image_meta), computed from the
+    already decoded image.
+    With `webp_variant`, also write `<dst>.webp` from the same pixels.
+    """
     with Image.open(src) as im:
+        # Image.open only reads the header; decode the pixels here
+        with stage("decode"):
+            im.load()
+
+        # Upright pixels: the saved copies drop EXIF, so a phone photo's
+        # orientation tag would otherwise be lost (and the width / height
+        # and placeholder would be sideways too)
+        im = ImageOps.exif_transpose(im)
+
         # Ensure we have an alpha channel if the source is paletted/translucent
         if im.mode in ("P", "RGBA", "LA"):
             im = im.convert("RGBA")
@@ -56,117 +112,133 @@ def resize_image(src: Path, dst: Path, max_width: int = 512) -> None:
 
         w, h = im.size
         if w > max_width:
-            new_h = int(h * (max_width / w))
-            im = im.resize((max_width, new_h), Image.LANCZOS)
+            with stage("resize"):
+                new_h = int(h * (max_width / w))
+                im = im.resize((max_width, new_h), Image.LANCZOS)
 
         dst.parent.mkdir(parents=True, exist_ok=True)
 
-        # Save in the same extension as dst (png stays png, jpg stays jpg)
-        ext = dst.suffix.lower()
-        if ext in (".jpg", ".jpeg"):
-            im.save(dst, quality=85, optimize=True)
-        else:
-            # PNG (or anything else) as PNG
-            im.save(dst, format="PNG", optimize=True)
-
-
-
-def wait_for_db(engine: Engine) -> None:
-    while True:
-        try:
-            with engine.connect() as conn:
-                conn.execute(text("SELECT 1"))
-            return
-        except Exception as e:
-            print(f"[resize-worker] DB not ready yet: {e}. Retrying...")
-            time.sleep(2)
-
-
-def update_status(engine: Engine, filename: str, status: str) -> None:
+        with stage("encode"):
+            # the variant first: once dst exists, the job counts as done
+            if webp_variant:
+                save_atomically(im, webp_variant_path(dst), format="WEBP", quality=80, method=4)
+
+            # Save in the same extension as dst (png stays png, jpg stays jpg)
+            ext = dst.suffix.lower()
+            if ext in (".jpg", ".jpeg"):
+                save_atomically(im, dst, format="JPEG", quality=85, optimize=True)
+            else:
+                # PNG (or anything else) as PNG
+                save_atomically(im, dst, format="PNG", optimize=True)
+
+        with stage("meta"):
+            return image_meta(im)
+
+
+def update_status(
+    engine: Engine,
+    filename: str,
+    status: str,
+    meta: dict | None = None,
+) -> None:
     """
-    Update image_status for the post with the given image_filename.
+    Update image_status for the post with the given image_filename,
+    plus the image metadata columns when `meta` is given.
     Safe to call multiple times (idempotent).
     """
-    with engine.begin() as conn:
-        conn.execute(
-            text(
-                """
-                UPDATE post
-                SET image_status = :status
-                WHERE image_filename = :filename
-                """
-            ),
-            {"status": status, "filename": filename},
-        )
+    with stage("db_update"), engine.begin() as conn:
+        if meta is None:
+            conn.execute(
+                text(
+                    """
+                    UPDATE post
+                    SET image_status = :status
+                    WHERE image_filename = :filename
+                    """
+                ),
+                {"status": status, "filename": filename},
+            )
+        else:
+            conn.execute(
+                text(
+                    """
+                    UPDATE post
+                    SET image_status = :status,
+                        image_width = :width,
+                        image_height = :height,
+                        image_placeholder = :placeholder,
+                        image_dominant_color = :dominant_color
+                    WHERE image_filename = :filename
+                    """
+                ),
+                {"status": status, "filename": filename, **meta},
+            )
+
+
+# -------------------------
+# Job (runs inline or in a pool process, see RESIZE_EXECUTOR)
+# -------------------------
+_engine: Engine | None = None
+_original_dir = Path()
+_reduced_dir = Path()
+_webp_variant = False
+
+
+def init_worker() -> None:
+    """Per-process state: one engine (and its pool) per process."""
+    global _engine, _original_dir, _reduced_dir, _webp_variant
+    _original_dir, _reduced_dir = ensure_dirs(Path(os.getenv("IMAGE_ROOT", "/app/uploads")))
+    _webp_variant = env_bool("RESIZE_WEBP_VARIANT")
+    _engine = make_engine(NAME)
+    wait_for_db(_engine, NAME)
+
+
+def handle(payload: dict) -> None:
+    filename = payload["filename"]
+    src = _original_dir / filename
+    dst = _reduced_dir / filename
+
+    if not src.exists():
+        raise FileNotFoundError(f"Original image does not exist: {src}")
+
+    # Idempotency: if already resized, ensure READY and ack
+    if dst.exists():
+        update_status(_engine, filename, "READY", read_image_meta(dst))
+        print(f"[resize-worker] Reduced already exists, marked READY: {dst}")
+        return
+
+    meta = resize_image(
+        src,
+        dst,
+        max_width=int(payload.get("max_width", 512)),
+        webp_variant=_webp_variant,
+    )
+    update_status(_engine, filename, "READY", meta)
+    print(f"[resize-worker] Wrote reduced image, marked READY: {dst}")
+
+
+def on_failure(payload: dict, exc: Exception) -> None:
+    # Mark FAILED if we know which post it was
+    filename = payload.get("filename")
+    if filename:
+        update_status(_engine, filename, "FAILED")
 
 
 def main() -> None:
-    queue_name = os.getenv("RABBITMQ_QUEUE", "image_resize")
-    image_root = Path(os.getenv("IMAGE_ROOT", "/app/uploads"))
-    original_dir, reduced_dir = ensure_dirs(image_root)
-
-    engine = make_engine()
-    wait_for_db(engine)
-
-    # Wait/retry loop for RabbitMQ readiness
-    while True:
-        try:
-            connection = pika.BlockingConnection(amqp_params())
-            break
-        except Exception as e:
-            print(f"[resize-worker] RabbitMQ not ready yet: {e}. Retrying...")
-            time.sleep(2)
-
-    channel = connection.channel()
-    channel.queue_declare(queue=queue_name, durable=True)
-    channel.basic_qos(prefetch_count=1)
-
-    print(f"[resize-worker] Listening on queue: {queue_name}")
-
-    def handle(ch, method, properties, body: bytes):
-        filename = None
-        try:
-            payload = json.loads(body.decode("utf-8"))
-            filename = payload["filename"]
-            src = original_dir / filename
-            dst = reduced_dir / filename
-
-            if not src.exists():
-                # mark failed because original is missing
-                update_status(engine, filename, "FAILED")
-                raise FileNotFoundError(f"Original image does not exist: {src}")
-
-            # Idempotency: if already resized, ensure READY and ack
-            if dst.exists():
-                update_status(engine, filename, "READY")
-                print(f"[resize-worker] Reduced already exists, marked READY: {dst}")
-                ch.basic_ack(delivery_tag=method.delivery_tag)
-                return
-
-            resize_image(src, dst, max_width=int(payload.get("max_width", 512)))
-            update_status(engine, filename, "READY")
-            print(f"[resize-worker] Wrote reduced image, marked READY: {dst}")
-
-            ch.basic_ack(delivery_tag=method.delivery_tag)
-
-        except Exception as e:
-            # Mark FAILED if we know which post it was
-            if filename:
-                try:
-                    update_status(engine, filename, "FAILED")
-                except Exception as db_err:
-                    print(f"[resize-worker] Failed to update status to FAILED: {db_err}")
-
-            # For the exercise, don't requeue forever on bad input
-            print(f"[resize-worker] Job failed: {e}")
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
-
-    channel.basic_consume(queue=queue_name, on_message_callback=handle)
-    try:
-        channel.start_consuming()
-    finally:
-        connection.close()
+    # Pillow releases the GIL only partly; "process" spreads decode/resize over cores
+    worker = Worker(
+        NAME,
+        os.getenv("RABBITMQ_QUEUE", "image_resize"),
+        handle,
+        executor=os.getenv("RESIZE_EXECUTOR", "inline"),
+        max_workers=int(os.getenv("RESIZE_WORKERS", "1")),
+        prefetch=int(os.getenv("RESIZE_PREFETCH", "0")) or None,
+        initializer=init_worker,
+        on_failure=on_failure,
+        trace_kind="resize",
+    )
+    worker.run()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,7 +1,7 @@
 from pathlib import Path
 import sys
 
-from PIL import Image
+from PIL import ExifTags, Image
 
 # Make sure the project root (the directory containing resize_worker.py) is on sys.path
 ROOT = Path(__file__).resolve().parents[1]
@@ -46,3 +46,82 @@ def test_resize_image_creates_file_and_respects_max_width(tmp_path: Path) -> Non
 
         # The resize-worker always normalises output to RGB (no alpha)
         assert im.mode == "RGB"
+
+
+def test_resize_image_returns_placeholder_metadata(tmp_path: Path) -> None:
+    src = tmp_path / "src.jpg"
+    dst = tmp_path / "dst.jpg"
+
+    _create_image(src, size=(800, 600), mode="RGB")
+
+    meta = resize_image(src, dst, max_width=400)
+
+    # Dimensions describe the reduced file that was written
+    with Image.open(dst) as im:
+        assert (meta["width"], meta["height"]) == im.size
+
+    assert meta["placeholder"].startswith("data:image/jpeg;base64,")
+    assert len(meta["placeholder"]) < 2000
+
+    # Solid (10, 20, 30) source; allow for JPEG rounding
+    r, g, b = (int(meta["dominant_color"][i : i + 2], 16) for i in (1, 3, 5))
+    assert abs(r - 10) <= 3 and abs(g - 20) <= 3 and abs(b - 30) <= 3
+
+
+def test_resize_image_writes_webp_variant(tmp_path: Path) -> None:
+    src = tmp_path / "src.png"
+    dst = tmp_path / "dst.png"
+
+    _create_image(src, size=(800, 600), mode="RGBA")
+
+    resize_image(src, dst, max_width=400, webp_variant=True)
+
+    variant = tmp_path / "dst.png.webp"
+    assert variant.exists()
+    with Image.open(variant) as im:
+        assert im.format == "WEBP"
+        assert im.size[0] <= 400
+
+
+def test_resize_image_never_leaves_a_partial_file(tmp_path: Path, monkeypatch) -> None:
+    src = tmp_path / "src.png"
+    dst = tmp_path / "dst.png"
+    _create_image(src, size=(800, 600), mode="RGB")
+
+    resize_image(src, dst, max_width=400, webp_variant=True)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["dst.png", "dst.png.webp", "src.png"]
+
+    # an encoder failure leaves neither dst nor a temp file behind
+    dst.unlink()
+
+    def broken_save(self, fp, format=None, **params):
+        Path(fp).write_bytes(b"half an image")
+        raise OSError("disk full")
+
+    monkeypatch.setattr(Image.Image, "save", broken_save)
+    try:
+        resize_image(src, dst, max_width=400)
+    except OSError:
+        pass
+    else:
+        raise AssertionError("expected the encoder failure to propagate")
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["dst.png.webp", "src.png"]
+
+
+def test_resize_image_applies_exif_orientation(tmp_path: Path) -> None:
+    src = tmp_path / "src.jpg"
+    dst = tmp_path / "dst.jpg"
+
+    # a landscape sensor image tagged "rotate 90° clockwise to display"
+    exif = Image.Exif()
+    exif[ExifTags.Base.Orientation] = 6
+    Image.new("RGB", (800, 400), (10, 20, 30)).save(src, exif=exif)
+
+    meta = resize_image(src, dst, max_width=100, webp_variant=True)
+
+    assert (meta["width"], meta["height"]) == (100, 200)
+    with Image.open(dst) as im:
+        assert im.size == (100, 200)
+        assert im.getexif().get(ExifTags.Base.Orientation, 1) == 1
+    with Image.open(dst.with_name(dst.name + ".webp")) as im:
+        assert im.size == (100, 200)
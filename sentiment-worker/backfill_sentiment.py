@@ -0,0 +1,139 @@
+"""
+Backfill sentiment for existing posts without going through RabbitMQ.
+
+Pages through posts with sentiment_status = 'NONE' in id order (keyset on
+id, one short query per batch), scores each batch (through the shared
+sentiment cache), writes it with one UPDATE and checkpoints the last id so
+an interrupted run resumes where it stopped. Throttled to --rows-per-sec so it can run next to
+live traffic.
+
+    uv run python backfill_sentiment.py --rows-per-sec 200
+"""
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from sentiment_worker import (
+    SENTIMENT_BACKEND,
+    SentimentCache,
+    backend_model_id,
+    load_pipeline,
+    make_engine,
+    score_contents,
+    update_sentiments,
+    wait_for_db,
+)
+
+
+def load_checkpoint(path: Path) -> dict:
+    if not path.exists():
+        return {"last_id": 0, "processed": 0}
+    return json.loads(path.read_text())
+
+
+def save_checkpoint(path: Path, checkpoint: dict) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(checkpoint))
+    os.replace(tmp, path)
+
+
+class Throttle:
+    """Sleeps just enough to keep the overall rate at or below `rows_per_sec`."""
+
+    def __init__(self, rows_per_sec: float, clock=time.monotonic, sleep=time.sleep):
+        self.rows_per_sec = rows_per_sec
+        self.clock = clock
+        self.sleep = sleep
+        self.started = clock()
+        self.rows = 0
+
+    def wait(self, rows: int) -> None:
+        self.rows += rows
+        if self.rows_per_sec <= 0:
+            return
+        ahead = self.rows / self.rows_per_sec - (self.clock() - self.started)
+        if ahead > 0:
+            self.sleep(ahead)
+
+
+PENDING_POSTS_PAGE = text(
+    "SELECT id, content FROM post "
+    "WHERE id > :last_id "
+    "AND sentiment_status = 'NONE' "
+    "AND content IS NOT NULL "
+    "ORDER BY id "
+    "LIMIT :batch"
+)
+
+
+def stream_pending_posts(engine: Engine, after_id: int, batch_size: int):
+    """
+    Yield lists of (id, content) for posts still waiting for sentiment,
+    in id order, `batch_size` rows at a time.
+
+    Keyset-paginated on id, one short read per batch: no connection or
+    snapshot is held while a batch is scored and throttled, so a long run
+    does not keep vacuum from cleaning up behind live traffic.
+    """
+    last_id = after_id
+    while True:
+        with engine.connect() as conn:
+            rows = conn.execute(PENDING_POSTS_PAGE, {"last_id": last_id, "batch": batch_size}).all()
+        if not rows:
+            return
+        yield [(row.id, row.content) for row in rows]
+        last_id = rows[-1].id
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--rows-per-sec", type=float, default=200, help="0 = unthrottled")
+    parser.add_argument("--checkpoint", type=Path, default=Path("backfill_sentiment.checkpoint.json"))
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    parser.add_argument("--limit", type=int, help="stop after this many posts")
+    args = parser.parse_args()
+
+    checkpoint = {"last_id": 0, "processed": 0} if args.restart else load_checkpoint(args.checkpoint)
+    print(f"[backfill] Resuming after post id {checkpoint['last_id']}")
+
+    engine = make_engine()
+    wait_for_db(engine, "backfill")
+    nlp = load_pipeline(SENTIMENT_BACKEND)
+    cache = SentimentCache(engine, backend_model_id(SENTIMENT_BACKEND))
+
+    throttle = Throttle(args.rows_per_sec)
+    done = 0
+    for rows in stream_pending_posts(engine, checkpoint["last_id"], args.batch_size):
+        if args.limit is not None:
+            rows = rows[: args.limit - done]
+
+        contents = {pid: content.strip() for pid, content in rows if content and content.strip()}
+        results, inferred, elapsed_ms = score_contents(nlp, contents, args.batch_size, cache)
+        update_sentiments(engine, results)
+
+        done += len(rows)
+        checkpoint = {"last_id": rows[-1][0], "processed": checkpoint["processed"] + len(rows)}
+        save_checkpoint(args.checkpoint, checkpoint)
+
+        stats = cache.stats()
+        print(
+            f"[backfill] {checkpoint['processed']} posts done (last id {checkpoint['last_id']}); "
+            f"batch {len(results)} scored, {inferred} inferred in {elapsed_ms:.0f} ms; "
+            f"cache hit rate {stats['hit_rate']:.1%}"
+        )
+
+        if args.limit is not None and done >= args.limit:
+            break
+        throttle.wait(len(rows))
+
+    print(f"[backfill] Finished, {checkpoint['processed']} posts processed in total")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Compare the torch and onnx sentiment backends on CPU: model load time,
+throughput, per-batch latency and peak RSS.
+
+    uv run --extra onnx python benchmark_backends.py --texts 2000 --batch-size 16
+
+Each backend runs in its own subprocess so RSS numbers are not mixed.
+"""
+import argparse
+import json
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+from export_onnx import SAMPLE_TEXTS
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def run_one(backend: str, n_texts: int, batch_size: int) -> dict:
+    started = time.perf_counter()
+    from sentiment_worker import load_pipeline
+
+    nlp = load_pipeline(backend)
+    load_s = time.perf_counter() - started
+
+    texts = [SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)] for i in range(n_texts)]
+    nlp(texts[:batch_size], batch_size=batch_size)  # warm-up
+
+    latencies_ms: list[float] = []
+    started = time.perf_counter()
+    for i in range(0, n_texts, batch_size):
+        t0 = time.perf_counter()
+        nlp(texts[i : i + batch_size], batch_size=batch_size)
+        latencies_ms.append((time.perf_counter() - t0) * 1000)
+    total_s = time.perf_counter() - started
+
+    return {
+        "backend": backend,
+        "load_s": round(load_s, 2),
+        "texts_per_s": round(n_texts / total_s, 1),
+        "batch_p50_ms": round(statistics.median(latencies_ms), 1),
+        "batch_p95_ms": round(_percentile(latencies_ms, 95), 1),
+        # ru_maxrss is KiB on Linux
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backends", default="torch,onnx")
+    parser.add_argument("--texts", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--json", action="store_true", help="print raw JSON results")
+    parser.add_argument("--run-one", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        print(json.dumps(run_one(args.run_one, args.texts, args.batch_size)))
+        return
+
+    results = []
+    for backend in args.backends.split(","):
+        out = subprocess.run(
+            [
+                sys.executable,
+                __file__,
+                "--run-one",
+                backend,
+                "--texts",
+                str(args.texts),
+                "--batch-size",
+                str(args.batch_size),
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    cols = ["backend", "load_s", "texts_per_s", "batch_p50_ms", "batch_p95_ms", "max_rss_mb"]
+    print("  ".join(f"{c:>12}" for c in cols))
+    for r in results:
+        print("  ".join(f"{r[c]!s:>12}" for c in cols))
+
+
+if __name__ == "__main__":
+    main()
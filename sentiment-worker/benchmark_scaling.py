@@ -0,0 +1,96 @@
+"""
+Measure inference throughput of the multi-process layout as the number of
+consumer processes K varies, with cores split evenly between them (the same
+split SENTIMENT_PROCESSES uses).
+
+    uv run python benchmark_scaling.py --processes 1,2,4 --texts 2000
+
+As in the supervisor, the torch model is loaded once and shared with the
+forked processes copy-on-write.
+"""
+import argparse
+import json
+import multiprocessing
+import time
+
+from export_onnx import SAMPLE_TEXTS
+from sentiment_worker import (
+    SENTIMENT_BACKEND,
+    available_cores,
+    configure_threads,
+    load_pipeline,
+    warm_up,
+)
+
+
+def _child(nlp, threads: int, texts: list[str], batch_size: int, ready, go) -> None:
+    configure_threads(threads)
+    if nlp is None:
+        nlp = load_pipeline(SENTIMENT_BACKEND, threads)
+    warm_up(nlp, batch_size)
+    ready.put(True)
+    go.wait()
+    nlp(texts, batch_size=batch_size)
+
+
+def run(processes: int, n_texts: int, batch_size: int, nlp) -> dict:
+    ctx = multiprocessing.get_context("fork")
+    threads = max(1, available_cores() // processes)
+    texts = [SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)] for i in range(n_texts)]
+    shares = [texts[i::processes] for i in range(processes)]
+
+    ready = ctx.Queue()
+    go = ctx.Event()
+    procs = [
+        ctx.Process(target=_child, args=(nlp, threads, share, batch_size, ready, go))
+        for share in shares
+    ]
+    for proc in procs:
+        proc.start()
+    for _ in procs:
+        ready.get()
+
+    started = time.perf_counter()
+    go.set()
+    for proc in procs:
+        proc.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "processes": processes,
+        "threads_per_process": threads,
+        "texts_per_s": round(n_texts / elapsed, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--processes", default="1,2,4")
+    parser.add_argument("--texts", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--json", action="store_true", help="print raw JSON results")
+    args = parser.parse_args()
+
+    counts = [int(k) for k in args.processes.split(",")]
+
+    # loaded before fork, without running inference in the parent
+    nlp = load_pipeline(SENTIMENT_BACKEND) if SENTIMENT_BACKEND == "torch" else None
+
+    results = [run(k, args.texts, args.batch_size, nlp) for k in counts]
+    base = results[0]["texts_per_s"]
+    for r in results:
+        r["speedup"] = round(r["texts_per_s"] / base, 2)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{available_cores()} cores, backend {SENTIMENT_BACKEND}")
+    cols = ["processes", "threads_per_process", "texts_per_s", "speedup"]
+    print("  ".join(f"{c:>20}" for c in cols))
+    for r in results:
+        print("  ".join(f"{r[c]!s:>20}" for c in cols))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Export the sentiment model to ONNX, quantize it to int8 and check that the
+quantized model agrees with the PyTorch pipeline.
+
+    uv run --extra onnx --group export python export_onnx.py --out models/onnx
+
+The output directory is what SENTIMENT_ONNX_DIR points at when the worker
+runs with SENTIMENT_BACKEND=onnx.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+from sentiment_worker import SENTIMENT_MODEL, OnnxSentimentPipeline, normalize_result
+
+# Short, varied posts; the check fails if the int8 model flips too many labels
+SAMPLE_TEXTS = [
+    "love it!",
+    "This is the worst update ever.",
+    "Not bad at all, pretty happy with how it turned out.",
+    "I can't believe they cancelled the show, so disappointing.",
+    "Stay hydrated 💧",
+    "First post!",
+    "Leafy vibes 🍃",
+    "meh",
+    "The food was cold and the waiter ignored us for an hour.",
+    "Best concert I've been to in years, the crowd was amazing.",
+    "I guess it works, sometimes.",
+    "Absolutely thrilled to announce I got the job!",
+    "Traffic again. Every single day.",
+    "Thanks everyone for the birthday wishes ❤️",
+    "Why does my phone keep crashing",
+    "Sunset at the beach tonight was unreal.",
+]
+
+
+def export(model_id: str, out_dir: Path) -> None:
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+    model = AutoModelForSequenceClassification.from_pretrained(model_id)
+    model.eval()
+
+    dummy = tokenizer(["hello world"], return_tensors="pt")
+    fp32_path = out_dir / "model.onnx"
+    torch.onnx.export(
+        model,
+        (dummy["input_ids"], dummy["attention_mask"]),
+        str(fp32_path),
+        input_names=["input_ids", "attention_mask"],
+        output_names=["logits"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "logits": {0: "batch"},
+        },
+        opset_version=17,
+    )
+
+    quantize_dynamic(
+        str(fp32_path),
+        str(out_dir / "model.quant.onnx"),
+        weight_type=QuantType.QInt8,
+    )
+
+    # tokenizer.json + config.json (id2label) are all the ONNX backend needs
+    tokenizer.save_pretrained(out_dir)
+    model.config.save_pretrained(out_dir)
+    print(f"[export-onnx] Wrote {out_dir / 'model.quant.onnx'}")
+
+
+def check_agreement(model_id: str, out_dir: Path, texts: list[str]) -> float:
+    from transformers import pipeline
+
+    reference = pipeline("sentiment-analysis", model=model_id)
+    quantized = OnnxSentimentPipeline(out_dir)
+
+    expected = [normalize_result(r) for r in reference(texts, batch_size=16)]
+    actual = [normalize_result(r) for r in quantized(texts, batch_size=16)]
+
+    agree = 0
+    max_diff = 0.0
+    for text, (exp_label, exp_score), (act_label, act_score) in zip(texts, expected, actual):
+        if exp_label == act_label:
+            agree += 1
+            max_diff = max(max_diff, abs(exp_score - act_score))
+        else:
+            print(f"[export-onnx] Label mismatch: {text!r}: torch={exp_label} onnx={act_label}")
+
+    agreement = agree / len(texts)
+    print(
+        f"[export-onnx] Label agreement {agreement:.1%} on {len(texts)} texts, "
+        f"max score diff {max_diff:.4f}"
+    )
+    return agreement
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default=SENTIMENT_MODEL)
+    parser.add_argument("--out", type=Path, default=Path("models/onnx"))
+    parser.add_argument("--texts-file", type=Path, help="extra texts, one per line")
+    parser.add_argument("--min-agreement", type=float, default=0.95)
+    parser.add_argument("--skip-export", action="store_true", help="only run the check")
+    args = parser.parse_args()
+
+    if not args.skip_export:
+        export(args.model, args.out)
+
+    texts = list(SAMPLE_TEXTS)
+    if args.texts_file:
+        texts += [t for t in args.texts_file.read_text().splitlines() if t.strip()]
+
+    if check_agreement(args.model, args.out, texts) < args.min_agreement:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,143 +1,589 @@
+import hashlib
 import json
+import multiprocessing
 import os
+import signal
+import sys
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
 
-import pika
-from transformers import pipeline
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from sqlalchemy.engine import Engine
 
-SENTIMENT_QUEUE_NAME = os.getenv("RABBITMQ_SENTIMENT_QUEUE", "sentiment_analyze")
-
-
-def amqp_params() -> pika.ConnectionParameters:
-    host = os.getenv("RABBITMQ_HOST", "rabbitmq")
-    port = int(os.getenv("RABBITMQ_PORT", "5672"))
-    user = os.getenv("RABBITMQ_USER", "guest")
-    password = os.getenv("RABBITMQ_PASSWORD", "guest")
-    credentials = pika.PlainCredentials(user, password)
-    return pika.ConnectionParameters(host=host, port=port, credentials=credentials)
-
-
-def db_url() -> str:
-    host = os.getenv("DB_HOST", "db")
-    port = os.getenv("DB_PORT", "5432")
-    name = os.getenv("DB_NAME", "social")
-    user = os.getenv("DB_USER", "admin")
-    pw = os.getenv("DB_PASSWORD", "password")
-    return f"postgresql+psycopg://{user}:{pw}@{host}:{port}/{name}"
-
-
-def make_engine() -> Engine:
-    return create_engine(db_url(), pool_pre_ping=True)
+from worker_runtime import Worker, make_engine, stage, wait_for_db
 
+NAME = "sentiment-worker"
 
-def wait_for_db(engine: Engine) -> None:
-    while True:
-        try:
-            with engine.connect() as conn:
-                conn.execute(text("SELECT 1"))
-            print("[sentiment-worker] DB is ready")
-            return
-        except Exception as exc:
-            print(f"[sentiment-worker] DB not ready yet: {exc}")
-            time.sleep(2)
+SENTIMENT_QUEUE_NAME = os.getenv("RABBITMQ_SENTIMENT_QUEUE", "sentiment_analyze")
+SENTIMENT_MODEL = os.getenv(
+    "SENTIMENT_MODEL", "distilbert/distilbert-base-uncased-finetuned-sst-2-english"
+)
+# "torch" (transformers pipeline) or "onnx" (int8 export, see export_onnx.py)
+SENTIMENT_BACKEND = os.getenv("SENTIMENT_BACKEND", "torch")
+SENTIMENT_ONNX_DIR = os.getenv("SENTIMENT_ONNX_DIR", "models/onnx")
+# Pre-baked snapshot (see snapshot_model.py); when set, the hub is never contacted
+SENTIMENT_MODEL_DIR = os.getenv("SENTIMENT_MODEL_DIR")
+SENTIMENT_READY_FILE = os.getenv("SENTIMENT_READY_FILE", "/tmp/sentiment-worker.ready")
 
 
-def load_post_content(engine: Engine, post_id: int) -> str | None:
-    with engine.connect() as conn:
-        row = conn.execute(
-            text("SELECT content FROM post WHERE id = :post_id"),
-            {"post_id": post_id},
-        ).mappings().first()
+def load_post_contents(engine: Engine, post_ids: list[int]) -> dict[int, str]:
+    """
+    Load the content of all given posts in one query.
+    Posts that are missing or have no content are left out.
+    """
+    with stage("db_read"), engine.connect() as conn:
+        rows = conn.execute(
+            text("SELECT id, content FROM post WHERE id = ANY(:post_ids)"),
+            {"post_ids": post_ids},
+        ).mappings().all()
 
-    if row is None:
-        return None
+    contents: dict[int, str] = {}
+    for row in rows:
+        content = (row["content"] or "").strip()
+        if content:
+            contents[row["id"]] = content
+    return contents
 
-    content = (row["content"] or "").strip()
-    return content or None
 
+def update_sentiments(
+    engine: Engine,
+    results: list[tuple[int, str, float]],
+) -> None:
+    """
+    Write (post_id, label, score) results for a whole batch in one statement.
+    """
+    if not results:
+        return
 
-def update_sentiment(engine: Engine, post_id: int, label: str, score: float) -> None:
-    with engine.begin() as conn:
+    post_ids, labels, scores = (list(col) for col in zip(*results))
+    with stage("db_update"), engine.begin() as conn:
         conn.execute(
             text(
                 "UPDATE post "
                 "SET sentiment_status = :status, "
-                "sentiment_label = :label, "
-                "sentiment_score = :score "
-                "WHERE id = :post_id"
+                "sentiment_label = r.label, "
+                "sentiment_score = r.score "
+                "FROM unnest("
+                "CAST(:post_ids AS integer[]), "
+                "CAST(:labels AS text[]), "
+                "CAST(:scores AS real[])"
+                ") AS r(post_id, label, score) "
+                "WHERE post.id = r.post_id"
             ),
             {
                 "status": "READY",
-                "label": label,
-                "score": score,
-                "post_id": post_id,
+                "post_ids": post_ids,
+                "labels": labels,
+                "scores": scores,
             },
         )
 
 
-def main() -> None:
-    engine = make_engine()
-    wait_for_db(engine)
+# -------------------------
+# Inference backends
+# -------------------------
+class OnnxSentimentPipeline:
+    """
+    Minimal stand-in for the transformers sentiment pipeline that runs the
+    int8-quantized ONNX export through ONNX Runtime. Needs only onnxruntime,
+    tokenizers and numpy, so PyTorch is never imported.
+    """
 
-    nlp = pipeline(
-        "sentiment-analysis",
-        model="distilbert/distilbert-base-uncased-finetuned-sst-2-english",
-    )
-    print("[sentiment-worker] Model loaded")
+    def __init__(self, model_dir: Path, intra_op_threads: int = 0):
+        import numpy as np
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
 
-    while True:
-        try:
-            connection = pika.BlockingConnection(amqp_params())
-            break
-        except Exception as exc:
-            print(f"[sentiment-worker] RabbitMQ not ready: {exc}")
-            time.sleep(2)
-
-    channel = connection.channel()
-    channel.queue_declare(queue=SENTIMENT_QUEUE_NAME, durable=True)
-    channel.basic_qos(prefetch_count=1)
-    print(f"[sentiment-worker] Listening on queue: {SENTIMENT_QUEUE_NAME}")
-
-    def handle(ch, method, properties, body: bytes) -> None:
-        try:
-            payload = json.loads(body.decode("utf-8"))
-            post_id = int(payload["post_id"])
-        except Exception as exc:
-            print(f"[sentiment-worker] Bad message: {exc} / {body!r}")
-            ch.basic_ack(delivery_tag=method.delivery_tag)
+        self._np = np
+
+        config = json.loads((model_dir / "config.json").read_text())
+        self.id2label = {int(k): v for k, v in config["id2label"].items()}
+
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=512)
+        self.tokenizer.enable_padding(
+            pad_id=config.get("pad_token_id", 0) or 0, pad_token="[PAD]"
+        )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(
+            str(model_dir / "model.quant.onnx"),
+            options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def __call__(self, texts: list[str], batch_size: int = 16) -> list[dict]:
+        np = self._np
+        results: list[dict] = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start : start + batch_size])
+            feeds = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": np.array(
+                    [e.attention_mask for e in encodings], dtype=np.int64
+                ),
+            }
+            logits = self.session.run(
+                None, {k: v for k, v in feeds.items() if k in self.input_names}
+            )[0]
+
+            exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+            probs = exp / exp.sum(axis=1, keepdims=True)
+            for row in probs:
+                idx = int(row.argmax())
+                results.append({"label": self.id2label[idx], "score": float(row[idx])})
+        return results
+
+
+def backend_model_id(backend: str = SENTIMENT_BACKEND) -> str:
+    # int8 scores differ slightly from fp32, so backends keep separate cache entries
+    return SENTIMENT_MODEL if backend == "torch" else f"{SENTIMENT_MODEL}:onnx-int8"
+
+
+def load_pipeline(backend: str = SENTIMENT_BACKEND, threads: int = 0):
+    if backend == "onnx":
+        return OnnxSentimentPipeline(Path(SENTIMENT_ONNX_DIR), intra_op_threads=threads)
+    if backend != "torch":
+        raise ValueError(f"Unknown SENTIMENT_BACKEND: {backend!r}")
+
+    if SENTIMENT_MODEL_DIR:
+        # must be set before transformers/huggingface_hub are imported
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+        os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+    # imported lazily so the onnx backend never pays for PyTorch
+    from transformers import pipeline
+
+    if SENTIMENT_MODEL_DIR:
+        return pipeline(
+            "sentiment-analysis",
+            model=SENTIMENT_MODEL_DIR,
+            tokenizer=SENTIMENT_MODEL_DIR,
+        )
+    return pipeline("sentiment-analysis", model=SENTIMENT_MODEL)
+
+
+def normalize_result(result: dict) -> tuple[str, float]:
+    raw_label = result["label"].upper()
+    label = "POSITIVE" if "POSITIVE" in raw_label else "NEGATIVE"
+    return label, float(result["score"])
+
+
+def analyze_batch(nlp, texts: list[str], batch_size: int) -> list[tuple[str, float]]:
+    """
+    Run the pipeline over all texts at once so the model sees padded batches
+    instead of one sequence per forward pass.
+    """
+    if not texts:
+        return []
+    outputs = nlp([t[:512] for t in texts], batch_size=batch_size)
+    return [normalize_result(r) for r in outputs]
+
+
+def parse_post_id(payload: dict) -> int | None:
+    try:
+        return int(payload["post_id"])
+    except Exception as exc:
+        print(f"[sentiment-worker] Bad message: {exc} / {payload!r}")
+        return None
+
+
+# -------------------------
+# Result cache
+# -------------------------
+def content_key(content: str) -> str:
+    """
+    Hash of the normalized text the model would see, so reposts and
+    case/whitespace variants of the same message share one cache entry.
+    """
+    normalized = " ".join(content[:512].split()).casefold()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class SentimentCache:
+    """
+    Two-level (content_hash, model_id) -> (label, score) cache: an in-process
+    LRU in front of the shared `sentiment_cache` table, so every replica
+    benefits from results computed by the others.
+    """
+
+    def __init__(self, engine: Engine | None, model_id: str, max_entries: int = 10_000):
+        self.engine = engine
+        self.model_id = model_id
+        self.max_entries = max_entries
+        self._lru: OrderedDict[str, tuple[str, float]] = OrderedDict()
+
+        self.lru_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.inferred = 0
+        self.inference_ms = 0.0
+
+    def _remember(self, key: str, value: tuple[str, float]) -> None:
+        self._lru[key] = value
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def get_many(self, keys: list[str]) -> dict[str, tuple[str, float]]:
+        found: dict[str, tuple[str, float]] = {}
+        for key in keys:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                found[key] = self._lru[key]
+                self.lru_hits += 1
+
+        missing = [k for k in keys if k not in found]
+        if missing and self.engine is not None:
+            with self.engine.connect() as conn:
+                rows = conn.execute(
+                    text(
+                        "SELECT content_hash, label, score FROM sentiment_cache "
+                        "WHERE model_id = :model_id AND content_hash = ANY(:keys)"
+                    ),
+                    {"model_id": self.model_id, "keys": missing},
+                ).all()
+            for key, label, score in rows:
+                found[key] = (label, float(score))
+                self._remember(key, found[key])
+                self.db_hits += 1
+
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, entries: dict[str, tuple[str, float]]) -> None:
+        for key, value in entries.items():
+            self._remember(key, value)
+
+        if not entries or self.engine is None:
             return
+        keys = list(entries)
+        with self.engine.begin() as conn:
+            conn.execute(
+                text(
+                    "INSERT INTO sentiment_cache (content_hash, model_id, label, score) "
+                    "SELECT k, :model_id, l, s FROM unnest("
+                    "CAST(:keys AS text[]), "
+                    "CAST(:labels AS text[]), "
+                    "CAST(:scores AS real[])"
+                    ") AS r(k, l, s) "
+                    "ON CONFLICT (content_hash, model_id) DO NOTHING"
+                ),
+                {
+                    "model_id": self.model_id,
+                    "keys": keys,
+                    "labels": [entries[k][0] for k in keys],
+                    "scores": [entries[k][1] for k in keys],
+                },
+            )
+
+    def record_inference(self, count: int, elapsed_ms: float) -> None:
+        self.inferred += count
+        self.inference_ms += elapsed_ms
+
+    def stats(self) -> dict:
+        hits = self.lru_hits + self.db_hits
+        lookups = hits + self.misses
+        avg_ms = self.inference_ms / self.inferred if self.inferred else 0.0
+        return {
+            "lookups": lookups,
+            "lru_hits": self.lru_hits,
+            "db_hits": self.db_hits,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            # estimated from the average per-text cost of actual model runs
+            "saved_ms": hits * avg_ms,
+        }
+
+
+def score_contents(
+    nlp,
+    contents: dict[int, str],
+    batch_size: int,
+    cache: SentimentCache,
+) -> tuple[list[tuple[int, str, float]], int, float]:
+    """
+    Score {post_id: content} through the cache and the model.
+    Returns ((post_id, label, score) rows, number of texts inferred, inference ms).
+    """
+    keys = {pid: content_key(content) for pid, content in contents.items()}
+    with stage("cache_lookup"):
+        results = cache.get_many(list(dict.fromkeys(keys.values())))
+
+    # unique texts that still need the model (duplicates in a batch run once)
+    todo: dict[str, str] = {}
+    for pid, key in keys.items():
+        if key not in results:
+            todo.setdefault(key, contents[pid])
 
+    elapsed_ms = 0.0
+    if todo:
+        started = time.perf_counter()
+        with stage("inference"):
+            scored = analyze_batch(nlp, list(todo.values()), batch_size)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        cache.record_inference(len(todo), elapsed_ms)
+
+        fresh = dict(zip(todo, scored))
+        with stage("cache_store"):
+            cache.put_many(fresh)
+        results.update(fresh)
+
+    rows = [(pid, *results[key]) for pid, key in keys.items()]
+    return rows, len(todo), elapsed_ms
+
+
+def process_batch(
+    engine: Engine,
+    nlp,
+    payloads: list[dict],
+    batch_size: int,
+    cache: SentimentCache,
+) -> None:
+    post_ids = [pid for pid in (parse_post_id(p) for p in payloads) if pid is not None]
+    if not post_ids:
+        return
+
+    contents = load_post_contents(engine, post_ids)
+    for post_id in post_ids:
+        if post_id not in contents:
+            print(f"[sentiment-worker] Post {post_id} has no content")
+
+    rows, inferred, elapsed_ms = score_contents(nlp, contents, batch_size, cache)
+    update_sentiments(engine, rows)
+
+    stats = cache.stats()
+    print(
+        f"[sentiment-worker] Sentiment updated for {len(rows)} posts "
+        f"({inferred} inferred in {elapsed_ms:.1f} ms, {len(payloads)} messages); "
+        f"cache hit rate {stats['hit_rate']:.1%}, saved ~{stats['saved_ms']:.0f} ms"
+    )
+
+
+# -------------------------
+# Startup / readiness
+# -------------------------
+class StartupTimer:
+    """Wall-clock duration of each named startup phase, in seconds."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.phases: dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        t0 = time.perf_counter()
         try:
-            content = load_post_content(engine, post_id)
-            if not content:
-                print(f"[sentiment-worker] Post {post_id} has no content")
-                ch.basic_ack(delivery_tag=method.delivery_tag)
-                return
-
-            result = nlp(content[:512])[0]
-            raw_label = result["label"].upper()
-            score = float(result["score"])
-            label = "POSITIVE" if "POSITIVE" in raw_label else "NEGATIVE"
-
-            update_sentiment(engine, post_id, label, score)
-            print(
-                f"[sentiment-worker] Sentiment updated for post {post_id}: "
-                f"{label} ({score:.3f})"
-            )
-            ch.basic_ack(delivery_tag=method.delivery_tag)
-        except Exception as exc:
-            print(f"[sentiment-worker] Error processing post {post_id}: {exc}")
-            # do not requeue for now
-            ch.basic_ack(delivery_tag=method.delivery_tag)
+            yield
+        finally:
+            self.phases[name] = round(time.perf_counter() - t0, 3)
+
+    def report(self) -> dict:
+        return {
+            "phases_s": dict(self.phases),
+            "total_s": round(time.perf_counter() - self.started, 3),
+        }
+
+
+def mark_ready(path: str, report: dict) -> None:
+    # orchestrators probe for this file; written atomically so it is never half-empty
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(report, f)
+    os.replace(tmp, path)
+
+
+def mark_not_ready(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def warm_up(nlp, batch_size: int) -> None:
+    # first forward pass allocates buffers / picks kernels; keep it off the first real job
+    analyze_batch(nlp, ["warm-up"] * batch_size, batch_size)
+
+
+def _timed_load(timer: StartupTimer, backend: str, threads: int = 0):
+    with timer.phase("model_load"):
+        return load_pipeline(backend, threads)
+
+
+# -------------------------
+# Threads / processes
+# -------------------------
+def available_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def configure_threads(threads: int) -> None:
+    """
+    Cap intra-op threads for this process. The env vars only take effect if
+    set before torch is imported; set_num_threads covers the case where it
+    already is (e.g. in a forked child).
+    """
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(threads)
 
-    channel.basic_consume(queue=SENTIMENT_QUEUE_NAME, on_message_callback=handle)
+
+def run_worker(
+    nlp=None,
+    threads: int = 0,
+    ready_file: str = SENTIMENT_READY_FILE,
+) -> None:
+    """
+    One consumer: load (unless given) and warm the model, connect, consume.
+    """
+    batch_size = int(os.getenv("SENTIMENT_BATCH_SIZE", "16"))
+    batch_wait_s = int(os.getenv("SENTIMENT_BATCH_WAIT_MS", "50")) / 1000
+
+    if threads:
+        configure_threads(threads)
+
+    mark_not_ready(ready_file)
+    timer = StartupTimer()
+
+    # Load the model while waiting for the DB instead of after it
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        model_future = None
+        if nlp is None:
+            model_future = pool.submit(_timed_load, timer, SENTIMENT_BACKEND, threads)
+
+        with timer.phase("db_wait"):
+            engine = make_engine(NAME)
+            wait_for_db(engine, NAME)
+
+        if model_future is not None:
+            nlp = model_future.result()
+    print(f"[sentiment-worker] Model loaded ({SENTIMENT_BACKEND} backend)")
+
+    with timer.phase("warm_up"):
+        warm_up(nlp, batch_size)
+
+    cache = SentimentCache(
+        engine,
+        backend_model_id(SENTIMENT_BACKEND),
+        max_entries=int(os.getenv("SENTIMENT_CACHE_SIZE", "10000")),
+    )
+
+    worker = Worker(
+        NAME,
+        SENTIMENT_QUEUE_NAME,
+        lambda payloads: process_batch(engine, nlp, payloads, batch_size, cache),
+        batched=True,
+        batch_size=batch_size,
+        batch_wait_s=batch_wait_s,
+        # broker may hand us a full batch before we ack anything
+        prefetch=batch_size,
+        trace_kind="sentiment",
+    )
+    with timer.phase("broker_connect"):
+        worker.connect()
+
+    report = timer.report()
+    mark_ready(ready_file, report)
+    print(f"[sentiment-worker] startup {json.dumps(report)}")
 
     try:
-        channel.start_consuming()
+        worker.run()
     finally:
-        connection.close()
+        mark_not_ready(ready_file)
+
+
+def _child_main(index: int, nlp, threads: int) -> None:
+    # until the consumer installs its drain handler, SIGTERM still runs run_worker's cleanup
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"[sentiment-worker] Consumer {index} started (pid {os.getpid()}, {threads} threads)")
+    # one metrics endpoint per consumer: WORKER_METRICS_PORT, +1, +2, ...
+    base_port = int(os.getenv("WORKER_METRICS_PORT", "0") or 0)
+    if base_port:
+        os.environ["WORKER_METRICS_PORT"] = str(base_port + index)
+    run_worker(nlp, threads, ready_file=f"{SENTIMENT_READY_FILE}.{index}")
+
+
+def supervise(processes: int) -> None:
+    """
+    Run `processes` consumers with cores split evenly between them. With the
+    torch backend the model is loaded once here and shared copy-on-write by
+    the forked children. No inference runs in the parent: OpenMP thread pools
+    do not survive fork, so each child warms up its own.
+    """
+    threads = max(1, available_cores() // processes)
+    configure_threads(threads)
+    print(f"[sentiment-worker] Supervisor: {processes} consumers x {threads} threads")
+
+    nlp = None
+    if SENTIMENT_BACKEND == "torch":
+        timer = StartupTimer()
+        nlp = _timed_load(timer, SENTIMENT_BACKEND, threads)
+        print(f"[sentiment-worker] Shared model loaded in {timer.phases['model_load']}s")
+
+    ctx = multiprocessing.get_context("fork")
+    children: dict[int, multiprocessing.Process] = {}
+    stopping = False
+
+    def start(index: int) -> None:
+        # a consumer that was SIGKILLed (or left over from an earlier run)
+        # never removed its file; the new one is not ready until it says so
+        mark_not_ready(f"{SENTIMENT_READY_FILE}.{index}")
+        proc = ctx.Process(target=_child_main, args=(index, nlp, threads), daemon=True)
+        proc.start()
+        children[index] = proc
+
+    def stop(*_):
+        nonlocal stopping
+        stopping = True
+        for proc in children.values():
+            if proc.is_alive():
+                proc.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    mark_not_ready(SENTIMENT_READY_FILE)
+    for index in range(processes):
+        start(index)
+
+    child_files = [f"{SENTIMENT_READY_FILE}.{i}" for i in range(processes)]
+    ready = False
+    while not stopping:
+        for index, proc in list(children.items()):
+            if not proc.is_alive() and not stopping:
+                print(f"[sentiment-worker] Consumer {index} exited ({proc.exitcode}), restarting")
+                start(index)
+
+        # ready only while every consumer is
+        all_ready = all(os.path.exists(f) for f in child_files)
+        if all_ready and not ready:
+            mark_ready(SENTIMENT_READY_FILE, {"processes": processes, "threads": threads})
+        elif ready and not all_ready:
+            mark_not_ready(SENTIMENT_READY_FILE)
+        ready = all_ready
+        time.sleep(1)
+
+    for proc in children.values():
+        proc.join(timeout=30)
+    mark_not_ready(SENTIMENT_READY_FILE)
+
+
+def main() -> None:
+    processes = int(os.getenv("SENTIMENT_PROCESSES", "1"))
+    if processes > 1:
+        supervise(processes)
+    else:
+        run_worker()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,33 @@
+"""
+Save the sentiment model and tokenizer to a local directory so the worker can
+start with SENTIMENT_MODEL_DIR set and never contact the Hugging Face hub.
+
+    uv run python snapshot_model.py /models/sentiment
+
+Used at image build time by the Dockerfile.
+"""
+import os
+import sys
+from pathlib import Path
+
+# Same default as sentiment_worker.py; kept separate so the Docker layer that
+# runs this script does not depend on (and get invalidated by) worker code.
+SENTIMENT_MODEL = os.getenv(
+    "SENTIMENT_MODEL", "distilbert/distilbert-base-uncased-finetuned-sst-2-english"
+)
+
+
+def main() -> None:
+    if len(sys.argv) != 2:
+        sys.exit(f"usage: {sys.argv[0]} OUT_DIR")
+    out_dir = Path(sys.argv[1])
+
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    AutoTokenizer.from_pretrained(SENTIMENT_MODEL).save_pretrained(out_dir)
+    AutoModelForSequenceClassification.from_pretrained(SENTIMENT_MODEL).save_pretrained(out_dir)
+    print(f"[snapshot-model] Saved {SENTIMENT_MODEL} to {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import sys
+from pathlib import Path
+
+# Make sure the project root (the directory containing backfill_sentiment.py) is on sys.path
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from sqlalchemy import create_engine, text
+
+from backfill_sentiment import Throttle, load_checkpoint, save_checkpoint, stream_pending_posts
+
+
+def test_checkpoint_roundtrip(tmp_path: Path):
+    path = tmp_path / "cp.json"
+    assert load_checkpoint(path) == {"last_id": 0, "processed": 0}
+
+    save_checkpoint(path, {"last_id": 42, "processed": 10})
+    assert load_checkpoint(path) == {"last_id": 42, "processed": 10}
+
+
+def test_throttle_sleeps_to_target_rate():
+    now = [0.0]
+    slept = []
+
+    def fake_sleep(seconds):
+        slept.append(seconds)
+        now[0] += seconds
+
+    throttle = Throttle(rows_per_sec=100, clock=lambda: now[0], sleep=fake_sleep)
+
+    # 50 rows processed instantly -> must wait 0.5s to stay at 100 rows/sec
+    throttle.wait(50)
+    assert slept == [0.5]
+
+    # already behind schedule -> no extra sleep
+    now[0] += 2.0
+    throttle.wait(50)
+    assert slept == [0.5]
+
+
+def test_stream_pending_posts_pages_by_id(tmp_path: Path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'posts.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE post (id INTEGER PRIMARY KEY, content TEXT, sentiment_status TEXT)"))
+        for post_id in range(1, 8):
+            status = "READY" if post_id == 4 else "NONE"
+            conn.execute(
+                text("INSERT INTO post VALUES (:id, :content, :status)"),
+                {"id": post_id, "content": f"post {post_id}", "status": status},
+            )
+
+    pages = []
+    for rows in stream_pending_posts(engine, after_id=1, batch_size=2):
+        pages.append([post_id for post_id, _ in rows])
+        # no connection is held while the caller works on a batch
+        assert engine.pool.checkedout() == 0
+
+    assert pages == [[2, 3], [5, 6], [7]]
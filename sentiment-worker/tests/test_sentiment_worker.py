@@ -0,0 +1,135 @@
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from pathlib import Path
+
+# Make sure the project root (the directory containing sentiment_worker.py) is on sys.path
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import sentiment_worker
+from sentiment_worker import (
+    SentimentCache,
+    StartupTimer,
+    analyze_batch,
+    configure_threads,
+    content_key,
+    mark_not_ready,
+    mark_ready,
+    supervise,
+)
+
+
+def test_analyze_batch_runs_pipeline_once_over_all_texts():
+    calls = []
+
+    def fake_nlp(texts, batch_size=None):
+        calls.append((list(texts), batch_size))
+        return [
+            {"label": "POSITIVE", "score": 0.9},
+            {"label": "negative", "score": 0.8},
+        ]
+
+    results = analyze_batch(fake_nlp, ["love it!", "x" * 600], batch_size=8)
+
+    assert results == [("POSITIVE", 0.9), ("NEGATIVE", 0.8)]
+    assert len(calls) == 1
+    texts, batch_size = calls[0]
+    assert batch_size == 8
+    assert len(texts[1]) == 512
+
+
+def test_content_key_normalizes_case_and_whitespace():
+    assert content_key("Love it!") == content_key("  love   IT! ")
+    assert content_key("love it!") != content_key("hate it!")
+
+
+def test_sentiment_cache_lru_hits_and_eviction():
+    cache = SentimentCache(engine=None, model_id="m", max_entries=2)
+
+    cache.put_many({"a": ("POSITIVE", 0.9), "b": ("NEGATIVE", 0.7)})
+    assert cache.get_many(["a"]) == {"a": ("POSITIVE", 0.9)}
+
+    # "b" is now least recently used and gets evicted
+    cache.put_many({"c": ("POSITIVE", 0.6)})
+    assert cache.get_many(["a", "b", "c"]) == {"a": ("POSITIVE", 0.9), "c": ("POSITIVE", 0.6)}
+
+    cache.record_inference(count=2, elapsed_ms=40.0)
+    stats = cache.stats()
+    assert stats["lru_hits"] == 3
+    assert stats["lookups"] == 4
+    assert stats["hit_rate"] == 0.75
+    assert stats["saved_ms"] == 60.0
+
+
+def test_ready_file_lifecycle(tmp_path: Path):
+    ready = tmp_path / "worker.ready"
+    timer = StartupTimer()
+    with timer.phase("model_load"):
+        pass
+
+    mark_ready(str(ready), timer.report())
+    report = json.loads(ready.read_text())
+    assert "model_load" in report["phases_s"]
+    assert report["total_s"] >= report["phases_s"]["model_load"]
+
+    mark_not_ready(str(ready))
+    assert not ready.exists()
+    # idempotent when the file is already gone
+    mark_not_ready(str(ready))
+
+
+def _wait_for(condition, timeout_s: float = 10) -> bool:
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_supervisor_is_not_ready_while_a_killed_consumer_restarts(tmp_path: Path, monkeypatch):
+    ready = tmp_path / "worker.ready"
+    starts = tmp_path / "starts"
+
+    def fake_child(index, nlp, threads):
+        # ready on the first start only, like a replacement still loading its model
+        with open(starts, "a") as f:
+            f.write(f"{os.getpid()}\n")
+        if len(starts.read_text().split()) == 1:
+            mark_ready(f"{ready}.{index}", {"pid": os.getpid()})
+        time.sleep(60)
+
+    monkeypatch.setattr(sentiment_worker, "SENTIMENT_READY_FILE", str(ready))
+    monkeypatch.setattr(sentiment_worker, "SENTIMENT_BACKEND", "onnx")
+    monkeypatch.setattr(sentiment_worker, "_child_main", fake_child)
+
+    supervisor = multiprocessing.get_context("fork").Process(target=supervise, args=(1,))
+    supervisor.start()
+    try:
+        assert _wait_for(ready.exists)
+        first_pid = json.loads(Path(f"{ready}.0").read_text())["pid"]
+
+        os.kill(first_pid, signal.SIGKILL)
+        assert _wait_for(lambda: not ready.exists())
+        assert _wait_for(lambda: len(starts.read_text().split()) == 2)
+        # the replacement has not reported ready, so neither has the supervisor
+        time.sleep(1.5)
+        assert not ready.exists()
+    finally:
+        supervisor.terminate()
+        supervisor.join(timeout=30)
+
+
+def test_configure_threads_sets_openmp_env(monkeypatch):
+    monkeypatch.delenv("OMP_NUM_THREADS", raising=False)
+    monkeypatch.delenv("MKL_NUM_THREADS", raising=False)
+
+    configure_threads(3)
+
+    assert os.environ["OMP_NUM_THREADS"] == "3"
+    assert os.environ["MKL_NUM_THREADS"] == "3"
@@ -0,0 +1,57 @@
+import asyncio
+import sys
+from pathlib import Path
+
+# Make sure the project root (the directory containing worker_runtime/) is on sys.path
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from worker_runtime.aio import AsyncWorker
+
+
+class FakeMessage:
+    def __init__(self, body: bytes):
+        self.body = body
+        self.outcome = None
+
+    async def ack(self):
+        self.outcome = "ack"
+
+    async def nack(self, requeue):
+        assert requeue is False
+        self.outcome = "nack"
+
+
+class FakePublisher:
+    def __init__(self):
+        self.published = []
+
+    async def publish(self, payload):
+        self.published.append(payload)
+
+
+def test_async_worker_acks_publishes_and_runs_failure_handler():
+    async def handler(payload):
+        if payload["post_id"] == 2:
+            raise RuntimeError("provider down")
+        return {"post_id": payload["post_id"]}
+
+    async def on_failure(payload, exc):
+        return {"post_id": payload["post_id"], "error": str(exc)}
+
+    worker = AsyncWorker("test", "q", handler, on_failure=on_failure)
+    worker.publisher = FakePublisher()
+    ok, failed, bad = FakeMessage(b'{"post_id": 1}'), FakeMessage(b'{"post_id": 2}'), FakeMessage(b"?")
+
+    async def run():
+        await asyncio.gather(worker.process(ok), worker.process(failed), worker.process(bad))
+
+    asyncio.run(run())
+
+    assert (ok.outcome, failed.outcome, bad.outcome) == ("ack", "nack", "nack")
+    assert worker.publisher.published == [
+        {"post_id": 1},
+        {"post_id": 2, "error": "provider down"},
+    ]
+    assert worker.timings.snapshot()["failed"] == 2
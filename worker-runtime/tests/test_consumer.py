@@ -0,0 +1,207 @@
+import json
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+# Make sure the project root (the directory containing worker_runtime/) is on sys.path
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from worker_runtime import StageTimings, TraceRecorder, Worker, message_meta, run_job, stage
+
+
+class FakeChannel:
+    """Replays (method, properties, body) tuples like BlockingChannel.consume."""
+
+    def __init__(self, events):
+        self._events = events
+        self.acked: list[int] = []
+        self.nacked: list[int] = []
+        self.published: list[dict] = []
+        self.cancelled = False
+
+    def queue_declare(self, queue, durable):
+        pass
+
+    def basic_qos(self, prefetch_count):
+        self.prefetch = prefetch_count
+
+    def consume(self, queue, inactivity_timeout=None):
+        yield from self._events
+
+    def cancel(self):
+        self.cancelled = True
+
+    def basic_ack(self, delivery_tag):
+        self.acked.append(delivery_tag)
+
+    def basic_nack(self, delivery_tag, requeue):
+        assert requeue is False
+        self.nacked.append(delivery_tag)
+
+    def basic_publish(self, exchange, routing_key, body, properties):
+        self.published.append(json.loads(body))
+
+
+class FakeConnection:
+    def __init__(self, channel):
+        self._channel = channel
+        self._callbacks = []
+
+    def channel(self):
+        return self._channel
+
+    def add_callback_threadsafe(self, cb):
+        self._callbacks.append(cb)
+
+    def process_data_events(self, time_limit=None):
+        while self._callbacks:
+            self._callbacks.pop(0)()
+
+    def close(self):
+        pass
+
+
+IDLE = (None, None, None)
+
+
+def _msg(tag: int, body: bytes, headers=None):
+    return (SimpleNamespace(delivery_tag=tag), SimpleNamespace(headers=headers, timestamp=None), body)
+
+
+def _run(worker: Worker, events) -> FakeChannel:
+    channel = FakeChannel(events)
+    worker.connect(FakeConnection(channel))
+    worker.run()
+    return channel
+
+
+def test_worker_micro_batches_on_size_and_idle():
+    seen = []
+    worker = Worker("test", "q", lambda payloads: seen.append([p["n"] for p in payloads]),
+                    batched=True, batch_size=2, batch_wait_s=60)
+    events = [_msg(1, b'{"n": 1}'), _msg(2, b'{"n": 2}'), _msg(3, b'{"n": 3}'), IDLE,
+              _msg(4, b'{"n": 4}'), IDLE, IDLE]
+
+    channel = _run(worker, events)
+
+    assert seen == [[1, 2], [3], [4]]
+    assert channel.acked == [1, 2, 3, 4]
+
+
+def test_worker_nacks_failures_and_publishes_results_from_thread_pool():
+    def handler(payload):
+        if payload["post_id"] == 2:
+            raise ValueError("boom")
+        return {"post_id": payload["post_id"]}
+
+    def on_failure(payload, exc):
+        return {"post_id": payload["post_id"], "failed": True}
+
+    worker = Worker("test", "q", handler, executor="thread", max_workers=2,
+                    on_failure=on_failure, result_queue="results")
+    events = [_msg(1, b'{"post_id": 1}'), _msg(2, b'{"post_id": 2}'), _msg(3, b"not json")]
+
+    channel = _run(worker, events)
+
+    assert channel.acked == [1]
+    assert sorted(channel.nacked) == [2, 3]
+    assert {"post_id": 1} in channel.published
+    assert {"post_id": 2, "failed": True} in channel.published
+    assert channel.cancelled
+    assert worker.timings.snapshot()["ok"] == 1
+    assert worker.timings.snapshot()["failed"] == 2
+
+
+def test_stop_drains_and_returns_without_consuming_more():
+    worker = Worker("test", "q", lambda payload: worker.stop())
+    events = [_msg(1, b"{}"), _msg(2, b"{}")]
+
+    channel = _run(worker, events)
+
+    # message 2 was still buffered; cancel() hands it back to the broker
+    assert channel.acked == [1]
+    assert channel.cancelled
+
+
+def test_run_job_reports_on_failure_errors():
+    def bad_failure_handler(payload, exc):
+        raise RuntimeError("db down")
+
+    outcome = run_job(lambda p: 1 / 0, bad_failure_handler, [{}], batched=False)
+
+    assert not outcome.ok
+    assert outcome.results == []
+    assert "db down" in outcome.error
+
+
+def test_stage_timings_summary():
+    timings = StageTimings()
+    timings.record("decode", 0.010)
+    timings.record("decode", 0.030)
+    timings.count(ok=2)
+
+    snap = timings.snapshot()
+    assert snap["stages"]["decode"] == {"count": 2, "avg_ms": 20.0, "max_ms": 30.0}
+    assert timings.summary().startswith("2 ok, 0 failed")
+
+
+def test_stage_timings_and_queue_wait_are_recorded_per_job():
+    def handler(payload):
+        with stage("decode"):
+            pass
+        with stage("decode"):
+            pass
+
+    worker = Worker("test", "q", handler, executor="thread")
+    published = time.time() - 2.0
+    _run(worker, [_msg(1, b"{}", {"published_at": published})])
+
+    snap = worker.timings.snapshot()["stages"]
+    assert snap["decode"]["count"] == 1  # both blocks add up into one observation
+    assert snap["queue_wait"]["avg_ms"] >= 2000
+    assert 'worker_stage_seconds_count{worker="test",stage="decode"} 1' in worker.timings.render_prometheus("test")
+
+
+def test_stage_is_a_no_op_outside_a_job():
+    with stage("decode"):
+        pass
+
+
+class FakeRecorder:
+    def __init__(self):
+        self.calls = []
+
+    def record(self, payloads, metas, started, completed, ok):
+        self.calls.append((payloads, metas, ok, completed >= started))
+
+
+def test_traced_messages_are_recorded_with_their_outcome():
+    recorder = FakeRecorder()
+    worker = Worker("test", "q", lambda payload: 1 / payload["n"])
+    worker.recorder = recorder
+    events = [
+        _msg(1, b'{"post_id": 7, "n": 1}', {"published_at": time.time(), "trace_id": "abc"}),
+        _msg(2, b'{"post_id": 8, "n": 0}', {"trace_id": "def"}),
+    ]
+
+    _run(worker, events)
+
+    (ok_payloads, ok_metas, ok, ordered), (failed_payloads, failed_metas, failed_ok, _) = recorder.calls
+    assert ok and ordered and ok_metas[0].trace_id == "abc"
+    assert not failed_ok and failed_payloads == [{"post_id": 8, "n": 0}]
+    assert failed_metas[0].published_at is None
+
+
+def test_trace_rows_skip_untraced_messages():
+    recorder = TraceRecorder("test", "sentiment")
+    metas = [message_meta({"trace_id": "abc", "published_at": 100.0}), message_meta(None, 99.0)]
+
+    rows = recorder.rows([{"post_id": "3"}, {"post_id": 4}], metas, 101.0, 102.5, ok=True)
+
+    assert len(rows) == 1
+    assert rows[0]["post_id"] == 3
+    assert rows[0]["status"] == "READY"
+    assert (rows[0]["completed_at"] - rows[0]["enqueued_at"]).total_seconds() == 2.5
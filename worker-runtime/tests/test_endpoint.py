@@ -0,0 +1,45 @@
+import sys
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+# Make sure the project root (the directory containing worker_runtime/) is on sys.path
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from worker_runtime import StageTimings, start_metrics_server
+
+
+def _get(server, path: str) -> tuple[int, str]:
+    url = f"http://127.0.0.1:{server.server_port}{path}"
+    try:
+        with urllib.request.urlopen(url, timeout=5) as resp:
+            return resp.status, resp.read().decode("utf-8")
+    except urllib.error.HTTPError as e:
+        return e.code, e.read().decode("utf-8")
+
+
+def test_metrics_server_serves_metrics_and_profiles():
+    timings = StageTimings()
+    timings.record("decode", 0.02)
+    timings.count(ok=1)
+    server = start_metrics_server("test", timings, port=0, host="127.0.0.1")
+    try:
+        status, body = _get(server, "/metrics")
+        assert status == 200
+        assert 'worker_stage_seconds_bucket{worker="test",stage="decode",le="+Inf"} 1' in body
+        assert 'worker_messages_total{worker="test",outcome="ok"} 1' in body
+
+        status, body = _get(server, "/profile?seconds=0.2&interval_ms=10")
+        assert status == 200
+        assert "serve_forever" in body
+
+        assert _get(server, "/nope")[0] == 404
+    finally:
+        server.shutdown()
+
+
+def test_metrics_server_is_off_without_a_port(monkeypatch):
+    monkeypatch.delenv("WORKER_METRICS_PORT", raising=False)
+    assert start_metrics_server("test", StageTimings()) is None
@@ -0,0 +1,117 @@
+import sys
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine, text
+
+# Make sure the project root (the directory containing worker_runtime/) is on sys.path
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from worker_runtime import sqlstats
+from worker_runtime.sqlstats import SqlStats, fingerprint
+
+
+def test_fingerprint_strips_values_and_collapses_lists():
+    a = fingerprint(
+        "UPDATE post SET image_status = 'READY' WHERE image_filename = %(f)s  -- resize\n"
+    )
+    b = fingerprint("UPDATE post\n  SET image_status = 'FAILED'\n  WHERE image_filename = %(g)s")
+    assert a == b == "UPDATE post SET image_status = ? WHERE image_filename = ?"
+
+    assert fingerprint("SELECT * FROM post WHERE id IN (%(id_1_1)s, %(id_1_2)s, %(id_1_3)s)") == (
+        "SELECT * FROM post WHERE id IN (...)"
+    )
+    assert fingerprint("SELECT id FROM post WHERE id IN (1, 2) LIMIT 20 OFFSET 40") == (
+        "SELECT id FROM post WHERE id IN (...) LIMIT ? OFFSET ?"
+    )
+    assert fingerprint("INSERT INTO t (a, b) VALUES (1, 'x'), (2, 'y')") == "INSERT INTO t (a, b) VALUES (...)"
+    # casts and identifiers with digits survive
+    assert fingerprint("SELECT :p::text, post_1.id FROM post AS post_1") == "SELECT ?::text, post_1.id FROM post AS post_1"
+
+
+def test_stats_fold_overflow_and_order():
+    stats = SqlStats(max_fingerprints=2)
+    stats.record("a", 0.010)
+    stats.record("a", 0.030, slow=True)
+    stats.record("b", 0.050)
+    stats.record("c", 0.001)  # over the cap
+
+    top = stats.top(order="total")
+    assert [row["fingerprint"] for row in top] == ["b", "a", sqlstats.OTHER]
+    a = top[1]
+    assert a["count"] == 2 and a["slow"] == 1
+    assert a["max_ms"] == 30.0 and a["mean_ms"] == 20.0
+    assert stats.top(1, order="count")[0]["fingerprint"] == "a"
+
+
+def test_install_times_statements_and_samples_plans(monkeypatch, capsys):
+    plans = []
+
+    def fake_explain(engine, statement, parameters, analyze_dml=False):
+        plans.append((statement, parameters))
+        return "Seq Scan on t"
+
+    monkeypatch.setattr(sqlstats, "run_explain", fake_explain)
+    engine = create_engine("sqlite://")
+    stats = SqlStats()
+    slow = []
+    sqlstats.install(
+        engine,
+        "test",
+        stats,
+        threshold_ms=0,
+        explain_rate=1.0,
+        interval_s=60,
+        on_slow=lambda: slow.append(1),
+        trace_id=lambda: "trace-1",
+    )
+
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (id INTEGER, name TEXT)"))
+        conn.execute(text("INSERT INTO t VALUES (:id, :name)"), [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}])
+        for i in range(3):
+            conn.execute(text("SELECT name FROM t WHERE id = :id"), {"id": i})
+        try:
+            conn.execute(text("SELECT nope FROM t"))
+        except Exception:
+            pass
+        conn.execute(text("SELECT count(*) FROM t"))
+
+    rows = {row["fingerprint"]: row for row in stats.top(50)}
+    select = rows["SELECT name FROM t WHERE id = ?"]
+    assert select["count"] == 3 and select["slow"] == 3
+    assert len(slow) == sum(row["slow"] for row in rows.values())
+    assert "(seen 1x, trace trace-1): SELECT name FROM t WHERE id = ?" in capsys.readouterr().out
+    # the failed statement did not unbalance the start-time stack
+    assert rows["SELECT count(*) FROM t"]["count"] == 1
+
+    deadline = time.monotonic() + 5
+    # INSERT, and both SELECTs; CREATE TABLE is not explainable
+    while time.monotonic() < deadline and rows_with_plans(stats) < 3:
+        time.sleep(0.01)
+    # one plan per fingerprint per interval; executemany explains the first row
+    explained = [statement for statement, _ in plans]
+    assert explained.count("SELECT name FROM t WHERE id = ?") == 1
+    assert ("INSERT INTO t VALUES (?, ?)", (1, "a")) in plans
+    assert rows_with_plans(stats) == 3
+
+
+def test_only_reads_are_explain_analyzed_by_default():
+    assert sqlstats.explain_analyzes("SELECT * FROM post")
+    assert sqlstats.explain_analyzes("WITH t AS (SELECT 1) SELECT * FROM t")
+    assert sqlstats.explain_analyzes("WITH t AS (SELECT 'update') SELECT * FROM t")
+    assert not sqlstats.explain_analyzes("WITH t AS (DELETE FROM post RETURNING id) SELECT * FROM t")
+    assert not sqlstats.explain_analyzes("UPDATE post SET content = ? WHERE id = ?")
+    assert not sqlstats.explain_analyzes("DELETE FROM post WHERE id = ?")
+    assert not sqlstats.explain_analyzes("INSERT INTO post (content) VALUES (?)")
+
+    # opt-in for UPDATE / DELETE; INSERTs never
+    assert sqlstats.explain_analyzes("UPDATE post SET content = ? WHERE id = ?", analyze_dml=True)
+    assert sqlstats.explain_analyzes("DELETE FROM post WHERE id = ?", analyze_dml=True)
+    assert not sqlstats.explain_analyzes("INSERT INTO post (content) VALUES (?)", analyze_dml=True)
+
+
+def rows_with_plans(stats: SqlStats) -> int:
+    return sum(1 for row in stats.top(50) if row["plan"] == "Seq Scan on t")
@@ -0,0 +1,42 @@
+"""
+Shared runtime for the RabbitMQ workers: connection settings, DB helpers,
+the blocking Worker (inline / thread / process executors, micro-batching),
+per-stage timings, a local metrics / profiling endpoint, enrichment
+traces and slow-query statistics. The asyncio variant lives in
+worker_runtime.aio so the blocking workers do not need aio-pika installed.
+"""
+from .config import (
+    amqp_params,
+    amqp_settings,
+    connect_rabbitmq,
+    db_url,
+    env_bool,
+    make_engine,
+    wait_for_db,
+)
+from .consumer import JobOutcome, ResultPublisher, Worker, properties_meta, run_job
+from .endpoint import start_metrics_server
+from .metrics import StageTimings, collect_stages, stage
+from .tracing import MessageMeta, TraceRecorder, message_meta
+
+__all__ = [
+    "JobOutcome",
+    "MessageMeta",
+    "ResultPublisher",
+    "StageTimings",
+    "TraceRecorder",
+    "Worker",
+    "amqp_params",
+    "amqp_settings",
+    "collect_stages",
+    "connect_rabbitmq",
+    "db_url",
+    "env_bool",
+    "make_engine",
+    "message_meta",
+    "properties_meta",
+    "run_job",
+    "stage",
+    "start_metrics_server",
+    "wait_for_db",
+]
@@ -0,0 +1,205 @@
+"""
+asyncio (aio-pika) counterpart of Worker for I/O-bound workers such as
+describe-worker: up to `concurrency` jobs run as tasks on one event loop.
+Requires the `aio` extra.
+"""
+import asyncio
+import json
+import signal
+import time
+from typing import Awaitable, Callable, Optional
+
+import aio_pika
+
+from .config import amqp_settings
+from .endpoint import start_metrics_server
+from .metrics import StageTimings, collect_stages
+from .tracing import MessageMeta, make_recorder, message_meta
+
+AsyncHandler = Callable[[dict], Awaitable[Optional[dict]]]
+AsyncFailureHandler = Callable[[dict, Exception], Awaitable[Optional[dict]]]
+
+
+async def connect_rabbitmq(name: str = "worker") -> aio_pika.abc.AbstractRobustConnection:
+    while True:
+        try:
+            return await aio_pika.connect_robust(**amqp_settings())
+        except Exception as e:
+            print(f"[{name}] RabbitMQ not ready yet: {e}. Retrying...")
+            await asyncio.sleep(2)
+
+
+def incoming_meta(message) -> MessageMeta:
+    timestamp = getattr(message, "timestamp", None)
+    return message_meta(
+        getattr(message, "headers", None),
+        timestamp.timestamp() if timestamp is not None else None,
+    )
+
+
+class AsyncResultPublisher:
+    """Publishes small JSON results on the worker's long-lived channel."""
+
+    def __init__(self, channel: aio_pika.abc.AbstractChannel, queue: str):
+        self.channel = channel
+        self.queue = queue
+
+    async def publish(self, payload: dict) -> None:
+        await self.channel.default_exchange.publish(
+            aio_pika.Message(
+                body=json.dumps(payload).encode("utf-8"),
+                delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                headers={"published_at": time.time()},
+            ),
+            routing_key=self.queue,
+        )
+
+
+class AsyncWorker:
+    """
+    Consume `queue` with at most `concurrency` jobs in flight (prefetch is
+    set to the same number). `before_job` is awaited before each job takes
+    its slot's work, e.g. to hold jobs while a downstream circuit is open.
+    Ack/nack, result publishing and SIGTERM drain follow Worker.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        queue: str,
+        handler: AsyncHandler,
+        *,
+        concurrency: int = 8,
+        on_failure: Optional[AsyncFailureHandler] = None,
+        before_job: Optional[Callable[[], Awaitable[None]]] = None,
+        result_queue: Optional[str] = None,
+        trace_kind: Optional[str] = None,
+        stats_interval_s: float = 60.0,
+    ):
+        self.name = name
+        self.queue_name = queue
+        self.handler = handler
+        self.concurrency = concurrency
+        self.on_failure = on_failure
+        self.before_job = before_job
+        self.result_queue = result_queue
+        self.recorder = make_recorder(name, trace_kind)
+        self.stats_interval_s = stats_interval_s
+
+        self.timings = StageTimings()
+        self.connection = None
+        self.channel = None
+        self.publisher: Optional[AsyncResultPublisher] = None
+        self._tasks: set[asyncio.Task] = set()
+        self._stopping: Optional[asyncio.Event] = None
+
+    def log(self, msg: str) -> None:
+        print(f"[{self.name}] {msg}")
+
+    def stop(self) -> None:
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def connect(self) -> None:
+        self.connection = await connect_rabbitmq(self.name)
+        self.channel = await self.connection.channel()
+        # the broker never hands us more than we are willing to run at once
+        await self.channel.set_qos(prefetch_count=self.concurrency)
+        self.queue = await self.channel.declare_queue(self.queue_name, durable=True)
+        if self.result_queue:
+            await self.channel.declare_queue(self.result_queue, durable=True)
+            self.publisher = AsyncResultPublisher(self.channel, self.result_queue)
+
+    async def run(self) -> None:
+        self._stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        start_metrics_server(self.name, self.timings)
+        if self.connection is None:
+            await self.connect()
+
+        slots = asyncio.Semaphore(self.concurrency)
+
+        async def run_bounded(message: aio_pika.abc.AbstractIncomingMessage) -> None:
+            async with slots:
+                if self.before_job is not None:
+                    await self.before_job()
+                await self.process(message)
+
+        async def on_message(message: aio_pika.abc.AbstractIncomingMessage) -> None:
+            # return immediately so the next delivery can start; ack happens when the job ends
+            task = asyncio.create_task(run_bounded(message))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        consumer_tag = await self.queue.consume(on_message)
+        self.log(f"Listening on queue: {self.queue_name} ({self.concurrency} in flight)")
+
+        async with self.connection:
+            while not self._stopping.is_set():
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.stats_interval_s)
+                except asyncio.TimeoutError:
+                    self.log(self.timings.summary())
+
+            self.log(f"Stopping: draining {len(self._tasks)} in-flight jobs")
+            await self.queue.cancel(consumer_tag)
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+        self.log(f"Stopped; {self.timings.summary()}")
+
+    async def process(self, message: aio_pika.abc.AbstractIncomingMessage) -> None:
+        try:
+            payload = json.loads(message.body.decode("utf-8"))
+        except Exception as e:
+            self.log(f"Bad message: {e} / {message.body!r}")
+            self.timings.count(failed=1)
+            await message.nack(requeue=False)
+            return
+
+        meta = incoming_meta(message)
+        wall_started = time.time()
+        if meta.published_at is not None:
+            self.timings.record("queue_wait", max(0.0, wall_started - meta.published_at))
+
+        started = time.perf_counter()
+        # each task runs in its own context, so concurrent jobs keep separate stages
+        with collect_stages() as stages:
+            try:
+                result = await self.handler(payload)
+                ok = True
+            except Exception as e:
+                self.log(f"Job failed: {e}")
+                result = None
+                ok = False
+                if self.on_failure is not None:
+                    try:
+                        result = await self.on_failure(payload, e)
+                    except Exception as fail_err:
+                        self.log(f"Failure handler failed: {fail_err}")
+        self.timings.record("handle", time.perf_counter() - started)
+        self.timings.record_many(stages)
+
+        if self.recorder is not None:
+            await asyncio.to_thread(
+                self.recorder.record, [payload], [meta], wall_started, time.time(), ok
+            )
+
+        if result is not None and self.publisher is not None:
+            try:
+                await self.publisher.publish(result)
+            except Exception as e:
+                self.log(f"Failed to publish result {result}: {e}")
+
+        if ok:
+            self.timings.count(ok=1)
+            await message.ack()
+        else:
+            self.timings.count(failed=1)
+            # avoid infinite loops on bad jobs
+            await message.nack(requeue=False)
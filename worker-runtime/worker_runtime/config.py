@@ -0,0 +1,64 @@
+import os
+import time
+
+import pika
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+
+from . import sqlstats
+
+
+def env_bool(name: str, default: str = "0") -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+def amqp_settings() -> dict:
+    return {
+        "host": os.getenv("RABBITMQ_HOST", "rabbitmq"),
+        "port": int(os.getenv("RABBITMQ_PORT", "5672")),
+        "login": os.getenv("RABBITMQ_USER", "guest"),
+        "password": os.getenv("RABBITMQ_PASSWORD", "guest"),
+    }
+
+
+def amqp_params() -> pika.ConnectionParameters:
+    s = amqp_settings()
+    credentials = pika.PlainCredentials(s["login"], s["password"])
+    return pika.ConnectionParameters(host=s["host"], port=s["port"], credentials=credentials)
+
+
+def db_url() -> str:
+    host = os.getenv("DB_HOST", "db")
+    port = os.getenv("DB_PORT", "5432")
+    name = os.getenv("DB_NAME", "social")
+    user = os.getenv("DB_USER", "admin")
+    pw = os.getenv("DB_PASSWORD", "password")
+    return f"postgresql+psycopg://{user}:{pw}@{host}:{port}/{name}"
+
+
+def make_engine(name: str = "worker") -> Engine:
+    # pool_pre_ping avoids stale connections
+    engine = create_engine(db_url(), pool_pre_ping=True)
+    sqlstats.install(engine, name)
+    return engine
+
+
+def wait_for_db(engine: Engine, name: str = "worker") -> None:
+    while True:
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            print(f"[{name}] DB is ready")
+            return
+        except Exception as e:
+            print(f"[{name}] DB not ready yet: {e}. Retrying...")
+            time.sleep(2)
+
+
+def connect_rabbitmq(name: str = "worker") -> pika.BlockingConnection:
+    while True:
+        try:
+            return pika.BlockingConnection(amqp_params())
+        except Exception as e:
+            print(f"[{name}] RabbitMQ not ready yet: {e}. Retrying...")
+            time.sleep(2)
@@ -0,0 +1,346 @@
+"""
+Blocking (pika) consumer shared by resize- and sentiment-worker.
+
+A Worker owns the connection and the consume loop: JSON decoding, optional
+micro-batching, running the handler inline or on a thread/process pool,
+publishing results on one long-lived channel, ack/nack and a graceful drain
+on SIGTERM. The handler only sees decoded payloads.
+"""
+import functools
+import json
+import signal
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, NamedTuple, Optional
+
+import pika
+
+from .config import connect_rabbitmq
+from .endpoint import start_metrics_server
+from .metrics import StageTimings, collect_stages
+from .tracing import MessageMeta, TraceRecorder, make_recorder, message_meta
+
+# handler(payload) -> result or None; with batched=True, handler(payloads) -> results or None
+Handler = Callable[[Any], Any]
+# on_failure(payload, exc) -> result or None; runs where the handler ran
+FailureHandler = Callable[[dict, Exception], Optional[dict]]
+
+EXECUTORS = ("inline", "thread", "process")
+
+
+def properties_meta(properties) -> MessageMeta:
+    return message_meta(
+        getattr(properties, "headers", None),
+        getattr(properties, "timestamp", None),
+    )
+
+
+class JobOutcome(NamedTuple):
+    ok: bool
+    results: list[dict]
+    error: Optional[str]
+    stages: dict[str, float]
+    queue_waits: list[float]
+
+
+def run_job(
+    handler: Handler,
+    on_failure: Optional[FailureHandler],
+    payloads: list[dict],
+    batched: bool,
+    metas: Optional[list[MessageMeta]] = None,
+    recorder: Optional[TraceRecorder] = None,
+) -> JobOutcome:
+    """
+    Run one job (a single payload, or the whole batch) and report what to
+    publish plus its stage timings; with a `recorder`, also write the job's
+    traces. Module-level so process pools can pickle it.
+    """
+    metas = metas or []
+    # wall clock on both ends: the publisher may be another host/process
+    started = time.time()
+    queue_waits = [max(0.0, started - m.published_at) for m in metas if m.published_at is not None]
+
+    outcome = _run_handler(handler, on_failure, payloads, batched, queue_waits)
+    if recorder is not None:
+        recorder.record(payloads, metas, started, time.time(), outcome.ok)
+    return outcome
+
+
+def _run_handler(handler, on_failure, payloads, batched, queue_waits) -> JobOutcome:
+    with collect_stages() as stages:
+        try:
+            if batched:
+                results = handler(payloads) or []
+            else:
+                result = handler(payloads[0])
+                results = [result] if result is not None else []
+            return JobOutcome(True, results, None, stages, queue_waits)
+        except Exception as exc:
+            error = str(exc)
+            results = []
+            for payload in payloads if on_failure is not None else []:
+                try:
+                    result = on_failure(payload, exc)
+                except Exception as fail_exc:
+                    error = f"{exc}; on_failure also failed: {fail_exc}"
+                    continue
+                if result is not None:
+                    results.append(result)
+            return JobOutcome(False, results, error, stages, queue_waits)
+
+
+class ResultPublisher:
+    """
+    Publishes small JSON results (e.g. {"post_id": 1}) on one channel that
+    lives as long as the worker's connection. Call only from the connection's
+    thread; the Worker takes care of that for pooled jobs.
+    """
+
+    def __init__(self, connection: pika.BlockingConnection, queue: str):
+        self.queue = queue
+        self.channel = connection.channel()
+        self.channel.queue_declare(queue=queue, durable=True)
+
+    def publish(self, payload: dict) -> None:
+        self.channel.basic_publish(
+            exchange="",
+            routing_key=self.queue,
+            body=json.dumps(payload).encode("utf-8"),
+            properties=pika.BasicProperties(
+                delivery_mode=2,  # persistent
+                headers={"published_at": time.time()},
+            ),
+        )
+
+
+class Worker:
+    """
+    Consume `queue` and hand each payload (or, with `batched`, lists of up to
+    `batch_size` payloads collected for at most `batch_wait_s`) to `handler`.
+
+    executor:
+      "inline"  - run in the consume loop (one job at a time)
+      "thread"  - ThreadPoolExecutor(max_workers); for I/O-bound handlers
+      "process" - ProcessPoolExecutor(max_workers); for CPU-bound handlers.
+                  handler / on_failure / initializer must be module-level.
+    `initializer` sets up per-process state (engine, model, ...): it runs once
+    here for inline/thread and once in each pool process for "process".
+
+    Jobs are acked when they succeed and nacked without requeue when they
+    fail, so a bad message cannot loop forever. Non-None handler results are
+    published to `result_queue`. With `trace_kind` (e.g. "resize"), traced
+    messages get an enrichment_trace row when their job ends.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        queue: str,
+        handler: Handler,
+        *,
+        batched: bool = False,
+        batch_size: int = 1,
+        batch_wait_s: float = 0.05,
+        prefetch: Optional[int] = None,
+        executor: str = "inline",
+        max_workers: int = 1,
+        initializer: Optional[Callable[[], None]] = None,
+        on_failure: Optional[FailureHandler] = None,
+        result_queue: Optional[str] = None,
+        trace_kind: Optional[str] = None,
+        stats_interval_s: float = 60.0,
+    ):
+        if executor not in EXECUTORS:
+            raise ValueError(f"executor must be one of {EXECUTORS}, got {executor!r}")
+
+        self.name = name
+        self.queue = queue
+        self.handler = handler
+        self.batched = batched
+        self.batch_size = batch_size if batched else 1
+        self.batch_wait_s = batch_wait_s
+        self.executor = executor
+        self.max_workers = max(1, max_workers)
+        # enough unacked messages to keep every pool slot (and a full batch) busy
+        self.prefetch = prefetch or self.batch_size * (1 if executor == "inline" else self.max_workers)
+        self.initializer = initializer
+        self.on_failure = on_failure
+        self.result_queue = result_queue
+        self.recorder = make_recorder(name, trace_kind)
+        self.stats_interval_s = stats_interval_s
+
+        self.timings = StageTimings()
+        self.connection = None
+        self.channel = None
+        self.publisher: Optional[ResultPublisher] = None
+        self._pool: Optional[Executor] = None
+        self._pending: set[Future] = set()
+        self._stopping = threading.Event()
+
+    def log(self, msg: str) -> None:
+        print(f"[{self.name}] {msg}")
+
+    # -------------------------
+    # Lifecycle
+    # -------------------------
+    def stop(self, *_args) -> None:
+        """Finish in-flight jobs, then return from run(). Safe from signal handlers."""
+        self._stopping.set()
+
+    def install_signal_handlers(self) -> None:
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+
+    def connect(self, connection=None) -> None:
+        self.connection = connection or connect_rabbitmq(self.name)
+        self.channel = self.connection.channel()
+        self.channel.queue_declare(queue=self.queue, durable=True)
+        self.channel.basic_qos(prefetch_count=self.prefetch)
+        if self.result_queue:
+            self.publisher = ResultPublisher(self.connection, self.result_queue)
+
+    def _start_pool(self) -> None:
+        if self.executor == "process":
+            self._pool = ProcessPoolExecutor(self.max_workers, initializer=self.initializer)
+            return
+        if self.initializer is not None:
+            self.initializer()
+        if self.executor == "thread":
+            self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix=self.name)
+
+    def run(self) -> None:
+        self.install_signal_handlers()
+        start_metrics_server(self.name, self.timings)
+        # pool first: forked/spawned processes should not inherit the AMQP socket
+        self._start_pool()
+        if self.connection is None:
+            self.connect()
+
+        self.log(
+            f"Listening on queue: {self.queue} (prefetch {self.prefetch}, "
+            f"{self.executor} x {self.max_workers}"
+            + (f", batch {self.batch_size} / {self.batch_wait_s * 1000:.0f} ms" if self.batched else "")
+            + ")"
+        )
+
+        # the inactivity timeout doubles as the tick for batching, stats and stop checks
+        tick = min(self.batch_wait_s, 1.0) if self.batched else 1.0
+        batch: list[tuple[int, dict, MessageMeta]] = []
+        deadline = 0.0
+        next_stats = time.monotonic() + self.stats_interval_s
+
+        try:
+            for method, properties, body in self.channel.consume(
+                queue=self.queue, inactivity_timeout=tick
+            ):
+                if method is not None:
+                    payload = self._decode(method.delivery_tag, body)
+                    if payload is not None:
+                        if not batch:
+                            deadline = time.monotonic() + self.batch_wait_s
+                        batch.append((method.delivery_tag, payload, properties_meta(properties)))
+
+                if batch and (
+                    not self.batched
+                    or method is None
+                    or len(batch) >= self.batch_size
+                    or time.monotonic() >= deadline
+                ):
+                    self._dispatch(batch)
+                    batch = []
+
+                if time.monotonic() >= next_stats:
+                    self.log(self.timings.summary())
+                    next_stats = time.monotonic() + self.stats_interval_s
+
+                if self._stopping.is_set():
+                    break
+
+            self.log("Stopping: draining in-flight jobs")
+            if batch:
+                self._dispatch(batch)
+            # messages buffered for us but not yet dispatched go back to the queue
+            self.channel.cancel()
+            while self._pending:
+                self.connection.process_data_events(time_limit=0.1)
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+            self.log(f"Stopped; {self.timings.summary()}")
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+
+    # -------------------------
+    # Messages
+    # -------------------------
+    def _decode(self, tag: int, body: bytes) -> Optional[dict]:
+        try:
+            return json.loads(body.decode("utf-8"))
+        except Exception as e:
+            self.log(f"Bad message: {e} / {body!r}")
+            self.timings.count(failed=1)
+            self.channel.basic_nack(delivery_tag=tag, requeue=False)
+            return None
+
+    def _dispatch(self, batch: list[tuple[int, dict, MessageMeta]]) -> None:
+        tags = [tag for tag, _, _ in batch]
+        args = (
+            self.handler,
+            self.on_failure,
+            [payload for _, payload, _ in batch],
+            self.batched,
+            [meta for _, _, meta in batch],
+            self.recorder,
+        )
+        started = time.perf_counter()
+
+        if self._pool is None:
+            self._complete(tags, started, run_job(*args))
+            return
+
+        future = self._pool.submit(run_job, *args)
+        self._pending.add(future)
+        # pika is not thread-safe: hop back onto the connection's thread to ack/publish
+        future.add_done_callback(
+            lambda f: self.connection.add_callback_threadsafe(
+                functools.partial(self._complete_future, f, tags, started)
+            )
+        )
+
+    def _complete_future(self, future: Future, tags: list[int], started: float) -> None:
+        self._pending.discard(future)
+        try:
+            outcome = future.result()
+        except Exception as e:  # e.g. a crashed pool process
+            outcome = JobOutcome(False, [], f"executor error: {e}", {}, [])
+        self._complete(tags, started, outcome)
+
+    def _complete(self, tags: list[int], started: float, outcome: JobOutcome) -> None:
+        ok, results, error, stages, queue_waits = outcome
+        self.timings.record("handle", time.perf_counter() - started)
+        self.timings.record_many(stages)
+        for wait in queue_waits:
+            self.timings.record("queue_wait", wait)
+
+        if self.publisher is not None:
+            for result in results:
+                try:
+                    self.publisher.publish(result)
+                except Exception as e:
+                    self.log(f"Failed to publish result {result}: {e}")
+
+        if ok:
+            self.timings.count(ok=len(tags))
+            for tag in tags:
+                self.channel.basic_ack(delivery_tag=tag)
+        else:
+            self.log(f"Job failed: {error}")
+            self.timings.count(failed=len(tags))
+            # don't requeue: bad input would loop forever
+            for tag in tags:
+                self.channel.basic_nack(delivery_tag=tag, requeue=False)
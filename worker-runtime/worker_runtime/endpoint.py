@@ -0,0 +1,85 @@
+"""
+Small local HTTP endpoint for a worker, enabled with WORKER_METRICS_PORT:
+
+    GET /metrics                       Prometheus text (stage histograms, counters)
+    GET /stats                         the same as JSON (avg / max per stage)
+    GET /sql?limit=20&order=total      top statement fingerprints, with sampled plans
+    GET /profile?seconds=10&interval_ms=5
+                                       sample stacks for N seconds, collapsed format
+
+Runs in a daemon thread, so it answers even while the consume loop is busy.
+"""
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+from . import profiler, sqlstats
+from .metrics import StageTimings
+
+
+def start_metrics_server(
+    name: str,
+    timings: StageTimings,
+    port: Optional[int] = None,
+    host: str = "0.0.0.0",
+) -> Optional[ThreadingHTTPServer]:
+    """Start the endpoint; returns None when no port is configured."""
+    if port is None:
+        port = int(os.getenv("WORKER_METRICS_PORT", "0") or 0)
+        if not port:
+            return None
+
+    class Handler(BaseHTTPRequestHandler):
+        def reply(self, status: int, body: str, content_type: str) -> None:
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+
+            if url.path == "/metrics":
+                self.reply(200, timings.render_prometheus(name), "text/plain; version=0.0.4")
+            elif url.path == "/stats":
+                self.reply(200, json.dumps(timings.snapshot()), "application/json")
+            elif url.path == "/sql":
+                limit = int(query.get("limit", ["20"])[0])
+                order = query.get("order", ["total"])[0]
+                try:
+                    rows = sqlstats.STATS.top(limit, order)
+                except ValueError as e:
+                    self.reply(400, str(e), "text/plain")
+                    return
+                self.reply(200, json.dumps(rows), "application/json")
+            elif url.path == "/profile":
+                seconds = min(float(query.get("seconds", ["10"])[0]), 300)
+                interval_s = float(query.get("interval_ms", ["5"])[0]) / 1000
+                try:
+                    stacks = profiler.sample(seconds, interval_s)
+                except RuntimeError as e:
+                    self.reply(409, str(e), "text/plain")
+                    return
+                self.reply(200, profiler.render_collapsed(stacks), "text/plain")
+            else:
+                self.reply(404, "not found", "text/plain")
+
+        def log_message(self, *args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer((host, port), Handler)
+    except OSError as e:
+        # metrics are optional; never keep the worker from consuming
+        print(f"[{name}] Metrics endpoint disabled, cannot bind :{port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name=f"{name}-metrics", daemon=True).start()
+    print(f"[{name}] Metrics on :{server.server_port} (/metrics, /stats, /sql, /profile)")
+    return server
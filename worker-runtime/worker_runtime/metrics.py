@@ -0,0 +1,132 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# per-job stage durations; set by the runtime around each job, read back when it ends
+_job_stages: ContextVar[Optional[dict[str, float]]] = ContextVar("job_stages", default=None)
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Time one stage of the current job (e.g. "decode", "db_update"). Repeated
+    stages within a job add up. A no-op outside a job, so library functions
+    can be instrumented unconditionally. Works inline, in pool threads and
+    processes, and across asyncio.to_thread (contextvars are copied).
+    """
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages = _job_stages.get()
+        if stages is not None:
+            stages[name] = stages.get(name, 0.0) + time.perf_counter() - t0
+
+
+@contextmanager
+def collect_stages():
+    """Collect stage() timings made inside the block into the yielded dict."""
+    stages: dict[str, float] = {}
+    token = _job_stages.set(stages)
+    try:
+        yield stages
+    finally:
+        _job_stages.reset(token)
+
+
+class StageTimings:
+    """
+    Histogram plus count / total / max per named stage, and ok/failed
+    message counters. Thread-safe; cheap enough to wrap every job.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = STAGE_BUCKETS) -> None:
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.stages: dict[str, list[float]] = {}  # name -> [count, total_s, max_s]
+        self.histograms: dict[str, list[int]] = {}  # name -> per-bucket counts, +Inf last
+        self.ok = 0
+        self.failed = 0
+
+    def record(self, stage: str, seconds: float) -> None:
+        idx = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            entry = self.stages.setdefault(stage, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+            self.histograms.setdefault(stage, [0] * (len(self.buckets) + 1))[idx] += 1
+
+    def record_many(self, stages: dict[str, float]) -> None:
+        for name, seconds in stages.items():
+            self.record(name, seconds)
+
+    @contextmanager
+    def time(self, stage: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - t0)
+
+    def count(self, ok: int = 0, failed: int = 0) -> None:
+        with self._lock:
+            self.ok += ok
+            self.failed += failed
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "ok": self.ok,
+                "failed": self.failed,
+                "stages": {
+                    name: {
+                        "count": int(n),
+                        "avg_ms": round(total / n * 1000, 1) if n else 0.0,
+                        "max_ms": round(peak * 1000, 1),
+                    }
+                    for name, (n, total, peak) in self.stages.items()
+                },
+            }
+
+    def summary(self) -> str:
+        snap = self.snapshot()
+        stages = ", ".join(
+            f"{name} avg {s['avg_ms']:.0f} ms / max {s['max_ms']:.0f} ms"
+            for name, s in snap["stages"].items()
+        )
+        return f"{snap['ok']} ok, {snap['failed']} failed; {stages or 'no timings yet'}"
+
+    def render_prometheus(self, worker: str) -> str:
+        with self._lock:
+            series = [
+                (name, list(self.histograms[name]), self.stages[name][1]) for name in self.stages
+            ]
+            ok, failed = self.ok, self.failed
+
+        lines = [
+            "# HELP worker_stage_seconds Duration of each job stage; queue_wait is publish to start.",
+            "# TYPE worker_stage_seconds histogram",
+        ]
+        for name, counts, total in series:
+            labels = f'worker="{worker}",stage="{name}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'worker_stage_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"worker_stage_seconds_sum{{{labels}}} {total!r}")
+            lines.append(f"worker_stage_seconds_count{{{labels}}} {cumulative}")
+
+        lines += [
+            "# HELP worker_messages_total Messages handled, by outcome.",
+            "# TYPE worker_messages_total counter",
+            f'worker_messages_total{{worker="{worker}",outcome="ok"}} {ok}',
+            f'worker_messages_total{{worker="{worker}",outcome="failed"}} {failed}',
+        ]
+        return "\n".join(lines) + "\n"
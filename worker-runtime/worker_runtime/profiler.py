@@ -0,0 +1,51 @@
+"""
+In-process sampling profiler that can be switched on at runtime (through
+the metrics endpoint's /profile) without restarting the worker.
+
+Every `interval_s` it snapshots the stack of every other thread and counts
+identical stacks; the result is in "collapsed" format (one
+`frame;frame;frame count` line per stack) for flamegraph.pl / speedscope.
+Only the current process is sampled: with the process executor, profile
+from inside the pool or switch to inline for the session.
+"""
+import sys
+import threading
+import time
+from collections import Counter
+
+_lock = threading.Lock()  # one profile at a time
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})"
+
+
+def _collapse(frame) -> str:
+    stack = []
+    while frame is not None:
+        stack.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+def sample(seconds: float, interval_s: float = 0.005) -> Counter:
+    """Sample all other threads for `seconds`; returns {collapsed stack: samples}."""
+    if not _lock.acquire(blocking=False):
+        raise RuntimeError("a profile is already running")
+    try:
+        me = threading.get_ident()
+        stacks: Counter = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident != me:
+                    stacks[_collapse(frame)] += 1
+            time.sleep(interval_s)
+        return stacks
+    finally:
+        _lock.release()
+
+
+def render_collapsed(stacks: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
@@ -0,0 +1,272 @@
+"""
+Statement statistics for SQLAlchemy engines (the workers' and the backend's).
+
+install(engine, name) times every statement the engine executes and folds
+it into a normalized fingerprint (literals and bind parameters become ?,
+IN / VALUES lists collapse), keeping count / total / max per fingerprint.
+Statements slower than SLOW_QUERY_MS are logged (once per fingerprint per
+interval) and a sample of them is re-run as EXPLAIN (ANALYZE, BUFFERS) on
+a background thread, inside a transaction that is always rolled back.
+Only reads are EXPLAIN ANALYZEd by default: UPDATE / DELETE would take row
+locks on live data, so they get a plain EXPLAIN unless
+SLOW_QUERY_EXPLAIN_ANALYZE_DML=1, and INSERTs always do.
+The workers serve the top offenders at /sql on the metrics endpoint, the
+backend at GET /debug/sql (app/sqlstats.py, which passes its own metrics
+counter and trace id source to install()).
+
+    SQL_STATS                       default 1
+    SLOW_QUERY_MS                   default 100
+    SLOW_QUERY_EXPLAIN_RATE         default 0.1 (fraction of slow statements; 0 = never)
+    SLOW_QUERY_EXPLAIN_INTERVAL_S   default 300 (at most one plan / log line per fingerprint)
+    SLOW_QUERY_EXPLAIN_ANALYZE_DML  default 0
+
+Stats are per process: process-pool executors and uvicorn workers keep
+their own.
+"""
+import os
+import queue
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+OTHER = "<other>"
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRINGS = re.compile(r"(?:\bE)?'(?:[^']|'')*'")
+_PARAMS = re.compile(r"%\(\w+\)s|%s|\$\d+|(?<![:\w]):\w+|\?")
+_NUMBERS = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?(?:e[+-]?\d+)?\b", re.I)
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.I)
+_VALUES_LIST = re.compile(r"\bVALUES\s*\([^()]*\)(?:\s*,\s*\([^()]*\))*", re.I)
+_SPACES = re.compile(r"\s+")
+_WRITES = re.compile(r"\b(?:insert|update|delete|merge)\b", re.I)
+
+EXPLAINABLE = ("select", "with", "update", "delete", "insert")
+
+
+def fingerprint(statement: str) -> str:
+    """Normalize a statement so that executions differing only in values share a key."""
+    sql = _COMMENTS.sub(" ", statement)
+    sql = _STRINGS.sub("?", sql)
+    sql = _PARAMS.sub("?", sql)
+    sql = _NUMBERS.sub("?", sql)
+    sql = _IN_LIST.sub("IN (...)", sql)
+    sql = _VALUES_LIST.sub("VALUES (...)", sql)
+    return _SPACES.sub(" ", sql).strip()
+
+
+@dataclass
+class StatementStats:
+    count: int = 0
+    total_s: float = 0.0
+    max_s: float = 0.0
+    slow: int = 0
+    plan: Optional[str] = None
+    plan_ms: Optional[float] = None
+    plan_at: Optional[float] = None
+    # monotonic times of the last plan request / slow log line
+    explained_at: float = float("-inf")
+    logged_at: float = float("-inf")
+
+    def as_dict(self, fp: str) -> dict:
+        return {
+            "fingerprint": fp,
+            "count": self.count,
+            "total_ms": round(self.total_s * 1000, 3),
+            "mean_ms": round(self.total_s * 1000 / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_s * 1000, 3),
+            "slow": self.slow,
+            "plan": self.plan,
+            "plan_ms": self.plan_ms,
+            "plan_at": self.plan_at,
+        }
+
+
+class SqlStats:
+    """Per-fingerprint totals; new fingerprints past `max_fingerprints` fold into <other>."""
+
+    ORDERS = ("total", "max", "mean", "count", "slow")
+
+    def __init__(self, max_fingerprints: int = 500):
+        self.max_fingerprints = max_fingerprints
+        self._lock = threading.Lock()
+        self._entries: dict[str, StatementStats] = {}
+
+    def record(self, fp: str, elapsed_s: float, slow: bool = False) -> StatementStats:
+        with self._lock:
+            entry = self._entries.get(fp)
+            if entry is None:
+                if len(self._entries) >= self.max_fingerprints:
+                    fp = OTHER
+                entry = self._entries.setdefault(fp, StatementStats())
+            entry.count += 1
+            entry.total_s += elapsed_s
+            entry.max_s = max(entry.max_s, elapsed_s)
+            entry.slow += slow
+            return entry
+
+    def set_plan(self, fp: str, plan: str, elapsed_s: float) -> None:
+        with self._lock:
+            entry = self._entries.get(fp)
+            if entry is not None:
+                entry.plan = plan
+                entry.plan_ms = round(elapsed_s * 1000, 3)
+                entry.plan_at = time.time()
+
+    def top(self, limit: int = 20, order: str = "total") -> list[dict]:
+        if order not in self.ORDERS:
+            raise ValueError(f"order must be one of {', '.join(self.ORDERS)}")
+        with self._lock:
+            rows = [entry.as_dict(fp) for fp, entry in self._entries.items()]
+        key = "count" if order == "count" else "slow" if order == "slow" else f"{order}_ms"
+        rows.sort(key=lambda row: row[key], reverse=True)
+        return rows[:limit]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+STATS = SqlStats(int(os.getenv("SQL_STATS_MAX_FINGERPRINTS", "500")))
+
+
+def explain_analyzes(statement: str, analyze_dml: bool = False) -> bool:
+    """
+    Whether `statement` is EXPLAINed with ANALYZE (which really executes it).
+    SELECTs and read-only WITH queries always are; UPDATE / DELETE only with
+    `analyze_dml`; INSERTs never, so they do not burn sequence values.
+    """
+    verb = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else ""
+    if verb == "select":
+        return True
+    if verb == "with":
+        # a data-modifying CTE writes like the DML it contains
+        return analyze_dml or not _WRITES.search(_STRINGS.sub("?", _COMMENTS.sub(" ", statement)))
+    return analyze_dml and verb in ("update", "delete")
+
+
+def run_explain(engine: Engine, statement: str, parameters, analyze_dml: bool = False) -> str:
+    """
+    EXPLAIN one statement on its own pooled connection (raw DBAPI, so it is
+    not timed itself). ANALYZE really executes it, so everything happens in
+    a transaction that is rolled back, under short statement / lock timeouts
+    (see explain_analyzes() for which statements get it).
+    """
+    analyze = explain_analyzes(statement, analyze_dml)
+    prefix = "EXPLAIN (ANALYZE, BUFFERS) " if analyze else "EXPLAIN "
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.execute("SET LOCAL statement_timeout = '30s'")
+        cur.execute("SET LOCAL lock_timeout = '1s'")
+        cur.execute(prefix + statement, parameters or None)
+        return "\n".join(row[0] for row in cur.fetchall())
+    finally:
+        raw.rollback()
+        raw.close()
+
+
+class Explainer:
+    """One daemon thread per process that runs sampled EXPLAINs off the hot path."""
+
+    def __init__(self, name: str, stats: SqlStats, maxsize: int = 16, analyze_dml: bool = False):
+        self.name = name
+        self.stats = stats
+        self.analyze_dml = analyze_dml
+        self._queue: queue.Queue = queue.Queue(maxsize)
+        self._thread: Optional[threading.Thread] = None
+        self._pid = os.getpid()
+
+    def submit(self, engine: Engine, fp: str, statement: str, parameters, elapsed_s: float) -> None:
+        if self._thread is None or self._pid != os.getpid():
+            # first use, or we were forked into a pool process without the thread
+            self._queue = queue.Queue(self._queue.maxsize)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=f"{self.name}-explain", daemon=True)
+            self._thread.start()
+        try:
+            self._queue.put_nowait((engine, fp, statement, parameters, elapsed_s))
+        except queue.Full:
+            pass
+
+    def _run(self) -> None:
+        while True:
+            engine, fp, statement, parameters, elapsed_s = self._queue.get()
+            try:
+                plan = run_explain(engine, statement, parameters, self.analyze_dml)
+            except Exception as e:
+                print(f"[{self.name}] EXPLAIN failed for {fp[:200]}: {e}")
+                continue
+            self.stats.set_plan(fp, plan, elapsed_s)
+            print(f"[{self.name}] Plan for {fp[:200]} ({elapsed_s * 1000:.1f} ms):\n{plan}")
+
+
+def install(
+    engine: Engine,
+    name: str = "worker",
+    stats: SqlStats = STATS,
+    threshold_ms: Optional[float] = None,
+    explain_rate: Optional[float] = None,
+    interval_s: Optional[float] = None,
+    on_slow: Optional[Callable[[], None]] = None,
+    trace_id: Optional[Callable[[], Optional[str]]] = None,
+) -> None:
+    """
+    Time every statement `engine` runs; no-op when SQL_STATS=0.
+
+    `on_slow` is called once per slow statement (e.g. a metrics counter's
+    inc), and `trace_id`, if given, supplies the trace id the slow-query log
+    line is tagged with.
+    """
+    if os.getenv("SQL_STATS", "1").lower() not in ("1", "true", "yes"):
+        return
+    threshold_s = (threshold_ms if threshold_ms is not None else float(os.getenv("SLOW_QUERY_MS", "100"))) / 1000
+    if explain_rate is None:
+        explain_rate = float(os.getenv("SLOW_QUERY_EXPLAIN_RATE", "0.1"))
+    if interval_s is None:
+        interval_s = float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL_S", "300"))
+    analyze_dml = os.getenv("SLOW_QUERY_EXPLAIN_ANALYZE_DML", "0").lower() in ("1", "true", "yes")
+    explainer = Explainer(name, stats, analyze_dml=analyze_dml)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("sqlstats_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["sqlstats_started"].pop()
+        elapsed = time.perf_counter() - started
+        fp = fingerprint(statement)
+        slow = elapsed >= threshold_s
+        entry = stats.record(fp, elapsed, slow)
+        if not slow:
+            return
+
+        if on_slow is not None:
+            on_slow()
+        now = time.monotonic()
+        if now - entry.logged_at >= interval_s:
+            entry.logged_at = now
+            trace = f", trace {trace_id() or '-'}" if trace_id is not None else ""
+            print(f"[{name}] Slow query {elapsed * 1000:.1f} ms (seen {entry.count}x{trace}): {fp[:200]}")
+        if (
+            explain_rate > 0
+            and fp.split(" ", 1)[0].lower() in EXPLAINABLE
+            and now - entry.explained_at >= interval_s
+            and random.random() < explain_rate
+        ):
+            entry.explained_at = now
+            params = parameters[0] if executemany and parameters else parameters
+            explainer.submit(engine, fp, statement, params, elapsed)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        # after_cursor_execute never runs for a failed statement
+        started = context.connection.info.get("sqlstats_started") if context.connection else None
+        if started:
+            started.pop()
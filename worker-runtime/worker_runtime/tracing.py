@@ -0,0 +1,125 @@
+"""
+Enrichment traces: the backend puts a trace_id (and published_at) in the
+AMQP headers of every job; when the job ends the worker writes one
+enrichment_trace row per traced message with its enqueue, start and
+completion times. The backend's /enrichment/latency reads them back.
+"""
+import os
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from .config import env_bool, make_engine
+
+UPSERT_TRACE_SQL = text(
+    """
+    INSERT INTO enrichment_trace
+      (trace_id, kind, post_id, enqueued_at, started_at, completed_at, status)
+    VALUES
+      (:trace_id, :kind, :post_id, :enqueued_at, :started_at, :completed_at, :status)
+    ON CONFLICT (trace_id, kind) DO UPDATE SET
+      started_at = EXCLUDED.started_at,
+      completed_at = EXCLUDED.completed_at,
+      status = EXCLUDED.status
+    """
+)
+
+
+class MessageMeta(NamedTuple):
+    """What a worker keeps from a message's properties besides the body."""
+
+    published_at: Optional[float]
+    trace_id: Optional[str]
+
+
+def message_meta(headers: Optional[dict], timestamp: Optional[float] = None) -> MessageMeta:
+    """
+    Publish time (epoch seconds) and trace id of a message: the headers set
+    by our publishers, else the AMQP timestamp (whole seconds) and no trace.
+    """
+    headers = headers or {}
+    published = headers.get("published_at", timestamp)
+    trace_id = headers.get("trace_id")
+    return MessageMeta(
+        float(published) if published else None,
+        str(trace_id) if trace_id else None,
+    )
+
+
+def _post_id(payload: dict) -> Optional[int]:
+    try:
+        return int(payload["post_id"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _ts(epoch: Optional[float]) -> Optional[datetime]:
+    return datetime.fromtimestamp(epoch, timezone.utc) if epoch is not None else None
+
+
+class TraceRecorder:
+    """
+    Writes enrichment_trace rows for one kind of job. Picklable, so it can
+    travel to process-pool workers: the engine is created lazily, once per
+    process. Recording never fails a job; errors are logged and dropped.
+    """
+
+    _engines: dict[int, Engine] = {}  # pid -> engine
+
+    def __init__(self, name: str, kind: str):
+        self.name = name
+        self.kind = kind
+
+    def _engine(self) -> Engine:
+        pid = os.getpid()
+        if pid not in self._engines:
+            self._engines[pid] = make_engine(self.name)
+        return self._engines[pid]
+
+    def rows(
+        self,
+        payloads: list[dict],
+        metas: list[MessageMeta],
+        started: float,
+        completed: float,
+        ok: bool,
+    ) -> list[dict]:
+        return [
+            {
+                "trace_id": meta.trace_id,
+                "kind": self.kind,
+                "post_id": _post_id(payload),
+                "enqueued_at": _ts(meta.published_at),
+                "started_at": _ts(started),
+                "completed_at": _ts(completed),
+                "status": "READY" if ok else "FAILED",
+            }
+            for payload, meta in zip(payloads, metas)
+            if meta is not None and meta.trace_id
+        ]
+
+    def record(
+        self,
+        payloads: list[dict],
+        metas: list[MessageMeta],
+        started: float,
+        completed: float,
+        ok: bool,
+    ) -> None:
+        rows = self.rows(payloads, metas, started, completed, ok)
+        if not rows:
+            return
+        try:
+            with self._engine().begin() as conn:
+                conn.execute(UPSERT_TRACE_SQL, rows)
+        except Exception as e:
+            print(f"[{self.name}] Failed to record {len(rows)} trace(s): {e}")
+
+
+def make_recorder(name: str, kind: Optional[str]) -> Optional[TraceRecorder]:
+    """TraceRecorder for `kind`, or None when tracing is off (WORKER_TRACE=0)."""
+    if kind is None or not env_bool("WORKER_TRACE", "1"):
+        return None
+    return TraceRecorder(name, kind)